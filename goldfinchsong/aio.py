@@ -0,0 +1,519 @@
+"""
+Asyncio module. Posts image tweets through an awaitable Twitter client, so
+that many uploads can be in flight from a single event loop.
+
+The client speaks HTTP/1.1 over ``asyncio`` streams and signs requests with
+OAuth 1.0a, using only the standard library. It's an alternative to the
+blocking ``tweepy`` client, which remains the default. The
+:mod:`~.goldfinchsong.stubserver` module provides a local server with the same
+endpoints for testing the async path offline.
+
+Large images are uploaded with the chunked INIT/APPEND/FINALIZE media flow,
+reading one chunk from disk at a time, so memory use is bounded by the chunk
+size rather than the image size.
+
+Attributes:
+    API_URL (str): Base URL of the Twitter REST API.
+    UPLOAD_URL (str): Base URL of the Twitter media upload API.
+    DEFAULT_CONCURRENCY (int): Maximum number of posts in flight when no limit is given.
+    DEFAULT_CHUNK_SIZE (int): Bytes sent by each APPEND request of a chunked upload.
+    DEFAULT_CHUNKED_THRESHOLD (int): Images larger than this many bytes are uploaded in chunks.
+    TRANSIENT_STATUSES (frozenset): HTTP status codes after which a request is retried.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import mimetypes
+import os
+import ssl
+from time import time
+from urllib.parse import quote, urlencode, urlsplit
+from uuid import uuid4
+
+API_URL = 'https://api.twitter.com'
+
+UPLOAD_URL = 'https://upload.twitter.com'
+
+DEFAULT_CONCURRENCY = 16
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+DEFAULT_CHUNKED_THRESHOLD = 5 * 1024 * 1024
+
+TRANSIENT_STATUSES = frozenset([500, 502, 503, 504])
+
+
+class TwitterAPIError(Exception):
+    """
+    Raised when the Twitter API responds with an error status.
+
+    Attributes:
+        status (int): The HTTP status code.
+        headers (dict): Response headers, keyed by lower case names.
+        body (bytes): The response body.
+    """
+    def __init__(self, status, headers, body):
+        super().__init__('Twitter API responded with status {0}: {1}'.format(
+            status, body.decode('utf-8', 'replace')))
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class UploadInterrupted(Exception):
+    """
+    Raised when a chunked upload fails after its retries are used up.
+
+    Pass the ``session`` back to :meth:`AsyncAPI.chunked_upload` to resume the
+    upload from the first segment that wasn't appended.
+
+    Attributes:
+        session (UploadSession): The interrupted upload.
+    """
+    def __init__(self, session, cause):
+        super().__init__('Upload of {0} interrupted at segment {1}: {2}'.format(
+            session.image_path, session.segment_index, cause))
+        self.session = session
+
+
+class UploadSession:
+    """
+    Progress of a chunked media upload.
+
+    Attributes:
+        image_path (str): File path of the image.
+        total_bytes (int): Size of the image.
+        media_type (str): The image's MIME type.
+        media_category (str): ``tweet_gif`` for GIFs, ``tweet_image`` otherwise.
+        chunk_size (int): Bytes sent by each APPEND request.
+        media_id (str): The id from the INIT response, or ``None`` before INIT.
+        segment_index (int): The next segment to append.
+        finalized (bool): Whether FINALIZE succeeded.
+    """
+    def __init__(self, image_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.image_path = image_path
+        self.total_bytes = os.path.getsize(image_path)
+        self.media_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+        self.media_category = 'tweet_gif' if self.media_type == 'image/gif' else 'tweet_image'
+        self.chunk_size = chunk_size
+        self.media_id = None
+        self.segment_index = 0
+        self.finalized = False
+
+    @property
+    def segment_count(self):
+        """
+        Returns:
+            int: Number of APPEND requests the upload needs.
+        """
+        return max(1, -(-self.total_bytes // self.chunk_size))
+
+
+def percent_encode(value):
+    """
+    Arguments:
+        value (str): A value to encode.
+
+    Returns:
+        str: The value percent encoded as OAuth 1.0a requires.
+    """
+    return quote(str(value), safe='~')
+
+
+def get_authorization(credentials, method, url, parameters=None, nonce=None, timestamp=None):
+    """
+    Signs a request with OAuth 1.0a and HMAC-SHA1.
+
+    Arguments:
+        credentials (dict): Authentication and access credentials.
+        method (str): The HTTP method.
+        url (str): The request URL, without a query string.
+        parameters (dict): Query or form parameters that are part of the signature.
+            Multipart form fields are not signed.
+        nonce (str): A unique value for the request. Random by default.
+        timestamp (int): Seconds since the epoch. The current time by default.
+
+    Returns:
+        str: An ``Authorization`` header value.
+    """
+    oauth_parameters = {
+        'oauth_consumer_key': credentials['consumer_key'],
+        'oauth_nonce': nonce or uuid4().hex,
+        'oauth_signature_method': 'HMAC-SHA1',
+        'oauth_timestamp': str(timestamp if timestamp is not None else int(time())),
+        'oauth_token': credentials['access_token'],
+        'oauth_version': '1.0',
+    }
+    signed_parameters = dict(parameters or dict())
+    signed_parameters.update(oauth_parameters)
+    parameter_string = '&'.join('{0}={1}'.format(key, value) for key, value in
+                                sorted((percent_encode(key), percent_encode(value))
+                                       for key, value in signed_parameters.items()))
+    base_string = '&'.join([method.upper(), percent_encode(url), percent_encode(parameter_string)])
+    signing_key = '&'.join([percent_encode(credentials['consumer_secret']),
+                            percent_encode(credentials['access_token_secret'])])
+    digest = hmac.new(signing_key.encode('utf-8'), base_string.encode('utf-8'), hashlib.sha1).digest()
+    oauth_parameters['oauth_signature'] = base64.b64encode(digest).decode('ascii')
+    return 'OAuth ' + ', '.join('{0}="{1}"'.format(percent_encode(key), percent_encode(value))
+                                for key, value in sorted(oauth_parameters.items()))
+
+
+def encode_multipart(field_name, file_name, content, fields=None):
+    """
+    Arguments:
+        field_name (str): The form field name.
+        file_name (str): The uploaded file name.
+        content (bytes): The file content.
+        fields (dict): Other form fields, sent before the file.
+
+    Returns:
+        tuple: The ``Content-Type`` header value and the encoded body.
+    """
+    boundary = uuid4().hex
+    parts = ['--{0}\r\nContent-Disposition: form-data; name="{1}"\r\n\r\n{2}\r\n'.format(boundary, name, value)
+             for name, value in (fields or dict()).items()]
+    parts.append('--{0}\r\nContent-Disposition: form-data; name="{1}"; filename="{2}"\r\n'
+                 'Content-Type: application/octet-stream\r\n\r\n'.format(boundary, field_name, file_name))
+    tail = '\r\n--{0}--\r\n'.format(boundary)
+    body = b''.join([''.join(parts).encode('utf-8'), content, tail.encode('utf-8')])
+    return 'multipart/form-data; boundary={0}'.format(boundary), body
+
+
+def decode_chunked(body):
+    """
+    Arguments:
+        body (bytes): A response body with chunked transfer encoding.
+
+    Returns:
+        bytes: The decoded body.
+    """
+    decoded = list()
+    position = 0
+    while True:
+        line_end = body.index(b'\r\n', position)
+        size = int(body[position:line_end].split(b';')[0], 16)
+        if not size:
+            return b''.join(decoded)
+        start = line_end + 2
+        decoded.append(body[start:start + size])
+        position = start + size + 2
+
+
+async def send_request(method, url, headers, body=b'', timeout=60):
+    """
+    Sends an HTTP/1.1 request over a new connection and reads the whole response.
+
+    Arguments:
+        method (str): The HTTP method.
+        url (str): The request URL. Both ``http`` and ``https`` are supported.
+        headers (dict): Request headers.
+        body (bytes): The request body.
+        timeout (float): Seconds to wait for the response.
+
+    Returns:
+        tuple: The status code, a dict of lower case response headers and the body.
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    target = parts.path or '/'
+    if parts.query:
+        target = '?'.join([target, parts.query])
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None),
+        timeout)
+    try:
+        lines = ['{0} {1} HTTP/1.1'.format(method, target), 'Host: {0}'.format(parts.netloc),
+                 'Content-Length: {0}'.format(len(body)), 'Connection: close']
+        lines.extend('{0}: {1}'.format(name, value) for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, separator, response_body = response.partition(b'\r\n\r\n')
+    head_lines = head.decode('latin-1').split('\r\n')
+    status = int(head_lines[0].split(' ')[1])
+    response_headers = dict()
+    for line in head_lines[1:]:
+        name, separator, value = line.partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+        response_body = decode_chunked(response_body)
+    return status, response_headers, response_body
+
+
+class AsyncAPI:
+    """
+    An awaitable Twitter client for posting image tweets.
+
+    Each request opens its own connection, so any number of requests can run
+    concurrently on one event loop.
+
+    Images larger than ``chunked_threshold`` bytes are uploaded with
+    :meth:`chunked_upload`. Its requests are retried up to ``retries`` times
+    after connection errors and ``TRANSIENT_STATUSES`` responses.
+
+    Attributes:
+        credentials (dict): Authentication and access credentials.
+        api_url (str): Base URL of the REST API.
+        upload_url (str): Base URL of the media upload API.
+        timeout (float): Seconds to wait for each response.
+        chunk_size (int): Bytes sent by each APPEND request.
+        chunked_threshold (int): Size in bytes above which images are uploaded in chunks.
+        retries (int): Retries for each chunked upload request.
+        retry_delay (float): Seconds between retries.
+    """
+    def __init__(self, credentials, api_url=API_URL, upload_url=UPLOAD_URL, timeout=60,
+                 chunk_size=DEFAULT_CHUNK_SIZE, chunked_threshold=DEFAULT_CHUNKED_THRESHOLD,
+                 retries=3, retry_delay=1.0):
+        self.credentials = credentials
+        self.api_url = api_url.rstrip('/')
+        self.upload_url = upload_url.rstrip('/')
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.chunked_threshold = chunked_threshold
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    async def request(self, url, fields=None, media=None, method='POST'):
+        """
+        Sends a signed request.
+
+        Arguments:
+            url (str): The endpoint URL.
+            fields (dict): Form fields, or query parameters for a *GET* request.
+                They're signed unless they're sent with ``media``.
+            media (tuple): A file name and content to send as a multipart ``media``
+                field, along with any ``fields``.
+            method (str): *POST* or *GET*.
+
+        Returns:
+            The decoded JSON response.
+
+        Raises:
+            TwitterAPIError: Raises exception if the response has an error status.
+        """
+        fields = fields or dict()
+        headers = dict()
+        body = b''
+        if method == 'GET':
+            headers['Authorization'] = get_authorization(self.credentials, method, url, fields)
+            if fields:
+                url = '?'.join([url, urlencode(fields, quote_via=quote)])
+        elif media is not None:
+            headers['Content-Type'], body = encode_multipart('media', media[0], media[1], fields)
+            headers['Authorization'] = get_authorization(self.credentials, method, url)
+        else:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            body = urlencode(fields, quote_via=quote).encode('utf-8')
+            headers['Authorization'] = get_authorization(self.credentials, method, url, fields)
+        status, response_headers, response_body = await send_request(method, url, headers, body, self.timeout)
+        if status >= 400:
+            raise TwitterAPIError(status, response_headers, response_body)
+        return json.loads(response_body.decode('utf-8')) if response_body else None
+
+    async def upload_media(self, image_path):
+        """
+        Uploads an image.
+
+        Arguments:
+            image_path (str): File path of the image.
+
+        Returns:
+            str: The media id.
+        """
+        if os.path.getsize(image_path) > self.chunked_threshold:
+            return await self.chunked_upload(image_path)
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(None, read_file, image_path)
+        file_name = os.path.basename(image_path)
+        response = await self.request(self.upload_url + '/1.1/media/upload.json', media=(file_name, content))
+        return response['media_id_string']
+
+    async def request_with_retries(self, url, fields=None, media=None, method='POST'):
+        """
+        Sends a signed request, retrying after connection errors and transient statuses.
+
+        Arguments:
+            url (str): The endpoint URL.
+            fields (dict): Form fields or query parameters.
+            media (tuple): A file name and content.
+            method (str): *POST* or *GET*.
+
+        Returns:
+            The decoded JSON response.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self.request(url, fields, media, method)
+            except TwitterAPIError as error:
+                if error.status not in TRANSIENT_STATUSES or attempt >= self.retries:
+                    raise
+            except (OSError, asyncio.TimeoutError):
+                if attempt >= self.retries:
+                    raise
+            attempt += 1
+            await asyncio.sleep(self.retry_delay)
+
+    async def chunked_upload(self, image_path, session=None):
+        """
+        Uploads an image with the INIT, APPEND and FINALIZE commands.
+
+        The image is read from disk one chunk at a time. If the media needs
+        processing after FINALIZE, as GIFs do, the STATUS command is polled
+        until processing ends.
+
+        Arguments:
+            image_path (str): File path of the image.
+            session (UploadSession): A session from an earlier :class:`UploadInterrupted`
+                exception, which resumes that upload instead of starting a new one.
+
+        Returns:
+            str: The media id.
+
+        Raises:
+            UploadInterrupted: Raises exception if a request still fails after its retries.
+                The exception's session resumes the upload.
+            TwitterAPIError: Raises exception if media processing fails.
+        """
+        if session is None:
+            session = UploadSession(image_path, self.chunk_size)
+        url = self.upload_url + '/1.1/media/upload.json'
+        loop = asyncio.get_running_loop()
+        try:
+            if session.media_id is None:
+                response = await self.request_with_retries(url, {
+                    'command': 'INIT', 'total_bytes': session.total_bytes,
+                    'media_type': session.media_type, 'media_category': session.media_category})
+                session.media_id = response['media_id_string']
+            file_name = os.path.basename(image_path)
+            while session.segment_index < session.segment_count:
+                chunk = await loop.run_in_executor(None, read_chunk, image_path,
+                                                   session.segment_index * session.chunk_size, session.chunk_size)
+                await self.request_with_retries(url, {'command': 'APPEND', 'media_id': session.media_id,
+                                                      'segment_index': session.segment_index},
+                                                media=(file_name, chunk))
+                session.segment_index += 1
+            if not session.finalized:
+                response = await self.request_with_retries(url, {'command': 'FINALIZE',
+                                                                 'media_id': session.media_id})
+                session.finalized = True
+            else:
+                response = await self.request_with_retries(url, {'command': 'STATUS', 'media_id': session.media_id},
+                                                           method='GET')
+            processing_info = response.get('processing_info')
+            while processing_info and processing_info.get('state') in ('pending', 'in_progress'):
+                await asyncio.sleep(processing_info.get('check_after_secs', 1))
+                response = await self.request_with_retries(url, {'command': 'STATUS', 'media_id': session.media_id},
+                                                           method='GET')
+                processing_info = response.get('processing_info')
+        except (TwitterAPIError, OSError, asyncio.TimeoutError) as error:
+            if isinstance(error, TwitterAPIError) and error.status not in TRANSIENT_STATUSES:
+                raise
+            raise UploadInterrupted(session, error) from error
+        if processing_info and processing_info.get('state') == 'failed':
+            raise TwitterAPIError(400, dict(), json.dumps(processing_info).encode('utf-8'))
+        return session.media_id
+
+    async def update_status(self, status_text, media_ids=None):
+        """
+        Posts a status.
+
+        Arguments:
+            status_text (str): The status text.
+            media_ids (list): Ids of uploaded media to attach.
+
+        Returns:
+            dict: The posted status.
+        """
+        fields = {'status': status_text}
+        if media_ids:
+            fields['media_ids'] = ','.join(media_ids)
+        return await self.request(self.api_url + '/1.1/statuses/update.json', fields)
+
+    async def update_with_media(self, image_path, status_text):
+        """
+        Uploads an image and posts it with a status, like tweepy's method of the same name.
+
+        Arguments:
+            image_path (str): File path of the image.
+            status_text (str): The status text.
+
+        Returns:
+            dict: The posted status.
+        """
+        media_id = await self.upload_media(image_path)
+        return await self.update_status(status_text, [media_id])
+
+
+class BlockingAPI:
+    """
+    Runs an :class:`AsyncAPI` client's calls to completion, so it can stand in
+    for a ``tweepy`` client in :meth:`~.goldfinchsong.classes.Manager.post_tweet`.
+
+    Attributes:
+        async_api (AsyncAPI): The wrapped client.
+    """
+    def __init__(self, async_api):
+        self.async_api = async_api
+
+    def update_with_media(self, image_path, status_text):
+        return asyncio.run(self.async_api.update_with_media(image_path, status_text))
+
+    def update_status(self, status, media_ids=None):
+        return asyncio.run(self.async_api.update_status(status, media_ids))
+
+
+def read_file(location):
+    """
+    Arguments:
+        location (str): File path.
+
+    Returns:
+        bytes: The file's content.
+    """
+    with open(location, 'rb') as binary_file:
+        return binary_file.read()
+
+
+def read_chunk(location, offset, size):
+    """
+    Arguments:
+        location (str): File path.
+        offset (int): Position of the first byte to read.
+        size (int): Maximum number of bytes to read.
+
+    Returns:
+        bytes: Up to ``size`` bytes of the file's content.
+    """
+    with open(location, 'rb') as binary_file:
+        binary_file.seek(offset)
+        return binary_file.read(size)
+
+
+async def post_tweets(managers, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Posts every manager's tweet from one event loop.
+
+    Uploads run concurrently, up to ``concurrency`` at a time. Each manager's
+    history is written from the event loop's thread, one write at a time.
+
+    Arguments:
+        managers: Iterable of :class:`~.goldfinchsong.classes.Manager` instances.
+        concurrency (int): Maximum number of posts in flight.
+
+    Returns:
+        list: Each manager's content tuple, or the exception its post raised,
+            in the order of ``managers``.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(manager):
+        async with semaphore:
+            return await manager.post_tweet_async()
+
+    return await asyncio.gather(*(post(manager) for manager in managers), return_exceptions=True)
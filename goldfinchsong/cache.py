@@ -0,0 +1,110 @@
+"""
+Cache module. Persists computed status texts so that a file's status text is
+only compacted once for a given set of text conversions and maximum length.
+
+Attributes:
+    CACHE_SUFFIX (str): Suffix of the status text cache file's default path, which replaces the
+        database file's extension. See :func:`~.goldfinchsong.utils.sibling_location`.
+"""
+import hashlib
+import json
+import sqlite3
+from . import utils
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS status_texts ('
+    'digest TEXT NOT NULL, file_name TEXT NOT NULL, status_text TEXT NOT NULL, '
+    'last_used INTEGER NOT NULL, PRIMARY KEY (digest, file_name))',
+    'CREATE INDEX IF NOT EXISTS status_texts_last_used ON status_texts (last_used)',
+)
+
+CACHE_SUFFIX = '.cache.sqlite3'
+
+
+def get_digest(text_conversions, maximum_length):
+    """
+    Fingerprints the settings that determine a status text.
+
+    Arguments:
+        text_conversions (dict): Text conversions, or ``None``.
+        maximum_length (int): The maximum character length for the text.
+
+    Returns:
+        str: A SHA-256 hex digest of the ordered conversions and the maximum length.
+    """
+    items = list(text_conversions.items()) if text_conversions else list()
+    serialized = json.dumps([items, maximum_length])
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class StatusTextCache:
+    """
+    A least recently used cache of status texts stored in SQLite.
+
+    Entries are keyed by file name and a digest of the text conversions and
+    maximum length. When the cache is used with a different digest, for example
+    after the ``goldfinchsong.conversions`` section changes, entries for other
+    digests are removed. Once the cache holds more than ``maximum_entries``
+    entries, the least recently used ones are evicted.
+
+    Attributes:
+        location (str): File path of the SQLite database.
+        maximum_entries (int): Maximum number of cached status texts.
+        digest (str): Digest of the settings the cached entries were computed with.
+    """
+    def __init__(self, location, maximum_entries=10000):
+        self.location = location
+        self.maximum_entries = maximum_entries
+        self.digest = None
+        self.connection = sqlite3.connect(location)
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+        self.clock = self.connection.execute('SELECT MAX(last_used) FROM status_texts').fetchone()[0] or 0
+
+    def status_text(self, file_name, text_conversions=None, maximum_length=117):
+        """
+        Provides a file's status text, computing and caching it on a miss.
+
+        Arguments:
+            file_name (str): An image file name.
+            text_conversions (dict): Text conversions for the status text.
+            maximum_length (int): The maximum character length for the text.
+
+        Returns:
+            str: The same text :func:`~.goldfinchsong.utils.extract_status_text` returns.
+        """
+        digest = get_digest(text_conversions, maximum_length)
+        if digest != self.digest:
+            with self.connection:
+                self.connection.execute('DELETE FROM status_texts WHERE digest != ?', (digest,))
+            self.digest = digest
+        self.clock += 1
+        row = self.connection.execute('SELECT status_text FROM status_texts WHERE digest = ? AND file_name = ?',
+                                      (digest, file_name)).fetchone()
+        if row is not None:
+            with self.connection:
+                self.connection.execute('UPDATE status_texts SET last_used = ? WHERE digest = ? AND file_name = ?',
+                                        (self.clock, digest, file_name))
+            return row[0]
+        status_text = utils.extract_status_text(file_name, text_conversions, maximum_length)
+        with self.connection:
+            self.connection.execute('INSERT INTO status_texts VALUES (?, ?, ?, ?)',
+                                    (digest, file_name, status_text, self.clock))
+            self.evict()
+        return status_text
+
+    def evict(self):
+        """Removes the least recently used entries beyond ``maximum_entries``."""
+        count = self.connection.execute('SELECT COUNT(*) FROM status_texts').fetchone()[0]
+        if count > self.maximum_entries:
+            self.connection.execute('DELETE FROM status_texts WHERE rowid IN '
+                                    '(SELECT rowid FROM status_texts ORDER BY last_used LIMIT ?)',
+                                    (count - self.maximum_entries,))
+
+    def close(self):
+        """Closes the connection."""
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM status_texts').fetchone()[0]
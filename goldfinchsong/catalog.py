@@ -0,0 +1,199 @@
+"""
+Catalog module. Keeps a persistent index of image directory entries so that
+runs don't have to list and ``stat`` every file in a large image library.
+
+Attributes:
+    CATALOG_SUFFIX (str): Suffix of the catalog file's default path, which replaces the
+        database file's extension. See :func:`~.goldfinchsong.utils.sibling_location`.
+"""
+import os
+from os.path import abspath
+from . import utils
+
+CATALOG_SUFFIX = '.catalog.json'
+
+
+def read_directory(directory):
+    """
+    Lists a directory's regular files and subdirectories with ``os.scandir``.
+
+    The directory's modification time is read first, so a change made during
+    the listing makes the next comparison fail rather than go unnoticed.
+    Symbolic links to directories aren't followed, so a recursive walk can't loop.
+
+    Arguments:
+        directory (str): File path to an image directory.
+
+    Returns:
+        dict: A catalog directory entry with ``mtime_ns``, ``files`` and ``directories`` items.
+            ``files`` holds ``[size, mtime_ns, is_image]`` lists keyed to file names, and
+            ``directories`` lists subdirectory names.
+    """
+    mtime_ns = os.stat(directory).st_mtime_ns
+    files = dict()
+    directories = list()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = [stat.st_size, stat.st_mtime_ns, utils.is_image_file(entry.name)]
+            elif entry.is_dir(follow_symlinks=False):
+                directories.append(entry.name)
+    return {'mtime_ns': mtime_ns, 'files': files, 'directories': directories}
+
+
+class ImageCatalog:
+    """
+    Persistent index of the files found in image directories.
+
+    Each directory entry records the directory's modification time along with the
+    name, size, modification time and image classification of every regular file
+    it holds, and the names of its subdirectories. Files are classified with :func:`~.goldfinchsong.utils.is_image_file`
+    once, when the directory is scanned. A directory
+    is only rescanned when its modification time changes, which happens when files
+    are added, removed or renamed. Edits to a file's contents don't change the
+    directory's modification time, so recorded sizes and file modification times
+    are refreshed on the next rescan.
+
+    The persisted format is::
+
+        {
+            'version': 3,
+            'directories': {
+                '/absolute/path/to/images': {
+                    'mtime_ns': 1454601600000000000,
+                    'files': {
+                        'image.jpg': [52301, 1454601600000000000, True],
+                        'notes.txt': [1204, 1454601600000000000, False]
+                    },
+                    'directories': ['finches']
+                }
+            }
+        }
+
+    Attributes:
+        location (str): File path for the persisted catalog.
+        directories (dict): Directory entries keyed to absolute directory paths.
+    """
+    version = 3
+
+    def __init__(self, location):
+        self.location = location
+        self.directories = dict()
+        self._images = dict()
+        self._changed = False
+        self.load()
+
+    def load(self):
+        """
+        Reads the persisted catalog. A missing, unreadable or outdated catalog file
+        leaves the catalog empty, so every directory gets scanned on first use.
+        """
+        data = utils.read_json(self.location)
+        if isinstance(data, dict) and data.get('version') == self.version:
+            self.directories = data.get('directories', dict())
+
+    def save(self):
+        """
+        Persists the catalog if it changed since it was loaded.
+        """
+        if not self._changed:
+            return
+        utils.write_json(self.location, {'version': self.version, 'directories': self.directories})
+        self._changed = False
+
+    def scan(self, directory):
+        """
+        Lists a directory's regular files with ``os.scandir``.
+
+        Arguments:
+            directory (str): File path to an image directory.
+
+        Returns:
+            dict: File names keyed to ``[size, mtime_ns, is_image]`` lists.
+        """
+        return read_directory(directory)['files']
+
+    def refresh(self, directory):
+        """
+        Rescans a directory if its modification time differs from the recorded one.
+
+        Different directories can be refreshed from several threads at once, as
+        :class:`~.goldfinchsong.library.ImageLibrary` does; the catalog is only
+        saved by the calling thread afterwards.
+
+        Arguments:
+            directory (str): File path to an image directory.
+
+        Returns:
+            bool: ``True`` if the directory was rescanned. ``False`` otherwise.
+        """
+        key = abspath(directory)
+        mtime_ns = os.stat(directory).st_mtime_ns
+        entry = self.directories.get(key)
+        if entry is not None and entry['mtime_ns'] == mtime_ns:
+            return False
+        self.directories[key] = read_directory(directory)
+        self._images.pop(key, None)
+        self._changed = True
+        return True
+
+    def entry(self, directory):
+        """
+        Provides a directory's catalog entry, revalidating and persisting the catalog first.
+
+        Arguments:
+            directory (str): File path to an image directory.
+
+        Returns:
+            dict: The entry's ``mtime_ns``, ``files`` and ``directories`` items. The
+                entry is the catalog's own; callers should not modify it.
+        """
+        self.refresh(directory)
+        self.save()
+        return self.directories[abspath(directory)]
+
+    def lookup(self, directory):
+        """
+        Provides a directory's catalog entry, revalidating it but not persisting the catalog.
+
+        Arguments:
+            directory (str): File path to an image directory.
+
+        Returns:
+            dict: The entry's ``mtime_ns``, ``files`` and ``directories`` items.
+        """
+        self.refresh(directory)
+        return self.directories[abspath(directory)]
+
+    def files(self, directory):
+        """
+        Provides the names of the regular files in a directory, revalidating
+        and persisting the catalog first.
+
+        Arguments:
+            directory (str): File path to an image directory.
+
+        Returns:
+            list: File names without the directory path.
+        """
+        return list(self.entry(directory)['files'])
+
+    def images(self, directory):
+        """
+        Provides the image files in a directory, revalidating and persisting the catalog first.
+
+        Arguments:
+            directory (str): File path to an image directory.
+
+        Returns:
+            dict: Image file names keyed to ``None``, in scan order. The dict supports
+                fast membership checks; callers should not modify it.
+        """
+        entry = self.entry(directory)
+        key = abspath(directory)
+        images = self._images.get(key)
+        if images is None:
+            images = dict.fromkeys(name for name, details in entry['files'].items() if details[2])
+            self._images[key] = images
+        return images
@@ -1,23 +1,157 @@
 """Classes module. These are objects **goldfinchsong** uses to keep state and perform business logic."""
 from datetime import datetime, timezone
-from . import utils
+from functools import cached_property
+from os.path import getsize
+from . import metrics, utils
+
+
+class NoopAPI:
+    """
+    Stands in for the ``tweepy`` client of a dry run manager. Nothing is sent.
+
+    Attributes:
+        posts (list): The ``(image, status text)`` tuples that would have been posted.
+    """
+    def __init__(self):
+        self.posts = list()
+
+    def update_with_media(self, image, text):
+        self.posts.append((image, text))
+
+    def update_status(self, status, media_ids=None):
+        self.posts.append((media_ids, status))
+
+
+class NoopAsyncAPI(NoopAPI):
+    """Stands in for the :class:`~.goldfinchsong.aio.AsyncAPI` client of a dry run manager."""
+
+    async def update_with_media(self, image, text):
+        super().update_with_media(image, text)
+
+    async def update_status(self, status, media_ids=None):
+        super().update_status(status, media_ids)
+
+    async def chunked_upload(self, image_path, session=None):
+        return '0'
 
 
 class Manager:
     """
     Manages tweet posting through twitter API.
 
+    The ``content`` and ``api`` attributes are computed the first time they're
+    used and then kept, so building a manager doesn't scan the image directory,
+    read the history or set up authentication. Call :meth:`prepare` to compute
+    them ahead of time. Either attribute can also be assigned directly.
+
+    A ``dry_run`` manager goes through the whole posting pipeline with
+    :class:`NoopAPI` clients and doesn't save the history, so it never posts
+    or uses up an image.
+
+    :meth:`post_tweet` uses the blocking ``tweepy`` client. :meth:`post_tweet_async`
+    is a coroutine variant that uses the awaitable ``async_api`` client instead.
+    With a ``chunked_threshold``, both methods upload larger images in chunks
+    through :meth:`~.goldfinchsong.aio.AsyncAPI.chunked_upload`, so an image is
+    never read into memory whole. If :meth:`post_tweet`'s chunked upload is
+    interrupted, its session is kept and the next attempt resumes it.
+
     Attributes:
-        api: A tweepy API instance.
-        db (TinyDB): A database (TinyDB) instance for storing tweet image history.
+        api: A tweepy API instance, or ``None`` without credentials.
+        async_api: An :class:`~.goldfinchsong.aio.AsyncAPI` instance, or ``None`` without credentials.
+        credentials (dict): Authentication and access credentials.
+        db (TinyDB): A database (TinyDB) instance for storing tweet image history. A
+            :class:`~.goldfinchsong.history.History` may wrap it to keep an index of
+            posted images current as tweets are saved.
         content (tuple): The class expects a tuple with a file name string
             and status text string.
+        catalog (ImageCatalog): An optional persistent index of the image directory.
+        queue (PostingQueue): An optional persisted posting queue. It's only used
+            along with a catalog.
+        cache (StatusTextCache): An optional persistent cache of status texts.
+        image_directory (str): File path to the image directory.
+        text_conversions (dict): Text conversions used to compact status texts.
+        chunked_threshold (int): Size in bytes above which images are uploaded in
+            chunks. If ``None``, :meth:`post_tweet` never uploads in chunks and
+            :meth:`post_tweet_async` uses the ``async_api`` default.
+        derivatives (DerivativeCache): An optional cache of processed copies of
+            oversized images, which are uploaded in place of the originals.
+        dry_run (bool): If ``True``, posts go to no-op clients and aren't saved.
+        upload_session (UploadSession): The interrupted chunked upload of the
+            content's image, or ``None``.
     """
-    def __init__(self, credentials=None, db=None, image_directory=None, text_conversions=None):
+    def __init__(self, credentials=None, db=None, image_directory=None, text_conversions=None,
+                 catalog=None, queue=None, cache=None, chunked_threshold=None, derivatives=None,
+                 dry_run=False):
+        self.credentials = credentials
         self.db = db
-        self.content = utils.load_content(db, image_directory, text_conversions)
-        if credentials:
-            self.api = utils.access_api(credentials)
+        self.catalog = catalog
+        self.queue = queue
+        self.cache = cache
+        self.image_directory = image_directory
+        self.text_conversions = text_conversions
+        self.chunked_threshold = chunked_threshold
+        self.derivatives = derivatives
+        self.dry_run = dry_run
+        self.upload_session = None
+
+    @cached_property
+    def content(self):
+        """
+        Returns:
+            tuple or ``None``: A content tuple selected from the image directory.
+        """
+        with metrics.phase('load_content'):
+            return utils.load_content(self.db, self.image_directory, self.text_conversions,
+                                      self.catalog, self.queue, self.cache, self.derivatives, self.dry_run)
+
+    @cached_property
+    def api(self):
+        """
+        Returns:
+            A tweepy API instance, a :class:`NoopAPI` for a dry run, or ``None``
+                if the manager has no credentials.
+        """
+        if self.dry_run:
+            return NoopAPI()
+        if self.credentials:
+            return utils.access_api(self.credentials)
+        return None
+
+    @cached_property
+    def async_api(self):
+        """
+        Returns:
+            An :class:`~.goldfinchsong.aio.AsyncAPI` instance, a :class:`NoopAsyncAPI`
+                for a dry run, or ``None`` if the manager has no credentials.
+        """
+        if self.dry_run:
+            return NoopAsyncAPI()
+        if self.credentials:
+            from .aio import AsyncAPI
+            if self.chunked_threshold is not None:
+                return AsyncAPI(self.credentials, chunked_threshold=self.chunked_threshold)
+            return AsyncAPI(self.credentials)
+        return None
+
+    def prepare(self):
+        """
+        Computes the content and API instance ahead of their first use, so that
+        a later :meth:`post_tweet` only pays for the upload.
+        """
+        self.content
+        self.api
+
+    def reload_content(self):
+        """
+        Selects new content from the image directory, so that a long-lived
+        manager can post again without being rebuilt.
+
+        Returns:
+            tuple or ``None``: The new content tuple.
+        """
+        self.__dict__.pop('content', None)
+        self.upload_session = None
+        return self.content
 
     def post_tweet(self):
         """
@@ -28,7 +162,8 @@ class Manager:
 
             {
                 'image': 'just-the-image-name-not-full-path.jpg',
-                'delivered_on': '2016-05-04T17:06:54.987654+00:00'
+                'delivered_on': '2016-05-04T17:06:54.987654+00:00',
+                'generation': 0
             }
 
         The image name is the file name of the image alone, not the path to
@@ -36,6 +171,16 @@ class Manager:
         Python's built-in libraries omit the allowed 'Z' is in favor
         of just a ``+`` or ``-`` marker.  The **goldfinchsong** timestamps
         use UTC, so the increment will be ``00:00`` as in the above example.
+        The generation is the history's current posting cycle; see
+        :func:`~.goldfinchsong.utils.get_generation`.
+
+        If the manager has a posting queue, its cursor moves past the posted image.
+
+        An image larger than ``chunked_threshold`` is uploaded in chunks and then
+        posted with the ``api`` client's ``update_status`` method.
+
+        The ``upload`` and ``history_write`` phases and the ``bytes_uploaded``
+        counter are reported to the :mod:`~.goldfinchsong.metrics` hooks.
 
         Returns:
             tuple: A content tuple with the full image path, status text,
@@ -44,10 +189,81 @@ class Manager:
             Exception: Raises exception if content property is ``None``.
         """
         if self.content is not None:
-            self.api.update_with_media(self.content[0], self.content[1])
-            delivery_timestamp = datetime.now(tz=timezone.utc).isoformat()
-            tweet = {'image': self.content[2], 'delivered_on': delivery_timestamp}
-            self.db.insert(tweet)
+            with metrics.phase('upload'):
+                if self.chunked_threshold is not None and getsize(self.content[0]) > self.chunked_threshold:
+                    media_id = self.chunked_upload()
+                    self.api.update_status(status=self.content[1], media_ids=[media_id])
+                else:
+                    self.api.update_with_media(self.content[0], self.content[1])
+            self.count_upload()
+            self.save_delivery()
+            return self.content
+        else:
+            raise Exception("Can't post a tweet. No content available. Check image directory.")
+
+    def chunked_upload(self):
+        """
+        Uploads the content's image in chunks, resuming an interrupted upload of the same image.
+
+        Returns:
+            str: The media id.
+
+        Raises:
+            UploadInterrupted: Raises exception if the upload is interrupted. Its
+                session is kept in ``upload_session``.
+        """
+        import asyncio
+        from .aio import UploadInterrupted
+        session = self.upload_session
+        if session is not None and session.image_path != self.content[0]:
+            session = None
+        try:
+            media_id = asyncio.run(self.async_api.chunked_upload(self.content[0], session))
+        except UploadInterrupted as error:
+            self.upload_session = error.session
+            raise
+        self.upload_session = None
+        return media_id
+
+    async def post_tweet_async(self):
+        """
+        Attempts a tweet status post with image through the awaitable ``async_api`` client.
+
+        The history is saved as :meth:`post_tweet` describes. The save runs
+        synchronously on the event loop's thread, so history writes from posts
+        sharing a loop never overlap.
+
+        Returns:
+            tuple: A content tuple with the full image path, status text,
+                and image file name.
+        Raises:
+            Exception: Raises exception if content property is ``None``.
+        """
+        if self.content is not None:
+            with metrics.phase('upload'):
+                await self.async_api.update_with_media(self.content[0], self.content[1])
+            self.count_upload()
+            self.save_delivery()
             return self.content
         else:
             raise Exception("Can't post a tweet. No content available. Check image directory.")
+
+    def count_upload(self):
+        """Adds the posted image's size to the ``bytes_uploaded`` counter, if metrics are enabled."""
+        if metrics.hooks:
+            metrics.count('bytes_uploaded', getsize(self.content[0]))
+
+    def save_delivery(self):
+        """
+        Saves the posted content's image to the history and moves the posting
+        queue's cursor past it. A dry run saves nothing.
+        """
+        if self.dry_run:
+            return
+        with metrics.phase('history_write'):
+            delivery_timestamp = datetime.now(tz=timezone.utc).isoformat()
+            tweet = {'image': self.content[2], 'delivered_on': delivery_timestamp,
+                     'generation': utils.get_generation(self.db)}
+            self.db.insert(tweet)
+            if self.queue is not None:
+                self.queue.consume(self.content[2])
@@ -3,19 +3,56 @@ Command line interface module.
 
 The default logging configuration includes a ``StreamHandler`` and ``RotatingFileHandler``.
 
+TinyDB is imported by the functions that open databases, and ``tweepy`` is
+only imported when a tweet is posted, which keeps startup fast for ``--help``
+and actions that don't need them.
+
 Attributes:
+    ACCOUNT_SECTION_PREFIX (str): Prefix of the ini sections that configure
+        additional accounts for the *post-all* action.
+    ROOT_OPTION_PREFIX (str): Prefix of the ``[goldfinchsong.images]`` entries that
+        name the roots of an image library.
+    CREDENTIAL_OPTIONS (tuple): Twitter credential entries of an account section.
+    DB_OPTIONS (tuple): Entries read from the ``[goldfinchsong.db]`` section.
+    DEFAULT_DAEMON_INTERVAL (int): Seconds between posts in daemon mode when no
+        schedule is configured.
     LOGGER_CONFIG (dict): Logging configuration settings. Includes formatters, handlers, loggers
 """
 from collections import OrderedDict
 import configparser
+from functools import partial
 from logging import config as log_config
 from logging import getLogger
+import os
+from time import perf_counter
 import click
-from tinydb import TinyDB
+from . import metrics, profiling, utils
+from .cache import CACHE_SUFFIX, StatusTextCache
+from .catalog import CATALOG_SUFFIX, ImageCatalog
 from .classes import Manager
+from .derivatives import DERIVATIVE_SUFFIX, DerivativeCache
+from .fanout import DEFAULT_WORKERS, post_all, summarize
+from .history import INDEX_SUFFIX, History
+from .library import DEFAULT_SCAN_WORKERS, ImageLibrary, as_library
+from .preview import PREVIEW_SUFFIX, preview_library, write_report
+from .ratelimit import RetryPolicy, TokenBucket, is_retryable, post_with_retries
+from .scheduler import CronSchedule, IntervalSchedule, run_scheduled
+from .selection import QUEUE_SUFFIX, PostingQueue
+from .sqlite import SQLiteDatabase, import_tinydb
 
 logger = getLogger(__name__)
 
+ACCOUNT_SECTION_PREFIX = 'goldfinchsong.account.'
+
+ROOT_OPTION_PREFIX = 'root.'
+
+CREDENTIAL_OPTIONS = ('consumer_key', 'consumer_secret', 'access_token', 'access_token_secret')
+
+DB_OPTIONS = ('db_location', 'cache_location', 'catalog_location', 'queue_location', 'index_location',
+              'db_engine', 'db_storage', 'journal_compact_every')
+
+DEFAULT_DAEMON_INTERVAL = 86400
+
 LOGGER_CONFIG = {
     'version': 1,
     'formatters': {
@@ -50,6 +87,105 @@ LOGGER_CONFIG = {
 }
 
 
+def get_db(active_configuration):
+    """
+    Provides the TinyDB instance for the tweet history.
+
+    The ``db_storage`` option selects the TinyDB storage: *json*, TinyDB's
+    default storage, or *journal*, the append-only
+    :class:`~.goldfinchsong.storages.JournalStorage`.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        TinyDB
+
+    Raises:
+        ValueError: Raises exception if the ``db_storage`` option is not supported.
+    """
+    from tinydb import TinyDB
+    db_location = active_configuration['db_location']
+    db_storage = active_configuration.get('db_storage', 'json')
+    if db_storage == 'journal':
+        from .storages import JournalStorage
+        compact_every = active_configuration.get('journal_compact_every', 1000)
+        return TinyDB(db_location, storage=JournalStorage, compact_every=int(compact_every))
+    elif db_storage == 'json':
+        return TinyDB(db_location)
+    raise ValueError('The "{0}" db storage is not supported.'.format(db_storage))
+
+
+def get_location(active_configuration, option, suffix):
+    """
+    Provides the path of a file kept alongside the database.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+        option (str): The configuration option that sets the path, such as ``queue_location``.
+        suffix (str): Suffix of the default path, which sits next to the database file.
+
+    Returns:
+        str: The configured path or, by default, the database path with its extension
+            replaced by the suffix. See :func:`~.goldfinchsong.utils.sibling_location`.
+    """
+    if option in active_configuration:
+        return active_configuration[option]
+    return utils.sibling_location(active_configuration['db_location'], suffix)
+
+
+def get_derivatives(active_configuration):
+    """
+    Provides the cache of processed copies of oversized images, if the
+    ``[goldfinchsong.derivatives]`` section is configured.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        DerivativeCache or ``None``: A cache stored at the configured
+            ``derivative_location`` or, by default, next to the database file.
+    """
+    if not active_configuration.get('preprocess_images'):
+        return None
+    location = get_location(active_configuration, 'derivative_location', DERIVATIVE_SUFFIX)
+    options = dict()
+    for option in ('maximum_bytes', 'maximum_dimension', 'quality'):
+        if ''.join(['derivative_', option]) in active_configuration:
+            options[option] = int(active_configuration[''.join(['derivative_', option])])
+    return DerivativeCache(location, **options)
+
+
+def get_history(active_configuration):
+    """
+    Provides the tweet history.
+
+    The ``db_engine`` option selects where the history is kept: *tinydb*, the
+    default, or *sqlite*.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        History | SQLiteDatabase: For *tinydb*, a TinyDB instance wrapped with an
+            index of posted images. The index is stored at the configured
+            ``index_location`` or, by default, next to the TinyDB file. The
+            TinyDB file is only opened once the index needs it.
+            For *sqlite*, a :class:`~.goldfinchsong.sqlite.SQLiteDatabase`.
+
+    Raises:
+        ValueError: Raises exception if the ``db_engine`` option is not supported.
+    """
+    db_location = active_configuration['db_location']
+    db_engine = active_configuration.get('db_engine', 'tinydb')
+    if db_engine == 'sqlite':
+        return SQLiteDatabase(db_location)
+    elif db_engine != 'tinydb':
+        raise ValueError('The "{0}" db engine is not supported.'.format(db_engine))
+    return History(partial(get_db, active_configuration),
+                   get_location(active_configuration, 'index_location', INDEX_SUFFIX), db_location=db_location)
+
+
 def get_image_directory(command_line_input, active_configuration):
     """
     Provides path to image directory.
@@ -69,6 +205,257 @@ def get_image_directory(command_line_input, active_configuration):
     return 'images'
 
 
+def get_image_library(command_line_input, active_configuration):
+    """
+    Provides the image library.
+
+    The library's roots are the configured ``image_roots``, unless a directory
+    is passed on the command line. Otherwise, the library has the single root
+    :func:`get_image_directory` provides.
+
+    Arguments:
+        command_line_input (str | ``None``): A path that may optionally be submitted by user.
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        ImageLibrary: A library searched recursively if ``image_recursive`` is set,
+            and scanned with ``image_scan_workers`` threads.
+    """
+    if command_line_input is None and 'image_roots' in active_configuration:
+        roots = active_configuration['image_roots']
+    else:
+        roots = get_image_directory(command_line_input, active_configuration)
+    return ImageLibrary(roots, active_configuration.get('image_recursive', False),
+                        int(active_configuration.get('image_scan_workers', DEFAULT_SCAN_WORKERS)))
+
+
+def get_cache(active_configuration):
+    """
+    Provides the persistent status text cache.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        StatusTextCache: A cache stored at the configured ``cache_location`` or,
+            by default, next to the database file.
+    """
+    return StatusTextCache(get_location(active_configuration, 'cache_location', CACHE_SUFFIX))
+
+
+def get_catalog(active_configuration):
+    """
+    Provides the persistent image catalog.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        ImageCatalog: A catalog stored at the configured ``catalog_location`` or,
+            by default, next to the TinyDB file.
+    """
+    return ImageCatalog(get_location(active_configuration, 'catalog_location', CATALOG_SUFFIX))
+
+
+def get_queue(active_configuration):
+    """
+    Provides the persisted posting queue.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        PostingQueue: A queue stored at the configured ``queue_location`` or,
+            by default, next to the TinyDB file.
+    """
+    return PostingQueue(get_location(active_configuration, 'queue_location', QUEUE_SUFFIX))
+
+
+def get_retry_policy(active_configuration):
+    """
+    Provides the retry policy for failed posts.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        RetryPolicy: A policy with the configured ``retries``, ``base_delay``
+            and ``maximum_delay``, or their defaults.
+    """
+    options = dict()
+    if 'retry_retries' in active_configuration:
+        options['retries'] = int(active_configuration['retry_retries'])
+    for option in ('base_delay', 'maximum_delay'):
+        if ''.join(['retry_', option]) in active_configuration:
+            options[option] = float(active_configuration[''.join(['retry_', option])])
+    return RetryPolicy(**options)
+
+
+def get_token_bucket(active_configuration):
+    """
+    Provides a token bucket that paces an account's posts.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        TokenBucket: A bucket with the configured ``bucket_capacity`` and
+            ``bucket_period``, or their defaults.
+    """
+    options = dict()
+    if 'retry_bucket_capacity' in active_configuration:
+        options['capacity'] = int(active_configuration['retry_bucket_capacity'])
+    if 'retry_bucket_period' in active_configuration:
+        options['period'] = float(active_configuration['retry_bucket_period'])
+    return TokenBucket(**options)
+
+
+def get_schedule(active_configuration):
+    """
+    Provides the daemon mode posting schedule.
+
+    A cron-like ``daemon_schedule`` takes precedence over a ``daemon_interval``.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        CronSchedule | IntervalSchedule: The configured schedule. Default: an
+            interval of ``DEFAULT_DAEMON_INTERVAL`` seconds.
+    """
+    if 'daemon_schedule' in active_configuration:
+        return CronSchedule(active_configuration['daemon_schedule'])
+    elif 'daemon_interval' in active_configuration:
+        return IntervalSchedule(float(active_configuration['daemon_interval']))
+    return IntervalSchedule(DEFAULT_DAEMON_INTERVAL)
+
+
+def get_metric_hooks(active_configuration):
+    """
+    Provides the metrics exporters configured in the ``[goldfinchsong.metrics]`` section.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        list: A :class:`~.goldfinchsong.metrics.JSONLinesExporter` for a configured
+            ``metrics_jsonl_location`` and a :class:`~.goldfinchsong.metrics.PrometheusExporter`
+            for a configured ``metrics_prometheus_location``. Empty without either,
+            which leaves metrics disabled.
+    """
+    hooks = list()
+    if 'metrics_jsonl_location' in active_configuration:
+        hooks.append(metrics.JSONLinesExporter(active_configuration['metrics_jsonl_location']))
+    if 'metrics_prometheus_location' in active_configuration:
+        hooks.append(metrics.PrometheusExporter(active_configuration['metrics_prometheus_location']))
+    return hooks
+
+
+def get_manager(active_configuration, image_directory):
+    """
+    Builds a :class:`~.goldfinchsong.classes.Manager` along with its tweet
+    history, image catalog, posting queue, status text cache and, if configured,
+    derivative cache. With a ``dry_run`` option, which the ``--profile`` flag
+    sets, the manager doesn't post or save the history.
+
+    Reading the history is reported to the :mod:`~.goldfinchsong.metrics` hooks
+    as the ``history_read`` phase, along with the ``history_size`` gauge.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+        image_directory (str | ImageLibrary): File path to the image directory, or an image library.
+
+    Returns:
+        Manager
+    """
+    chunked_threshold = active_configuration.get('chunked_upload_threshold')
+    with metrics.phase('history_read'):
+        history = get_history(active_configuration)
+        if metrics.hooks:
+            metrics.gauge('history_size', len(history))
+    return Manager(active_configuration['credentials'],
+                   history,
+                   image_directory,
+                   active_configuration['text_conversions'],
+                   get_catalog(active_configuration),
+                   get_queue(active_configuration),
+                   get_cache(active_configuration),
+                   int(chunked_threshold) if chunked_threshold is not None else None,
+                   get_derivatives(active_configuration),
+                   active_configuration.get('dry_run', False))
+
+
+def preprocess_images(active_configuration, image_directory):
+    """
+    Makes the missing derivatives of the oversized images in the image directory.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+        image_directory (str | ImageLibrary): File path to the image directory, or an image library.
+
+    Returns:
+        dict: Derivative file paths keyed to the source file paths of oversized images.
+    """
+    derivatives = get_derivatives(active_configuration)
+    image_library = as_library(image_directory)
+    images = image_library.images(get_catalog(active_configuration))
+    processes = int(active_configuration.get('derivative_processes', 1))
+    return derivatives.prepare([image_library.path(image) for image in images], processes)
+
+
+def preview_images(active_configuration, image_directory):
+    """
+    Writes the status text and compaction stage of every image in the image
+    directory to a report, without posting.
+
+    The report is written to the configured ``preview_location`` or, by default,
+    next to the database file. The status texts are computed on the configured
+    number of ``preview_processes``, by default one per CPU.
+
+    Arguments:
+        active_configuration (dict): Active configuration options.
+        image_directory (str | ImageLibrary): File path to the image directory, or an image library.
+
+    Returns:
+        tuple: The report's file path and the number of images that needed each
+            compaction stage, keyed to stage names.
+    """
+    location = get_location(active_configuration, 'preview_location', PREVIEW_SUFFIX)
+    processes = int(active_configuration.get('preview_processes', os.cpu_count() or 1))
+    images = list(as_library(image_directory).images(get_catalog(active_configuration)))
+    posted_files = utils.get_posted_files(get_history(active_configuration))
+    rows = preview_library(images, posted_files, active_configuration['text_conversions'], processes=processes)
+    return location, write_report(rows, location)
+
+
+def post_scheduled_tweet(manager, policy=None, bucket=None):
+    """
+    Posts the manager's content and selects content for the next post.
+
+    The post is retried with :func:`~.goldfinchsong.ratelimit.post_with_retries`.
+    If it still fails with a retryable error, such as a rate limit, the content
+    is kept for the next scheduled post instead of selecting new content.
+    Failures are logged rather than raised so that daemon mode keeps running.
+
+    Arguments:
+        manager (Manager): A long-lived manager.
+        policy (RetryPolicy): Retry policy for the post.
+        bucket (TokenBucket): The account's token bucket.
+    """
+    try:
+        content = post_with_retries(manager, policy, bucket)
+        logger.info('Sent POST with image {0} and text {1}'.format(content[0], content[1]))
+    except Exception as error:
+        logger.exception('Scheduled POST failed.')
+        if is_retryable(error) and manager.content is not None:
+            logger.info('Keeping image {0} for the next scheduled POST.'.format(manager.content[0]))
+            return
+    try:
+        manager.reload_content()
+    except Exception:
+        logger.exception('Could not load content for the next scheduled POST.')
+
+
 def parse_configuration(config_parser):
     """
     Extracts credential and text conversion information.
@@ -102,18 +489,244 @@ def parse_configuration(config_parser):
         images_configuration = config_parser['goldfinchsong.images']
         if 'image_directory' in images_configuration:
             active_configuration['image_directory'] = images_configuration['image_directory']
+        if 'chunked_upload_threshold' in images_configuration:
+            active_configuration['chunked_upload_threshold'] = images_configuration['chunked_upload_threshold']
+        if 'recursive' in images_configuration:
+            active_configuration['image_recursive'] = images_configuration.getboolean('recursive')
+        if 'scan_workers' in images_configuration:
+            active_configuration['image_scan_workers'] = images_configuration['scan_workers']
+        image_roots = get_image_roots(images_configuration)
+        if image_roots:
+            active_configuration['image_roots'] = image_roots
     if config_parser.has_section('goldfinchsong.db'):
         db_configuration = config_parser['goldfinchsong.db']
-        if 'db_location' in db_configuration:
-            active_configuration['db_location'] = db_configuration['db_location']
+        for option in DB_OPTIONS:
+            if option in db_configuration:
+                active_configuration[option] = db_configuration[option]
+    if config_parser.has_section('goldfinchsong.daemon'):
+        daemon_configuration = config_parser['goldfinchsong.daemon']
+        if 'interval' in daemon_configuration:
+            active_configuration['daemon_interval'] = daemon_configuration['interval']
+        if 'schedule' in daemon_configuration:
+            active_configuration['daemon_schedule'] = daemon_configuration['schedule']
+    if config_parser.has_section('goldfinchsong.derivatives'):
+        active_configuration['preprocess_images'] = True
+        derivatives_configuration = config_parser['goldfinchsong.derivatives']
+        if 'location' in derivatives_configuration:
+            active_configuration['derivative_location'] = derivatives_configuration['location']
+        for option in ('maximum_bytes', 'maximum_dimension', 'quality', 'processes'):
+            if option in derivatives_configuration:
+                active_configuration[''.join(['derivative_', option])] = derivatives_configuration[option]
+    if config_parser.has_section('goldfinchsong.retry'):
+        retry_configuration = config_parser['goldfinchsong.retry']
+        for option in ('retries', 'base_delay', 'maximum_delay', 'bucket_capacity', 'bucket_period'):
+            if option in retry_configuration:
+                active_configuration[''.join(['retry_', option])] = retry_configuration[option]
+    if config_parser.has_section('goldfinchsong.fanout'):
+        if 'workers' in config_parser['goldfinchsong.fanout']:
+            active_configuration['fanout_workers'] = config_parser['goldfinchsong.fanout']['workers']
+    if config_parser.has_section('goldfinchsong.preview'):
+        preview_configuration = config_parser['goldfinchsong.preview']
+        for option in ('location', 'processes'):
+            if option in preview_configuration:
+                active_configuration[''.join(['preview_', option])] = preview_configuration[option]
+    if config_parser.has_section('goldfinchsong.metrics'):
+        metrics_configuration = config_parser['goldfinchsong.metrics']
+        for option in ('jsonl_location', 'prometheus_location'):
+            if option in metrics_configuration:
+                active_configuration[''.join(['metrics_', option])] = metrics_configuration[option]
     return active_configuration
 
 
+def get_image_roots(section):
+    """
+    Arguments:
+        section: A configuration section.
+
+    Returns:
+        OrderedDict: Root directory paths keyed to root names, from the section's
+            ``root.<name>`` entries, in file order.
+    """
+    image_roots = OrderedDict()
+    for key, value in section.items():
+        if key.startswith(ROOT_OPTION_PREFIX):
+            image_roots[key[len(ROOT_OPTION_PREFIX):]] = value
+    return image_roots
+
+
+def parse_accounts(config_parser, active_configuration):
+    """
+    Extracts the account configurations for the *post-all* action.
+
+    Every ``[goldfinchsong.account.<name>]`` section configures one account.
+    The section holds the account's credentials, the :data:`CREDENTIAL_OPTIONS` entries,
+    its own ``db_location`` and, optionally, the other ``[goldfinchsong.db]`` entries and
+    an ``image_directory`` or ``root.<name>`` entries. Text conversions, the image library and log settings
+    are shared from the active configuration. Database entries and the derivative cache location
+    are not shared, so that every account keeps a separate history.
+
+    Args:
+        config_parser: A ``ConfigParser`` from the standard library
+            loaded with local configuration file.
+        active_configuration (dict): Active configuration options.
+
+    Returns:
+        OrderedDict: Account configurations keyed to account names, in file order.
+
+    Raises:
+        ValueError: Raises exception if an account section has no ``db_location`` entry
+            or has an entry that isn't a credential, database, image or derivative
+            setting, such as a misspelled ``image_directory``.
+    """
+    accounts = OrderedDict()
+    for section in config_parser.sections():
+        if not section.startswith(ACCOUNT_SECTION_PREFIX):
+            continue
+        name = section[len(ACCOUNT_SECTION_PREFIX):]
+        account_section = config_parser[section]
+        if 'db_location' not in account_section:
+            raise ValueError('The "{0}" account needs its own db_location.'.format(name))
+        account_configuration = {key: value for key, value in active_configuration.items()
+                                 if key not in DB_OPTIONS and key != 'derivative_location'}
+        if 'image_directory' in account_section:
+            account_configuration.pop('image_roots', None)
+        image_roots = get_image_roots(account_section)
+        if image_roots:
+            account_configuration['image_roots'] = image_roots
+        credentials = dict()
+        for key, value in account_section.items():
+            if key in DB_OPTIONS or key in ('image_directory', 'derivative_location'):
+                account_configuration[key] = value
+            elif key in CREDENTIAL_OPTIONS:
+                credentials[key] = value
+            elif not key.startswith(ROOT_OPTION_PREFIX):
+                raise ValueError('The "{0}" account has an unknown "{1}" entry.'.format(name, key))
+        account_configuration['credentials'] = credentials
+        accounts[name] = account_configuration
+    return accounts
+
+
+def post_accounts(accounts, workers=DEFAULT_WORKERS, policy=None):
+    """
+    Posts a tweet for every account concurrently and logs an aggregated report.
+
+    Each account gets its own :class:`~.goldfinchsong.classes.Manager`, history
+    and API client. Each account's posts are paced by its own token bucket and
+    retried with ``policy``. A failing account is logged and reported without
+    affecting the others.
+
+    Arguments:
+        accounts (dict): Account configurations keyed to account names, as
+            :func:`parse_accounts` provides them.
+        workers (int): Maximum number of accounts posting at the same time.
+        policy (RetryPolicy): Retry policy for every post.
+
+    Returns:
+        dict: The :func:`~.goldfinchsong.fanout.summarize` report.
+    """
+    def build_manager(name):
+        account_configuration = accounts[name]
+        return get_manager(account_configuration, get_image_library(None, account_configuration))
+
+    buckets = {name: get_token_bucket(account_configuration) for name, account_configuration in accounts.items()}
+    start = perf_counter()
+    results = post_all(accounts, build_manager, workers, policy, buckets)
+    report = summarize(results, perf_counter() - start)
+    for result in results:
+        if result['error'] is None:
+            logger.info('Account {0} sent POST with image {1} and text {2} in {3:.2f}s'.format(
+                result['account'], result['image'], result['status_text'], result['seconds']))
+        else:
+            logger.error('Account {0} failed in {1:.2f}s: {2}'.format(
+                result['account'], result['seconds'], result['error']))
+    logger.info('POST-ALL finished in {0:.2f}s: {1} posted, {2} failed.'.format(
+        report['seconds'], report['posted'], report['failed']))
+    metrics.count('accounts_posted', report['posted'])
+    metrics.count('accounts_failed', report['failed'])
+    return report
+
+
+def run_action(action, active_configuration, config_parser, images=None, source=None):
+    """
+    Runs a :func:`run` action.
+
+    Arguments:
+        action (str): An action name. Either *post*, *daemon*, *post-all*, *preprocess*, *preview* or *import*.
+        active_configuration (dict): Active configuration options.
+        config_parser: The ``ConfigParser`` the active configuration was parsed from.
+        images (str): File path to a directory with images that will be uploaded by tweets.
+        source (str): File path to a TinyDB file for the *import* action.
+    """
+    if action == 'post':
+        logger.info('POST requested.')
+        image_library = get_image_library(images, active_configuration)
+        manager = get_manager(active_configuration, image_library)
+        content = post_with_retries(manager, get_retry_policy(active_configuration),
+                                    get_token_bucket(active_configuration))
+        logger.info('Sent POST with image {0} and text {1}'.format(content[0], content[1]))
+    elif action == 'daemon':
+        logger.info('DAEMON requested.')
+        image_library = get_image_library(images, active_configuration)
+        manager = get_manager(active_configuration, image_library)
+        manager.prepare()
+        schedule = get_schedule(active_configuration)
+        policy = get_retry_policy(active_configuration)
+        bucket = get_token_bucket(active_configuration)
+
+        def post_and_flush():
+            post_scheduled_tweet(manager, policy, bucket)
+            # export every scheduled post, since the daemon doesn't finish
+            metrics.flush()
+
+        try:
+            run_scheduled(post_and_flush, schedule)
+        except KeyboardInterrupt:
+            logger.info('DAEMON stopped.')
+    elif action == 'post-all':
+        logger.info('POST-ALL requested.')
+        accounts = parse_accounts(config_parser, active_configuration)
+        if not accounts:
+            logger.error('Posting to all accounts requires [goldfinchsong.account.<name>] sections.')
+            return
+        post_accounts(accounts, int(active_configuration.get('fanout_workers', DEFAULT_WORKERS)),
+                      get_retry_policy(active_configuration))
+    elif action == 'preprocess':
+        logger.info('PREPROCESS requested.')
+        if not active_configuration.get('preprocess_images'):
+            logger.error('Preprocessing requires a [goldfinchsong.derivatives] section.')
+            return
+        image_library = get_image_library(images, active_configuration)
+        derivatives = preprocess_images(active_configuration, image_library)
+        logger.info('{0} oversized images have derivatives.'.format(len(derivatives)))
+    elif action == 'preview':
+        logger.info('PREVIEW requested.')
+        image_library = get_image_library(images, active_configuration)
+        location, stages = preview_images(active_configuration, image_library)
+        logger.info('Wrote preview of {0} images to {1}: {2}'.format(
+            sum(stages.values()), location,
+            ', '.join('{0} {1}'.format(count, stage) for stage, count in stages.items())))
+    elif action == 'import':
+        logger.info('IMPORT requested.')
+        if active_configuration.get('dry_run'):
+            logger.error('The import action writes the database, so it can\'t run as a dry run.')
+            return
+        if active_configuration.get('db_engine') != 'sqlite' or source is None:
+            logger.error('Importing requires db_engine=sqlite and a --source TinyDB file.')
+            return
+        database = SQLiteDatabase(active_configuration['db_location'])
+        count = import_tinydb(source, database)
+        logger.info('Imported {0} tweets from {1}'.format(count, source))
+    else:
+        logger.error('The "{0}" action is not supported.'.format(action))
+
+
 @click.command()
 @click.option('--action', default='post')
 @click.option('--conf', default='goldfinchsong.ini')
 @click.option('--images', default=None)
-def run(action, conf, images):
+@click.option('--source', default=None)
+@click.option('--profile', is_flag=True, default=False)
+def run(action, conf, images, source, profile):
     """
     Uploads an image tweet.
 
@@ -121,30 +734,67 @@ def run(action, conf, images):
     work; this function contributes logic for extracting configuration
     settings and creating a ``TinyDB`` instance.
 
+    The *daemon* action keeps a single manager, with its API client, database
+    and catalog, in memory and posts on the configured schedule until interrupted.
+
+    The *post-all* action posts a tweet for every ``[goldfinchsong.account.<name>]``
+    section concurrently and logs an aggregated report.
+
+    The *preprocess* action makes processed copies of the image directory's
+    oversized images ahead of posting.
+
+    The *preview* action writes every image's status text and the compaction
+    stage it needed to a CSV or JSON report, without posting.
+
+    The *import* action copies the tweet history from the TinyDB file at ``source``
+    into the configured SQLite database.
+
+    If a ``[goldfinchsong.metrics]`` section is configured, the action's phases
+    and counters are exported when it finishes. See :mod:`~.goldfinchsong.metrics`.
+
+    With ``profile``, the action runs under ``cProfile`` and ``tracemalloc``, and
+    the reports are written next to the log file. Managers are built for a dry
+    run, so nothing is posted and neither the history nor the posting queue
+    changes. The *import* action, which writes the SQLite database, is refused.
+    The catalog, status text cache, derivatives and metrics are still written,
+    as in a normal run. See :mod:`~.goldfinchsong.profiling`.
+
     Arguments:
-        action (str): An action name.
+        action (str): An action name. Either *post*, *daemon*, *post-all*, *preprocess*, *preview* or *import*.
         conf (str): File path for a configuration file. By default, this
             function looks for ``goldfinchsong.ini`` under the directory from
             which the user executes the function.
         images (str): File path to a directory with images that will be uploaded by tweets.
+        source (str): File path to a TinyDB file for the *import* action.
+        profile (bool): If ``True``, profiles a dry run of the action.
     """
     config_parser = configparser.ConfigParser()
     # make parsing of config file names case-sensitive
     config_parser.optionxform = str
     config_parser.read(conf)
     if config_parser.has_section('goldfinchsong'):
+        start = perf_counter()
         active_configuration = parse_configuration(config_parser)
-        if action == 'post':
-            logger.info('POST requested.')
-            image_directory = get_image_directory(images, active_configuration)
-            db = TinyDB(active_configuration['db_location'])
-            manager = Manager(active_configuration['credentials'],
-                              db,
-                              image_directory,
-                              active_configuration['text_conversions'])
-            content = manager.post_tweet()
-            logger.info('Sent POST with image {0} and text {1}'.format(content[0], content[1]))
-        else:
-            logger.error('The "{0}" action is not supported.'.format(action))
+        configuration_seconds = perf_counter() - start
+        metric_hooks = get_metric_hooks(active_configuration)
+        for hook in metric_hooks:
+            metrics.add_hook(hook)
+            hook.on_phase('configuration', configuration_seconds)
+        try:
+            with metrics.phase(''.join(['action.', action])):
+                if profile:
+                    active_configuration['dry_run'] = True
+                    log_location = LOGGER_CONFIG['handlers']['file']['filename']
+                    stats_location, allocations_location = profiling.get_profile_locations(log_location)
+                    logger.info('PROFILE requested; nothing will be posted.')
+                    profiling.profile(lambda: run_action(action, active_configuration, config_parser,
+                                                         images, source), stats_location, allocations_location)
+                    logger.info('Wrote profile to {0} and {1}'.format(stats_location, allocations_location))
+                else:
+                    run_action(action, active_configuration, config_parser, images, source)
+        finally:
+            metrics.flush()
+            for hook in metric_hooks:
+                metrics.remove_hook(hook)
     else:
-        logger.error('Twitter credentials and DB settings must be placed within ini file.')
\ No newline at end of file
+        logger.error('Twitter credentials and DB settings must be placed within ini file.')
@@ -0,0 +1,261 @@
+"""
+Compaction module. Holds precompiled machinery for shortening status texts,
+so that large text conversion tables are compiled once rather than on every status.
+
+The :mod:`~.goldfinchsong.utils` compaction functions are thin wrappers around
+this module. :func:`compact_text` runs the whole abbreviation, vowel elision
+and word chopping sequence while splitting the text into words only once.
+
+Attributes:
+    STAGES (tuple): Names of the compaction stages, in the order they're tried.
+        :func:`compact_text` reports the stage that produced its result.
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from heapq import heappop, heappush
+from itertools import accumulate
+import re
+
+REGEX_SPECIAL_CHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+STAGES = ('none', 'abbreviation', 'elision', 'chop')
+
+VOWEL_REGEX = re.compile(r'\B[aeiou]\B', re.IGNORECASE)
+
+WORD_REGEX = re.compile(r'\w+')
+
+
+class AbbreviationMatcher:
+    """
+    A text conversion table compiled for repeated use by
+    :func:`~.goldfinchsong.utils.apply_abbreviations`.
+
+    Each conversion keeps its own precompiled ``\\b...\\b`` regex. Conversion keys
+    without regex special characters that start with a word character are also
+    indexed by their first word, the key's leading run of ``\\w`` characters.
+    Such a key can only match where that word is a whole word of the text, so
+    the text's distinct words, found with a single regex scan, give every
+    conversion that may match. Other conversions' substitutions can be skipped.
+    Keys with regex special characters or a leading non-word character are always tried.
+
+    Attributes:
+        conversions (list): ``(regex, abbreviated)`` pairs in table order.
+        first_words (dict): Lists of conversion indices keyed to the first word of their keys.
+        pattern_indices (list): Sorted indices of conversions that are always tried.
+    """
+    def __init__(self, conversion_items):
+        self.conversions = list()
+        self.first_words = dict()
+        self.pattern_indices = list()
+        for index, (not_abbreviated, abbreviated) in enumerate(conversion_items):
+            pattern = ''.join([r'\b', not_abbreviated, r'\b'])
+            self.conversions.append((re.compile(pattern), abbreviated))
+            first_word = WORD_REGEX.match(not_abbreviated)
+            if REGEX_SPECIAL_CHARACTERS.isdisjoint(not_abbreviated) and first_word is not None:
+                self.first_words.setdefault(first_word.group(), list()).append(index)
+            else:
+                self.pattern_indices.append(index)
+
+    def candidates(self, text):
+        """
+        Finds conversions that may match a text.
+
+        Arguments:
+            text (str): A status text.
+
+        Returns:
+            list: Sorted conversion indices.
+        """
+        return sorted(self.find_candidates(set(WORD_REGEX.findall(text)), set(self.pattern_indices)))
+
+    def find_candidates(self, words, found):
+        """
+        Arguments:
+            words (set): Distinct words of a text.
+            found (set): Conversion indices to add to.
+
+        Returns:
+            set: ``found``, with the indices of conversions whose keys start with one of the words.
+        """
+        first_words = self.first_words
+        for word in words:
+            indices = first_words.get(word)
+            if indices is not None:
+                found.update(indices)
+        return found
+
+    def apply(self, text, maximum_length=117):
+        """
+        Abbreviates words until the text does not exceed the maximum length.
+
+        Conversions are tried in table order and the length is checked after
+        each one, exactly as :func:`~.goldfinchsong.utils.apply_abbreviations`
+        describes. Conversions whose keys don't occur in the text are skipped,
+        since substituting them can't change the text.
+
+        Pending candidates are kept in a heap. After a substitution, only the
+        words it created are looked up, since candidates for the other words
+        are already pending.
+
+        Arguments:
+            text (str): A status text.
+            maximum_length (int): Maximum character length.
+
+        Returns:
+            str
+        """
+        new_text = text
+        last_index = -1
+        if self.conversions and len(new_text) <= maximum_length:
+            # the length is only checked after the first substitution
+            regex, abbreviated = self.conversions[0]
+            new_text = regex.sub(abbreviated, new_text)
+            if len(new_text) <= maximum_length:
+                return new_text
+            last_index = 0
+        words = set(WORD_REGEX.findall(new_text))
+        pending = self.find_candidates(words, set(self.pattern_indices))
+        candidates = sorted(pending)
+        while candidates:
+            index = heappop(candidates)
+            if index <= last_index:
+                continue
+            last_index = index
+            regex, abbreviated = self.conversions[index]
+            substituted_text = regex.sub(abbreviated, new_text)
+            if substituted_text != new_text:
+                new_text = substituted_text
+                if len(new_text) <= maximum_length:
+                    return new_text
+                # a substitution can create matches for later conversions
+                new_words = set(WORD_REGEX.findall(new_text))
+                for candidate in self.find_candidates(new_words - words, set()):
+                    if candidate > last_index and candidate not in pending:
+                        pending.add(candidate)
+                        heappush(candidates, candidate)
+                words = new_words
+        return new_text
+
+
+@lru_cache(maxsize=32)
+def compile_conversion_items(conversion_items):
+    """
+    Arguments:
+        conversion_items (tuple): ``(not_abbreviated, abbreviated)`` pairs in table order.
+
+    Returns:
+        AbbreviationMatcher: A matcher, cached for the most recently used tables.
+    """
+    return AbbreviationMatcher(conversion_items)
+
+
+def compile_abbreviations(abbreviations):
+    """
+    Provides the compiled matcher for a text conversion table.
+
+    Arguments:
+        abbreviations (dict): Words keyed to their abbreviations, ``None``, or an
+            already compiled ``AbbreviationMatcher``, which is returned as is.
+
+    Returns:
+        AbbreviationMatcher
+    """
+    if isinstance(abbreviations, AbbreviationMatcher):
+        return abbreviations
+    items = tuple(abbreviations.items()) if abbreviations else tuple()
+    return compile_conversion_items(items)
+
+
+def elide_words(words, maximum_length=117):
+    """
+    Removes non-boundary vowels word by word, from the last word to the first,
+    until the words fit the maximum length.
+
+    The length check matches :func:`~.goldfinchsong.utils.apply_vowel_elision`:
+    the complete and elided words are measured as two separately joined groups,
+    so the space between the groups isn't counted. Running lengths are kept,
+    so the function is linear in the number of words.
+
+    Arguments:
+        words (list): The words of a status text.
+        maximum_length (int): Maximum character length.
+
+    Returns:
+        tuple: The resulting words and a list of their lengths.
+    """
+    if not words:
+        return list(), list()
+    lengths = [len(word) for word in words]
+    elided_words = list()
+    elided_lengths = list()
+    complete_characters = sum(lengths)
+    elided_characters = 0
+    for index in range(len(words) - 1, -1, -1):
+        elided_word = VOWEL_REGEX.sub('', words[index])
+        elided_words.append(elided_word)
+        elided_lengths.append(len(elided_word))
+        complete_characters -= lengths[index]
+        elided_characters += elided_lengths[-1]
+        # joined lengths, counting the spaces between words within each group
+        complete_word_length = complete_characters + index - 1 if index else 0
+        elided_word_length = elided_characters + len(elided_words) - 1
+        if (complete_word_length + elided_word_length) <= maximum_length:
+            break
+    elided_words.reverse()
+    elided_lengths.reverse()
+    return words[:index] + elided_words, lengths[:index] + elided_lengths
+
+
+def chop_count(lengths, maximum_length=117):
+    """
+    Finds how many leading words to keep so that they fit the maximum length.
+
+    As with :func:`~.goldfinchsong.utils.chop_words`, at least the last word is
+    always removed. The cut point is found by bisecting the joined lengths, which
+    are computed from prefix sums of the word lengths.
+
+    Arguments:
+        lengths (list): Word lengths.
+        maximum_length (int): Maximum character length.
+
+    Returns:
+        int or ``None``: ``None`` if there are no words or if a negative
+            maximum length can't be met even by removing every word.
+    """
+    if not lengths:
+        return None
+    prefix_sums = accumulate(lengths[:-1], initial=0)
+    # the joined length of the first k words adds k - 1 spaces
+    joined_lengths = [prefix_sum + count - 1 if count else 0 for count, prefix_sum in enumerate(prefix_sums)]
+    count = bisect_right(joined_lengths, maximum_length) - 1
+    return count if count >= 0 else None
+
+
+def compact_text(candidate_text, maximum_length=117, text_conversions=None):
+    """
+    Shortens a text exactly as :func:`~.goldfinchsong.utils.to_compact_text`
+    does and reports which stage was needed.
+
+    Abbreviations are applied to the text. The result is then split into words
+    once. The elision and chopping stages share those words and their lengths,
+    so chopping needs no trial joins.
+
+    Arguments:
+        candidate_text (str): Original text.
+        maximum_length (int): Maximum character length.
+        text_conversions (dict): Words keyed to their abbreviations, ``None``, or
+            an ``AbbreviationMatcher`` compiled from them.
+
+    Returns:
+        tuple: The compact text and the name of the last stage applied, one of ``STAGES``.
+    """
+    if len(candidate_text) <= maximum_length:
+        return candidate_text, 'none'
+    text = compile_abbreviations(text_conversions).apply(candidate_text, maximum_length)
+    if len(text) <= maximum_length:
+        return text, 'abbreviation'
+    words, lengths = elide_words(text.split(), maximum_length)
+    if sum(lengths) + max(len(lengths) - 1, 0) <= maximum_length:
+        return ' '.join(words), 'elision'
+    count = chop_count(lengths, maximum_length)
+    return (' '.join(words[:count]) if count is not None else ''), 'chop'
@@ -0,0 +1,335 @@
+"""
+Derivatives module. Resizes or recompresses images that exceed upload limits
+into a cache directory ahead of posting, so an oversized image doesn't fail
+after it's been selected.
+
+Derivatives are keyed by the source image's content hash and the processing
+parameters, so an image is only processed once for a given set of limits,
+even if it's renamed or moved. Processing needs the optional Pillow package,
+which is installed with the ``images`` extra: ``pip install goldfinchsong[images]``.
+
+Attributes:
+    DEFAULT_MAXIMUM_BYTES (int): Largest image size in bytes uploaded as is.
+    DEFAULT_MAXIMUM_DIMENSION (int): Largest width or height in pixels of a derivative.
+    DEFAULT_QUALITY (int): JPEG quality a derivative is first encoded with.
+    MINIMUM_QUALITY (int): Lowest JPEG quality tried before a derivative is scaled down further.
+    DERIVATIVE_SUFFIX (str): Suffix of the derivative cache directory's default path, which replaces the
+        database file's extension. See :func:`~.goldfinchsong.utils.sibling_location`.
+"""
+import hashlib
+import io
+import json
+from logging import getLogger
+import os
+from os.path import abspath, join
+from . import utils
+
+logger = getLogger(__name__)
+
+DEFAULT_MAXIMUM_BYTES = 5 * 1024 * 1024
+
+DEFAULT_MAXIMUM_DIMENSION = 4096
+
+DEFAULT_QUALITY = 85
+
+MINIMUM_QUALITY = 45
+
+DERIVATIVE_SUFFIX = '.derivatives'
+
+
+def hash_file(location, block_size=1024 * 1024):
+    """
+    Arguments:
+        location (str): File path.
+        block_size (int): Bytes read at a time.
+
+    Returns:
+        str: A SHA-256 hex digest of the file's content.
+    """
+    digest = hashlib.sha256()
+    with open(location, 'rb') as binary_file:
+        for block in iter(lambda: binary_file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_derivative(source_location, derivative_location, maximum_bytes=DEFAULT_MAXIMUM_BYTES,
+                    maximum_dimension=DEFAULT_MAXIMUM_DIMENSION, quality=DEFAULT_QUALITY):
+    """
+    Writes a resized and recompressed copy of an image.
+
+    The image is scaled to fit ``maximum_dimension`` and encoded as a JPEG, or
+    as a PNG if it has transparency. The JPEG quality is lowered step by step,
+    and then the image is scaled down further, until the encoding fits
+    ``maximum_bytes``.
+
+    Arguments:
+        source_location (str): File path of the source image.
+        derivative_location (str): File path for the derivative, without an extension.
+        maximum_bytes (int): Largest size in bytes of the derivative.
+        maximum_dimension (int): Largest width or height in pixels of the derivative.
+        quality (int): JPEG quality of the first encoding attempt.
+
+    Returns:
+        str: File path of the derivative, with a ``.jpg`` or ``.png`` extension.
+
+    Raises:
+        ImportError: Raises exception if Pillow is not installed.
+        ValueError: Raises exception if the image is animated. Animated images
+            would lose their animation, so they're left to chunked uploads. Also
+            raises if even a single pixel encoding is larger than ``maximum_bytes``.
+    """
+    from PIL import Image
+    with Image.open(source_location) as source:
+        if getattr(source, 'is_animated', False):
+            raise ValueError('{0} is animated.'.format(source_location))
+        transparent = source.mode in ('RGBA', 'LA', 'PA') or 'transparency' in source.info
+        image = source.convert('RGBA' if transparent else 'RGB')
+    extension = '.png' if transparent else '.jpg'
+    scale = min(1.0, maximum_dimension / max(image.size))
+    while True:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        resized = image.resize(size, Image.LANCZOS) if size != image.size else image
+        for attempt_quality in range(quality, MINIMUM_QUALITY - 1, -10) if not transparent else [None]:
+            buffer = io.BytesIO()
+            if transparent:
+                resized.save(buffer, 'PNG', optimize=True)
+            else:
+                resized.save(buffer, 'JPEG', quality=attempt_quality, optimize=True)
+            if buffer.tell() <= maximum_bytes:
+                location = ''.join([derivative_location, extension])
+                utils.atomic_write(location, buffer.getvalue())
+                return location
+        if size == (1, 1):
+            raise ValueError('{0} does not fit in {1} bytes at any size.'.format(source_location, maximum_bytes))
+        scale *= 0.8
+
+
+def make_derivative_or_none(processor, *arguments):
+    """
+    Calls a derivative processor, logging failures instead of raising them, so
+    that one image can't stop :meth:`DerivativeCache.prepare`.
+
+    Arguments:
+        processor: A function like :func:`make_derivative`.
+        arguments: The processor's arguments.
+
+    Returns:
+        str or ``None``: The derivative's file path, or ``None`` if processing failed.
+    """
+    try:
+        return processor(*arguments)
+    except Exception:
+        logger.exception('Could not process {0}.'.format(arguments[0]))
+        return None
+
+
+class DerivativeCache:
+    """
+    A directory of processed copies of oversized images.
+
+    Images no larger than ``maximum_bytes`` are posted as they are. Oversized
+    images are processed with :func:`make_derivative` into the cache directory,
+    under a name built from a hash of the source content and a digest of the
+    processing parameters.
+
+    Hashing a large image means reading it, so the cache keeps a manifest of
+    source content hashes keyed to absolute source paths along with the size
+    and modification time they were computed for. A source is only hashed again
+    after it changes. The manifest is stored as ``manifest.json`` in the cache
+    directory::
+
+        {
+            'version': 1,
+            'sources': {
+                '/absolute/path/to/images/large.jpg': [7340032, 1454601600000000000, '9f86d0...']
+            }
+        }
+
+    Attributes:
+        location (str): The cache directory.
+        maximum_bytes (int): Largest image size in bytes uploaded as is.
+        maximum_dimension (int): Largest width or height in pixels of a derivative.
+        quality (int): JPEG quality a derivative is first encoded with.
+        processor: The function that writes derivatives. It takes the same
+            arguments as :func:`make_derivative`, which is the default.
+        sources (dict): Manifest entries keyed to absolute source paths.
+    """
+    version = 1
+
+    def __init__(self, location, maximum_bytes=DEFAULT_MAXIMUM_BYTES, maximum_dimension=DEFAULT_MAXIMUM_DIMENSION,
+                 quality=DEFAULT_QUALITY, processor=make_derivative):
+        self.location = location
+        self.maximum_bytes = maximum_bytes
+        self.maximum_dimension = maximum_dimension
+        self.quality = quality
+        self.processor = processor
+        self.sources = dict()
+        self._changed = False
+        self.load()
+
+    @property
+    def manifest_location(self):
+        return join(self.location, 'manifest.json')
+
+    @property
+    def parameters_digest(self):
+        """
+        Returns:
+            str: A short digest of the processing parameters.
+        """
+        parameters = json.dumps([self.maximum_bytes, self.maximum_dimension, self.quality])
+        return hashlib.sha256(parameters.encode('utf-8')).hexdigest()[:16]
+
+    def load(self):
+        """Reads the manifest. A missing or outdated manifest leaves it empty."""
+        data = utils.read_json(self.manifest_location)
+        if isinstance(data, dict) and data.get('version') == self.version:
+            self.sources = data.get('sources', dict())
+
+    def save(self):
+        """Persists the manifest if it changed."""
+        if not self._changed:
+            return
+        os.makedirs(self.location, exist_ok=True)
+        utils.write_json(self.manifest_location, {'version': self.version, 'sources': self.sources})
+        self._changed = False
+
+    def is_oversized(self, source_location):
+        """
+        Arguments:
+            source_location (str): File path of an image.
+
+        Returns:
+            bool: ``True`` if the image is larger than ``maximum_bytes``.
+        """
+        return os.path.getsize(source_location) > self.maximum_bytes
+
+    def content_hash(self, source_location):
+        """
+        Provides an image's content hash, from the manifest if the image is unchanged.
+
+        Arguments:
+            source_location (str): File path of an image.
+
+        Returns:
+            str: A SHA-256 hex digest of the image's content.
+        """
+        key = abspath(source_location)
+        stat = os.stat(source_location)
+        entry = self.sources.get(key)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        content_hash = hash_file(source_location)
+        self.sources[key] = [stat.st_size, stat.st_mtime_ns, content_hash]
+        self._changed = True
+        return content_hash
+
+    def derivative_stem(self, source_location):
+        """
+        Arguments:
+            source_location (str): File path of an image.
+
+        Returns:
+            str: File path of the image's derivative, without an extension.
+        """
+        name = '-'.join([self.content_hash(source_location), self.parameters_digest])
+        return join(self.location, name)
+
+    def find(self, source_location):
+        """
+        Arguments:
+            source_location (str): File path of an oversized image.
+
+        Returns:
+            str or ``None``: File path of the image's existing derivative.
+        """
+        stem = self.derivative_stem(source_location)
+        for extension in ('.jpg', '.png'):
+            if os.path.isfile(''.join([stem, extension])):
+                return ''.join([stem, extension])
+        return None
+
+    def process(self, source_location):
+        """
+        Provides the image to upload in place of a source image, making its
+        derivative if it's oversized and hasn't been processed yet.
+
+        Arguments:
+            source_location (str): File path of an image.
+
+        Returns:
+            str: The derivative's file path for an oversized image, the source
+                file path otherwise.
+        """
+        if not self.is_oversized(source_location):
+            return source_location
+        derivative_location = self.find(source_location)
+        if derivative_location is None:
+            os.makedirs(self.location, exist_ok=True)
+            derivative_location = self.processor(source_location, self.derivative_stem(source_location),
+                                                 self.maximum_bytes, self.maximum_dimension, self.quality)
+        self.save()
+        return derivative_location
+
+    def resolve(self, source_location):
+        """
+        Provides the image to upload in place of a source image.
+
+        Unlike :meth:`process`, an oversized image that can't be processed,
+        for example because Pillow isn't installed, is logged and its source
+        file path is returned, so posting behaves as it would without the cache.
+
+        Arguments:
+            source_location (str): File path of an image.
+
+        Returns:
+            str: A file path.
+        """
+        try:
+            return self.process(source_location)
+        except Exception:
+            logger.exception('Could not process {0}; uploading it as is.'.format(source_location))
+            return source_location
+
+    def prepare(self, source_locations, processes=1):
+        """
+        Makes the missing derivatives of oversized images.
+
+        Images are hashed in the calling process, which keeps the manifest
+        current, and the derivatives are made on a ``multiprocessing`` pool.
+
+        Arguments:
+            source_locations: Iterable of image file paths.
+            processes (int): Number of worker processes. Default: ``1``, which
+                processes the images in the calling process.
+
+        Returns:
+            dict: Derivative file paths keyed to the source file paths of oversized
+                images. Images that couldn't be processed are left out.
+        """
+        derivatives = dict()
+        pending = list()
+        for source_location in source_locations:
+            if not self.is_oversized(source_location):
+                continue
+            derivative_location = self.find(source_location)
+            if derivative_location is None:
+                pending.append((source_location, self.derivative_stem(source_location), self.maximum_bytes,
+                                self.maximum_dimension, self.quality))
+            else:
+                derivatives[source_location] = derivative_location
+        if pending:
+            os.makedirs(self.location, exist_ok=True)
+        tasks = [(self.processor,) + arguments for arguments in pending]
+        if processes > 1 and len(tasks) > 1:
+            from multiprocessing import Pool
+            with Pool(min(processes, len(tasks))) as pool:
+                made = pool.starmap(make_derivative_or_none, tasks)
+        else:
+            made = [make_derivative_or_none(*task) for task in tasks]
+        for arguments, derivative_location in zip(pending, made):
+            if derivative_location is not None:
+                derivatives[arguments[0]] = derivative_location
+        self.save()
+        return derivatives
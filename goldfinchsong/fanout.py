@@ -0,0 +1,96 @@
+"""
+Fan-out module. Posts for several accounts at once on a bounded thread pool.
+
+Posting is mostly waiting on the network, so threads let the uploads for
+different accounts overlap, and a full fan-out takes about as long as the
+slowest account rather than the sum of all of them.
+
+Attributes:
+    DEFAULT_WORKERS (int): Maximum number of accounts posting at the same time
+        when no worker count is configured.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from time import perf_counter
+from .ratelimit import post_with_retries
+
+logger = getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+
+def post_account(name, build_manager, policy=None, buckets=None):
+    """
+    Builds an account's manager and posts its tweet.
+
+    The manager is built in the calling thread, so the account's database
+    connections belong to the thread that uses them. The post is retried with
+    :func:`~.goldfinchsong.ratelimit.post_with_retries`. Failures are reported
+    rather than raised, so one account can't stop the others.
+
+    Arguments:
+        name (str): The account name.
+        build_manager: A callable that takes the account name and returns a
+            :class:`~.goldfinchsong.classes.Manager` for the account.
+        policy (RetryPolicy): Retry policy for the post.
+        buckets (dict): :class:`~.goldfinchsong.ratelimit.TokenBucket` instances
+            keyed to account names. Accounts without a bucket aren't paced.
+
+    Returns:
+        dict: A result with ``account``, ``image``, ``status_text``, ``error`` and
+            ``seconds`` items. ``image`` and ``status_text`` are ``None`` if the post
+            failed, and ``error`` is ``None`` if it succeeded.
+    """
+    result = {'account': name, 'image': None, 'status_text': None, 'error': None, 'seconds': None}
+    start = perf_counter()
+    try:
+        bucket = buckets.get(name) if buckets else None
+        content = post_with_retries(build_manager(name), policy, bucket)
+        result['image'] = content[0]
+        result['status_text'] = content[1]
+    except Exception as error:
+        logger.exception('POST for account {0} failed.'.format(name))
+        result['error'] = '{0}: {1}'.format(type(error).__name__, error)
+    result['seconds'] = perf_counter() - start
+    return result
+
+
+def post_all(names, build_manager, workers=DEFAULT_WORKERS, policy=None, buckets=None):
+    """
+    Posts a tweet for every account, with at most ``workers`` accounts posting at once.
+
+    Arguments:
+        names: Iterable of account names.
+        build_manager: A callable that takes an account name and returns a
+            :class:`~.goldfinchsong.classes.Manager` for the account.
+        workers (int): Maximum number of accounts posting at the same time.
+        policy (RetryPolicy): Retry policy for every post.
+        buckets (dict): Token buckets keyed to account names.
+
+    Returns:
+        list: The :func:`post_account` results, in the order of ``names``.
+    """
+    names = list(names)
+    if not names:
+        return list()
+    with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(names)))) as executor:
+        return list(executor.map(lambda name: post_account(name, build_manager, policy, buckets), names))
+
+
+def summarize(results, seconds=None):
+    """
+    Aggregates fan-out results into a report.
+
+    Arguments:
+        results (list): :func:`post_account` results.
+        seconds (float): The fan-out's elapsed time, if measured.
+
+    Returns:
+        dict: A report with ``posted`` and ``failed`` counts, the names of the
+            ``failed_accounts``, the ``slowest`` account's result, the elapsed
+            ``seconds`` and every account's ``results``.
+    """
+    failed = [result['account'] for result in results if result['error'] is not None]
+    slowest = max(results, key=lambda result: result['seconds']) if results else None
+    return {'posted': len(results) - len(failed), 'failed': len(failed), 'failed_accounts': failed,
+            'slowest': slowest, 'seconds': seconds, 'results': results}
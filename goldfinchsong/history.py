@@ -0,0 +1,273 @@
+"""
+History module. Wraps the tweet history database with a maintained index of
+the image names posted during the current generation, so checking whether an
+image was posted doesn't require reading every tweet document.
+
+Attributes:
+    DEFAULT_COMPACT_EVERY (int): Number of index log entries after which the index is rewritten.
+    INDEX_SUFFIX (str): Suffix of the history index file's default path, which replaces the
+        TinyDB file's extension. See :func:`~.goldfinchsong.utils.sibling_location`.
+"""
+from functools import cached_property
+import json
+import os
+from . import utils
+
+DEFAULT_COMPACT_EVERY = 1000
+
+INDEX_SUFFIX = '.index.json'
+
+
+class History:
+    """
+    Tweet history with an index keyed by image name.
+
+    The class offers the ``insert``, ``all`` and ``purge`` methods that
+    :class:`~.goldfinchsong.classes.Manager` and the :mod:`~.goldfinchsong.utils`
+    functions use, so it can stand in for a TinyDB instance. Inserting, purging
+    or starting a generation through the class keeps the index current.
+
+    The index only holds the images of the current generation, which is all
+    that selection needs, so it's emptied when a new generation starts. Tweets
+    of past generations stay in the database.
+
+    The index is persisted with the number of tweet documents it covers, its
+    generation and a fingerprint of the database file: its size and modification
+    time in nanoseconds. If the database was written to without going through
+    the class, the fingerprint differs and the index is rebuilt from the
+    database. While the fingerprint matches, loading the index doesn't read the
+    database at all, and a database given as a function isn't even opened until
+    tweet documents are needed. Without a ``db_location`` there's no fingerprint,
+    so the document count and generation are compared instead. The persisted
+    format is::
+
+        {
+            'version': 3,
+            'count': 2,
+            'generation': 0,
+            'fingerprint': [1024, 1462381614987654321],
+            'images': {
+                'image1.jpg': '2016-05-04T17:06:54.987654+00:00',
+                'image2.jpg': '2016-05-05T17:06:54.987654+00:00'
+            }
+        }
+
+    Rewriting the whole index after every post would cost as much as the
+    generation is long, so each insert instead appends one JSON line to a log
+    next to the index, with a ``.log`` suffix. The line records the tweet's
+    image, delivery timestamp and generation, and the document count and database
+    fingerprint after the insert. Log entries the index already covers are skipped when the log is
+    replayed. After ``compact_every`` entries, or when a generation starts, the
+    index is rewritten and the log is emptied.
+
+    Attributes:
+        db: The wrapped TinyDB instance.
+        open_db: Function that opens the TinyDB instance on first use, or ``None``.
+        location (str): File path for the persisted index. If ``None``, the
+            index is only kept in memory.
+        db_location (str): File path of the TinyDB file, for its fingerprint.
+        db_fingerprint (list): The database fingerprint the index covers.
+        images (dict): Image names posted during the current generation keyed to
+            their latest delivery timestamp.
+        count (int): Number of tweet documents covered by the index.
+        generation (int): The current generation.
+        compact_every (int): Number of log entries after which the index is rewritten.
+    """
+    version = 3
+
+    def __init__(self, db, location=None, compact_every=DEFAULT_COMPACT_EVERY, db_location=None):
+        if callable(db):
+            self.open_db = db
+        else:
+            self.open_db = None
+            self.db = db
+        self.location = location
+        self.db_location = db_location
+        self.db_fingerprint = None
+        self.log_location = ''.join([location, '.log']) if location else None
+        self.compact_every = compact_every
+        self.log_entries = 0
+        self.images = dict()
+        self.count = 0
+        self.generation = 0
+        self.load()
+
+    @cached_property
+    def db(self):
+        return self.open_db()
+
+    def load(self):
+        """Reads the persisted index and its log, rebuilding the index if it's missing or stale."""
+        data = utils.read_json(self.location) if self.location else None
+        complete = True
+        if isinstance(data, dict) and data.get('version') == self.version:
+            self.images = data['images']
+            self.count = data['count']
+            self.generation = data['generation']
+            self.db_fingerprint = data['fingerprint']
+            complete = self.replay()
+        if not self.is_current():
+            self.rebuild()
+        elif not complete:
+            self.save()
+
+    def fingerprint(self):
+        """
+        Returns:
+            list: The database file's size and modification time in nanoseconds, or
+                ``None`` if there's no ``db_location`` or the file doesn't exist.
+        """
+        if not self.db_location:
+            return None
+        try:
+            stat = os.stat(self.db_location)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_current(self):
+        """
+        Returns:
+            bool: ``True`` if the index covers every tweet document in the database.
+        """
+        fingerprint = self.fingerprint()
+        if fingerprint is not None:
+            return fingerprint == self.db_fingerprint
+        return self.count == len(self.db) and self.generation == utils.get_generation(self.db)
+
+    def replay(self):
+        """
+        Applies the log entries the index doesn't cover yet.
+
+        Returns:
+            bool: ``False`` if the log ends with an incomplete line, which the
+                caller should compact away before appending.
+        """
+        try:
+            with open(self.log_location, encoding='utf-8') as log_file:
+                lines = log_file.readlines()
+        except OSError:
+            return True
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return False
+            self.log_entries += 1
+            if entry['count'] > self.count:
+                self.count = entry['count']
+                self.db_fingerprint = entry['fingerprint']
+                if entry['generation'] == self.generation:
+                    self.images[entry['image']] = entry['delivered_on']
+        return True
+
+    def save(self):
+        """Persists the index and empties its log."""
+        self.db_fingerprint = self.fingerprint()
+        if self.location:
+            utils.write_json(self.location, {'version': self.version, 'count': self.count,
+                                             'generation': self.generation, 'fingerprint': self.db_fingerprint,
+                                             'images': self.images})
+            if os.path.exists(self.log_location):
+                open(self.log_location, 'w').close()
+        self.log_entries = 0
+
+    def append(self, tweet):
+        """
+        Records an inserted tweet in the index log, or rewrites the index once
+        the log reaches ``compact_every`` entries or if it wasn't written yet.
+
+        Arguments:
+            tweet (dict): The inserted tweet document.
+        """
+        if not self.location:
+            return
+        if self.log_entries + 1 >= self.compact_every or not os.path.exists(self.location):
+            self.save()
+            return
+        self.db_fingerprint = self.fingerprint()
+        entry = {'count': self.count, 'image': tweet['image'], 'delivered_on': tweet.get('delivered_on'),
+                 'generation': tweet.get('generation', 0), 'fingerprint': self.db_fingerprint}
+        with open(self.log_location, 'a', encoding='utf-8') as log_file:
+            log_file.write(json.dumps(entry) + '\n')
+        self.log_entries += 1
+
+    def rebuild(self):
+        """Recreates the index from every tweet document in the database."""
+        self.generation = utils.get_generation(self.db)
+        self.images = dict()
+        tweets = self.db.all()
+        for tweet in tweets:
+            if tweet.get('generation', 0) == self.generation:
+                self.images[tweet['image']] = tweet.get('delivered_on')
+        self.count = len(tweets)
+        self.save()
+
+    def insert(self, tweet):
+        """
+        Saves a tweet document and adds its image to the index.
+
+        Arguments:
+            tweet (dict): A tweet document with ``image`` and ``delivered_on`` items.
+
+        Returns:
+            int: The document's id.
+        """
+        document_id = self.db.insert(tweet)
+        if tweet.get('generation', 0) == self.generation:
+            self.images[tweet['image']] = tweet.get('delivered_on')
+        self.count += 1
+        self.append(tweet)
+        return document_id
+
+    def all(self):
+        """
+        Returns:
+            list: Every tweet document.
+        """
+        return self.db.all()
+
+    def purge(self):
+        """Removes every tweet document and clears the index."""
+        self.db.purge()
+        self.images = dict()
+        self.count = 0
+        self.save()
+
+    def start_generation(self):
+        """
+        Starts a new generation in the database and empties the index.
+
+        Returns:
+            int: The new generation.
+        """
+        self.generation = utils.start_generation(self.db)
+        self.images = dict()
+        self.save()
+        return self.generation
+
+    def generations(self):
+        """
+        Returns:
+            list: The database's generations, as :func:`~.goldfinchsong.utils.get_generations` provides them.
+        """
+        return utils.get_generations(self.db)
+
+    def posted_files(self, generation=None):
+        """
+        Arguments:
+            generation (int): A generation. Default: ``None``, which is the current generation.
+
+        Returns:
+            A set-like view of the image names posted during the generation. The
+                tweet documents are only read for a past generation.
+        """
+        if generation is None or generation == self.generation:
+            return self.images.keys()
+        return {tweet['image'] for tweet in self.db.all() if tweet.get('generation', 0) == generation}
+
+    def __contains__(self, image):
+        return image in self.images
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,154 @@
+"""
+Library module. Describes an image library made of one or more root
+directories, each optionally searched recursively, and names every image
+with a stable key that the posting history and queue record.
+
+An image's key is its path relative to its root, with ``/`` separators. A
+library with several roots gives each root a name, which becomes the first
+part of its images' keys, so same-named files in different folders or on
+different mount points don't collide. In a library with a single, unnamed root
+that isn't searched recursively, keys are bare file names, as they've always been::
+
+    ImageLibrary('images').path('goldfinch1.jpg')
+    # 'images/goldfinch1.jpg'
+    ImageLibrary({'birds': '/mnt/a/birds', 'landscapes': '/mnt/b/landscapes'}, recursive=True)
+    # keys like 'birds/finches/goldfinch1.jpg'
+
+Attributes:
+    DEFAULT_SCAN_WORKERS (int): Default number of threads that scan directories.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+from os.path import abspath
+from . import catalog as catalogs
+
+
+DEFAULT_SCAN_WORKERS = 8
+
+
+def as_library(image_directory):
+    """
+    Arguments:
+        image_directory (str | ImageLibrary): A file path to an image directory, or a library.
+
+    Returns:
+        ImageLibrary: The library itself, or a library with the directory as its single root.
+    """
+    if isinstance(image_directory, ImageLibrary):
+        return image_directory
+    return ImageLibrary(image_directory)
+
+
+class ImageLibrary:
+    """
+    An image library's root directories.
+
+    Directories are scanned breadth first. All of the directories at the same
+    depth, across every root, are scanned at the same time on a thread pool,
+    which hides the latency of slow or remote mounts. With an
+    :class:`~.goldfinchsong.catalog.ImageCatalog`, unchanged directories are
+    read from the catalog instead of being listed.
+
+    Attributes:
+        roots (dict): Root directory paths keyed to root names. A single root
+            passed as a path is keyed to an empty name.
+        recursive (bool): If ``True``, images in subdirectories are included.
+        workers (int): Maximum number of threads scanning directories.
+        signature: A value that changes whenever the last :meth:`images` call's
+            directories change, for :meth:`~.goldfinchsong.selection.PostingQueue.select`.
+    """
+    def __init__(self, roots, recursive=False, workers=DEFAULT_SCAN_WORKERS):
+        if isinstance(roots, str):
+            roots = {'': roots}
+        if len(roots) > 1 and any(not name or '/' in name for name in roots):
+            raise ValueError('Every root of a library with several roots needs a name without "/".')
+        self.roots = roots
+        self.recursive = recursive
+        self.workers = workers
+        self.signature = None
+
+    def is_flat(self):
+        """
+        Returns:
+            bool: ``True`` for a single, unnamed root that isn't searched recursively.
+        """
+        return not self.recursive and list(self.roots) == ['']
+
+    def key(self, name, prefix, file_name):
+        """
+        Arguments:
+            name (str): The root's name.
+            prefix (str): The directory's path relative to the root, with ``/`` separators.
+            file_name (str): The image file name.
+
+        Returns:
+            str: The image's key.
+        """
+        return '/'.join(part for part in (name, prefix, file_name) if part)
+
+    def path(self, key):
+        """
+        Arguments:
+            key (str): An image's key.
+
+        Returns:
+            str: The image's file path.
+        """
+        if '' in self.roots:
+            root, relative_path = self.roots[''], key
+        else:
+            name, separator, relative_path = key.partition('/')
+            root = self.roots[name]
+        return os.path.join(root, *relative_path.split('/'))
+
+    def images(self, catalog=None):
+        """
+        Provides the library's images and updates ``signature``.
+
+        Arguments:
+            catalog (ImageCatalog): Optional catalog of directory entries. It's
+                persisted once the scan finishes.
+
+        Returns:
+            dict: Image keys keyed to ``None``, in scan order. The dict supports
+                fast membership checks; callers should not modify it.
+        """
+        if catalog is not None and self.is_flat():
+            # the catalog keeps the image dict of a single directory between calls
+            directory = self.roots['']
+            images = catalog.images(directory)
+            self.signature = catalog.entry(directory)['mtime_ns']
+            return images
+        read = catalog.lookup if catalog is not None else catalogs.read_directory
+        images = dict()
+        stamps = list()
+        level = [(name, root, '') for name, root in self.roots.items()]
+        executor = None
+        try:
+            while level:
+                if len(level) > 1 and self.workers > 1:
+                    if executor is None:
+                        executor = ThreadPoolExecutor(self.workers)
+                    entries = list(executor.map(read, [directory for name, directory, prefix in level]))
+                else:
+                    entries = [read(directory) for name, directory, prefix in level]
+                next_level = list()
+                for (name, directory, prefix), entry in zip(level, entries):
+                    stamps.append([abspath(directory), entry['mtime_ns']])
+                    for file_name, details in entry['files'].items():
+                        if details[2]:
+                            images[self.key(name, prefix, file_name)] = None
+                    if self.recursive:
+                        for subdirectory in entry.get('directories', ()):
+                            next_level.append((name, os.path.join(directory, subdirectory),
+                                               '/'.join(part for part in (prefix, subdirectory) if part)))
+                level = next_level
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if catalog is not None:
+            catalog.save()
+        self.signature = hashlib.sha256(json.dumps(stamps).encode('utf-8')).hexdigest()
+        return images
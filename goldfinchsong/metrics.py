@@ -0,0 +1,270 @@
+"""
+Metrics module. Times the phases of a run, such as directory scanning, history
+reads, text compaction, upload and the history write, and records counters,
+such as the number of files scanned, the history size and the bytes uploaded.
+
+Measurements are passed to hooks. A hook is any object with the methods of
+:class:`Hook`; :class:`JSONLinesExporter` and :class:`PrometheusExporter` are
+built in. Without hooks, which is the default, :func:`phase` returns a shared
+do-nothing context manager and :func:`count` and :func:`gauge` return right away,
+so instrumented code costs a function call and a list check. Code that runs
+once per file, such as :func:`~.goldfinchsong.utils.to_compact_text`, checks
+``hooks`` itself and skips the phase entirely::
+
+    add_hook(PrometheusExporter('/var/lib/node_exporter/goldfinchsong.prom'))
+    with phase('scan'):
+        files = listdir(image_directory)
+    count('files_scanned', len(files))
+    flush()
+
+Attributes:
+    hooks (list): The active hooks. Measurements are dropped while it's empty.
+    NULL_PHASE: The context manager :func:`phase` returns without hooks.
+"""
+from contextlib import nullcontext
+from datetime import datetime, timezone
+import json
+import threading
+from time import perf_counter, time
+from . import utils
+
+hooks = list()
+
+NULL_PHASE = nullcontext()
+
+
+class Hook:
+    """
+    Receives measurements. Subclasses override the methods they need.
+    """
+    def on_phase(self, name, seconds):
+        """
+        Arguments:
+            name (str): The phase name.
+            seconds (float): The phase's duration.
+        """
+
+    def on_count(self, name, value):
+        """
+        Arguments:
+            name (str): The counter name.
+            value (int): The amount added to the counter.
+        """
+
+    def on_gauge(self, name, value):
+        """
+        Arguments:
+            name (str): The gauge name.
+            value (float): The gauge's current value.
+        """
+
+    def flush(self):
+        """Exports the measurements received since the last flush."""
+
+
+class Phase:
+    """Times a ``with`` block and passes its duration to the hooks."""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exception_details):
+        seconds = perf_counter() - self.start
+        for hook in hooks:
+            hook.on_phase(self.name, seconds)
+        return False
+
+
+def add_hook(hook):
+    """
+    Arguments:
+        hook (Hook): A hook that receives measurements from now on.
+    """
+    hooks.append(hook)
+
+
+def remove_hook(hook):
+    """
+    Arguments:
+        hook (Hook): A hook that stops receiving measurements.
+    """
+    if hook in hooks:
+        hooks.remove(hook)
+
+
+def phase(name):
+    """
+    Arguments:
+        name (str): The phase name.
+
+    Returns:
+        A context manager that times its block, or ``NULL_PHASE`` without hooks.
+    """
+    if not hooks:
+        return NULL_PHASE
+    return Phase(name)
+
+
+def count(name, value=1):
+    """
+    Adds to a counter.
+
+    Arguments:
+        name (str): The counter name.
+        value (int): The amount to add.
+    """
+    for hook in hooks:
+        hook.on_count(name, value)
+
+
+def gauge(name, value):
+    """
+    Sets a gauge.
+
+    Arguments:
+        name (str): The gauge name.
+        value (float): The gauge's current value.
+    """
+    for hook in hooks:
+        hook.on_gauge(name, value)
+
+
+def flush():
+    """Asks every hook to export its measurements."""
+    for hook in hooks:
+        hook.flush()
+
+
+class Recorder(Hook):
+    """
+    A hook that aggregates measurements in memory. It's thread safe, so the
+    *post-all* action's accounts can share it.
+
+    Attributes:
+        phases (dict): Lists of the call count and total seconds keyed to phase names.
+        counters (dict): Counter totals keyed to counter names.
+        gauges (dict): Last gauge values keyed to gauge names.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = dict()
+        self.counters = dict()
+        self.gauges = dict()
+
+    def on_phase(self, name, seconds):
+        with self.lock:
+            totals = self.phases.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def on_count(self, name, value):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def on_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Copies of the ``phases``, ``counters`` and ``gauges``.
+        """
+        with self.lock:
+            return {'phases': {name: list(totals) for name, totals in self.phases.items()},
+                    'counters': dict(self.counters), 'gauges': dict(self.gauges)}
+
+    def reset(self):
+        """Forgets the recorded measurements."""
+        with self.lock:
+            self.phases.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+class JSONLinesExporter(Recorder):
+    """
+    Appends a JSON line to a file on every flush, so each run adds one record::
+
+        {"recorded_on": "2016-05-04T17:06:54.987654+00:00",
+         "phases": {"scan": [1, 0.0213], "upload": [1, 1.72]},
+         "counters": {"images_found": 1250, "bytes_uploaded": 483202},
+         "gauges": {"history_size": 611}}
+
+    Phases are lists of the call count and total seconds. The measurements are
+    reset after they're written.
+
+    Attributes:
+        location (str): File path of the JSON lines file.
+    """
+    def __init__(self, location):
+        super().__init__()
+        self.location = location
+
+    def flush(self):
+        record = self.snapshot()
+        self.reset()
+        record = dict(recorded_on=datetime.now(tz=timezone.utc).isoformat(), **record)
+        with open(self.location, 'a', encoding='utf-8') as jsonl_file:
+            jsonl_file.write(json.dumps(record, sort_keys=True))
+            jsonl_file.write('\n')
+
+
+class PrometheusExporter(Recorder):
+    """
+    Writes the measurements in the Prometheus text format on every flush, for
+    the node exporter's textfile collector. The file is written with
+    :func:`~.goldfinchsong.utils.atomic_write`, so the collector never reads it half written.
+
+    Phases become ``<prefix>_phase_seconds`` and ``<prefix>_phase_calls`` gauges
+    with a ``phase`` label, counters and gauges become ``<prefix>_<name>``
+    gauges, and ``<prefix>_last_run_timestamp_seconds`` records the flush time.
+    The file describes the latest run, so the measurements are reset after
+    they're written.
+
+    Attributes:
+        location (str): File path of the ``.prom`` file.
+        prefix (str): Metric name prefix.
+    """
+    def __init__(self, location, prefix='goldfinchsong'):
+        super().__init__()
+        self.location = location
+        self.prefix = prefix
+
+    def render(self, record, now):
+        """
+        Arguments:
+            record (dict): A :meth:`~Recorder.snapshot`.
+            now (float): The flush time, in seconds since the epoch.
+
+        Returns:
+            str: The measurements in the Prometheus text format.
+        """
+        lines = list()
+        if record['phases']:
+            for suffix, position, description in (('phase_seconds', 1, 'Seconds spent in each phase.'),
+                                                  ('phase_calls', 0, 'Times each phase ran.')):
+                metric = '_'.join([self.prefix, suffix])
+                lines.append('# HELP {0} {1}'.format(metric, description))
+                lines.append('# TYPE {0} gauge'.format(metric))
+                for name in sorted(record['phases']):
+                    lines.append('{0}{{phase="{1}"}} {2}'.format(metric, name, record['phases'][name][position]))
+        values = dict(record['counters'])
+        values.update(record['gauges'])
+        values['last_run_timestamp_seconds'] = now
+        for name in sorted(values):
+            metric = '_'.join([self.prefix, name])
+            lines.append('# TYPE {0} gauge'.format(metric))
+            lines.append('{0} {1}'.format(metric, values[name]))
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        record = self.snapshot()
+        self.reset()
+        utils.atomic_write(self.location, self.render(record, time()))
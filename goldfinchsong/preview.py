@@ -0,0 +1,137 @@
+"""
+Preview module. Dry-runs status text generation over a whole image library
+and reports every image's status text and the compaction stage it needed, so
+text conversions can be checked before anything is posted.
+
+Status texts are computed exactly as :func:`~.goldfinchsong.utils.extract_status_text`
+computes them, on a ``multiprocessing`` pool whose workers compile the text
+conversions once, as :func:`~.goldfinchsong.utils.extract_status_texts` does.
+
+Attributes:
+    FIELDS (tuple): Report columns, in order.
+    DEFAULT_CHUNKSIZE (int): File names sent to a worker process at a time.
+    PREVIEW_SUFFIX (str): Suffix of the preview report's default path, which replaces the
+        database file's extension. See :func:`~.goldfinchsong.utils.sibling_location`.
+"""
+import csv
+import io
+import json
+from . import compaction, utils
+
+FIELDS = ('file_name', 'status_text', 'length', 'stage', 'posted')
+
+DEFAULT_CHUNKSIZE = 2048
+
+PREVIEW_SUFFIX = '.preview.csv'
+
+
+def preview_status(file_name, text_conversions=None, maximum_length=117):
+    """
+    Arguments:
+        file_name (str): An image file name or library key.
+        text_conversions (dict): Text conversions, or an
+            :class:`~.goldfinchsong.compaction.AbbreviationMatcher` compiled from them.
+        maximum_length (int): The maximum character length for the text.
+
+    Returns:
+        tuple: The status text and the compaction stage that produced it, one of
+            :data:`~.goldfinchsong.compaction.STAGES`.
+    """
+    return compaction.compact_text(utils.status_source_text(file_name), maximum_length, text_conversions)
+
+
+def preview_in_worker(file_names):
+    """
+    Arguments:
+        file_names (list): A chunk of image file names.
+
+    Returns:
+        list: A status text and stage tuple for each file name, computed with the
+            worker process's :func:`~.goldfinchsong.utils.initialize_status_worker` settings.
+    """
+    matcher = utils.status_worker_settings['matcher']
+    maximum_length = utils.status_worker_settings['maximum_length']
+    return [preview_status(file_name, matcher, maximum_length) for file_name in file_names]
+
+
+def preview_statuses(file_names, text_conversions=None, maximum_length=117, processes=1,
+                     chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Computes the status text and compaction stage of many image files.
+
+    With more than one process, the file names are sent to a ``multiprocessing``
+    pool in chunks, and each chunk's results come back as a single list, which
+    keeps the inter-process traffic to a few messages per thousand files.
+
+    Arguments:
+        file_names (list): Image file names.
+        text_conversions (dict): Text conversions for the status texts.
+        maximum_length (int): The maximum character length for the text.
+        processes (int): Number of worker processes. Default: ``1``, which computes
+            the texts in the calling process.
+        chunksize (int): Number of file names sent to a worker process at a time.
+
+    Yields:
+        tuple: A status text and stage for each file name, in the same order.
+    """
+    if processes > 1 and len(file_names) > chunksize:
+        from multiprocessing import Pool
+        chunks = [file_names[start:start + chunksize] for start in range(0, len(file_names), chunksize)]
+        with Pool(processes, initializer=utils.initialize_status_worker,
+                  initargs=(text_conversions, maximum_length)) as pool:
+            for results in pool.imap(preview_in_worker, chunks):
+                yield from results
+    else:
+        matcher = compaction.compile_abbreviations(text_conversions)
+        for file_name in file_names:
+            yield preview_status(file_name, matcher, maximum_length)
+
+
+def preview_library(file_names, posted_files, text_conversions=None, maximum_length=117, processes=1):
+    """
+    Arguments:
+        file_names (list): The library's image file names.
+        posted_files (set): File names posted during the current cycle.
+        text_conversions (dict): Text conversions for the status texts.
+        maximum_length (int): The maximum character length for the text.
+        processes (int): Number of worker processes.
+
+    Yields:
+        dict: A report row with a value for each of ``FIELDS``, for each file name.
+    """
+    statuses = preview_statuses(file_names, text_conversions, maximum_length, processes)
+    for file_name, (status_text, stage) in zip(file_names, statuses):
+        yield {'file_name': file_name, 'status_text': status_text, 'length': len(status_text),
+               'stage': stage, 'posted': file_name in posted_files}
+
+
+def write_report(rows, location):
+    """
+    Writes preview rows as CSV or, if the location ends with ``.json``, as JSON.
+
+    The JSON report is an object with a ``files`` list of rows and a ``stages``
+    object counting the files that needed each compaction stage.
+
+    Arguments:
+        rows: Iterable of report rows, as :func:`preview_library` yields them.
+        location (str): File path of the report.
+
+    Returns:
+        dict: The number of files that needed each compaction stage, keyed to stage names.
+    """
+    stages = dict.fromkeys(compaction.STAGES, 0)
+    report = io.StringIO(newline='')
+    if location.endswith('.json'):
+        files = list()
+        for row in rows:
+            stages[row['stage']] += 1
+            files.append(row)
+        json.dump({'stages': stages, 'files': files}, report)
+    else:
+        writer = csv.DictWriter(report, FIELDS)
+        writer.writeheader()
+        for row in rows:
+            stages[row['stage']] += 1
+            writer.writerow(row)
+    utils.atomic_write(location, report.getvalue())
+    return stages
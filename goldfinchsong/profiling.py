@@ -0,0 +1,97 @@
+"""
+Profiling module. Runs a function under ``cProfile`` and ``tracemalloc`` and
+writes a stats dump and a report of the largest allocations, for the command
+line interface's ``--profile`` option.
+
+The stats dump can be read with ``pstats`` or a viewer such as ``snakeviz``::
+
+    python -m pstats goldfinchsong.prof
+
+Allocation tracing slows down code that allocates a lot, so timings in a
+profile are inflated compared with a normal run; compare profiles with profiles.
+
+Attributes:
+    DEFAULT_LIMIT (int): Number of allocation sites in the allocations report.
+"""
+from . import utils
+
+DEFAULT_LIMIT = 25
+
+
+def get_profile_locations(log_location):
+    """
+    Provides the profile report paths, which sit next to the log file.
+
+    Arguments:
+        log_location (str): File path of the log file.
+
+    Returns:
+        tuple: The stats dump path, with the log's extension replaced by ``.prof``,
+            and the allocations report path, with it replaced by ``.allocations.txt``.
+            For example, ``goldfinchsong.log`` gives ``goldfinchsong.prof`` and
+            ``goldfinchsong.allocations.txt``.
+    """
+    return utils.sibling_location(log_location, '.prof'), utils.sibling_location(log_location, '.allocations.txt')
+
+
+def write_allocations(snapshot, location, peak=None, limit=DEFAULT_LIMIT):
+    """
+    Writes the source lines that allocated the most memory still held at the snapshot.
+
+    Arguments:
+        snapshot: A ``tracemalloc.Snapshot``.
+        location (str): File path of the report.
+        peak (int): Peak traced memory in bytes, reported if present.
+        limit (int): Number of source lines reported.
+    """
+    import tracemalloc
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ))
+    statistics = snapshot.statistics('lineno')
+    total = sum(statistic.size for statistic in statistics)
+    with open(location, 'w', encoding='utf-8') as report_file:
+        report_file.write('Traced memory: {0:.1f} KiB\n'.format(total / 1024))
+        if peak is not None:
+            report_file.write('Peak traced memory: {0:.1f} KiB\n'.format(peak / 1024))
+        report_file.write('Top {0} allocation sites:\n'.format(min(limit, len(statistics))))
+        for index, statistic in enumerate(statistics[:limit], 1):
+            frame = statistic.traceback[0]
+            report_file.write('{0}. {1}:{2}: {3:.1f} KiB in {4} blocks\n'.format(
+                index, frame.filename, frame.lineno, statistic.size / 1024, statistic.count))
+
+
+def profile(function, stats_location, allocations_location, limit=DEFAULT_LIMIT):
+    """
+    Calls a function under ``cProfile`` and ``tracemalloc`` and writes both reports.
+
+    The reports are written even if the function raises, so a failing run can
+    be profiled too.
+
+    Arguments:
+        function: A callable that takes no arguments.
+        stats_location (str): File path of the ``cProfile`` stats dump.
+        allocations_location (str): File path of the allocations report.
+        limit (int): Number of source lines in the allocations report.
+
+    Returns:
+        The function's return value.
+    """
+    import cProfile
+    import tracemalloc
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        profiler.enable()
+        try:
+            return function()
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            profiler.dump_stats(stats_location)
+            write_allocations(snapshot, allocations_location, peak, limit)
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,251 @@
+"""
+Rate limit module. Retries failed posts with jittered exponential backoff,
+honoring the Twitter API's rate limit headers, and paces each account with a
+token bucket so that retries from many accounts don't hammer the API.
+
+A retry posts the manager's already prepared content again, so the image isn't
+reselected and its status text isn't recomputed.
+
+Attributes:
+    DEFAULT_RETRIES (int): Retries after a post's first attempt.
+    DEFAULT_BASE_DELAY (float): Seconds of backoff before the first retry.
+    DEFAULT_MAXIMUM_DELAY (float): Longest backoff in seconds.
+    DEFAULT_BUCKET_CAPACITY (int): Posts an account may make in a burst.
+    DEFAULT_BUCKET_PERIOD (float): Seconds in which a bucket refills completely.
+        Along with the default capacity, this matches Twitter's limit of
+        300 posts every three hours.
+    RETRYABLE_STATUSES (frozenset): HTTP status codes after which a post is retried.
+"""
+from logging import getLogger
+import random
+import threading
+import time
+
+logger = getLogger(__name__)
+
+DEFAULT_RETRIES = 5
+
+DEFAULT_BASE_DELAY = 2.0
+
+DEFAULT_MAXIMUM_DELAY = 900.0
+
+DEFAULT_BUCKET_CAPACITY = 300
+
+DEFAULT_BUCKET_PERIOD = 10800.0
+
+RETRYABLE_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+def get_response_details(error):
+    """
+    Finds the HTTP response details of a failed API call.
+
+    Both :class:`~.goldfinchsong.aio.TwitterAPIError` and ``tweepy`` errors,
+    which keep the ``requests`` response, are supported.
+
+    Arguments:
+        error (Exception): The error an API call raised.
+
+    Returns:
+        tuple: The status code, or ``None`` if the error has no response, and
+            a dict of response headers keyed by lower case names.
+    """
+    if hasattr(error, 'status') and hasattr(error, 'headers'):
+        return error.status, {name.lower(): value for name, value in error.headers.items()}
+    response = getattr(error, 'response', None)
+    if response is not None and hasattr(response, 'status_code'):
+        return response.status_code, {name.lower(): value for name, value in response.headers.items()}
+    return None, dict()
+
+
+def is_retryable(error):
+    """
+    Arguments:
+        error (Exception): The error a post raised.
+
+    Returns:
+        bool: ``True`` for rate limit responses, ``RETRYABLE_STATUSES`` responses,
+            connection errors, timeouts and ``tweepy`` errors raised without a
+            response, which ``tweepy`` raises when a request couldn't be sent.
+            Other operating system errors, such as a missing or unreadable
+            image, fail the same way every time, so they aren't retried. An
+            interrupted chunked upload is retried if its cause is, and resumes.
+    """
+    import asyncio
+    from .aio import UploadInterrupted
+    if isinstance(error, UploadInterrupted):
+        return error.__cause__ is None or is_retryable(error.__cause__)
+    status, headers = get_response_details(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or (
+        hasattr(error, 'response') and error.response is None)
+
+
+def get_rate_limit_reset(headers, now):
+    """
+    Reads when a rate limit ends from response headers.
+
+    Arguments:
+        headers (dict): Response headers keyed by lower case names.
+        now (float): The current time, in seconds since the epoch.
+
+    Returns:
+        float or ``None``: The time, in seconds since the epoch, after which
+            requests may resume, or ``None`` if the headers don't set a limit.
+    """
+    try:
+        if 'retry-after' in headers:
+            return now + max(0.0, float(headers['retry-after']))
+        if headers.get('x-rate-limit-remaining') == '0' and 'x-rate-limit-reset' in headers:
+            return max(now, float(headers['x-rate-limit-reset']))
+    except ValueError:
+        pass
+    return None
+
+
+class TokenBucket:
+    """
+    Paces an account's posts.
+
+    The bucket holds up to ``capacity`` tokens and refills continuously at
+    ``capacity / period`` tokens per second. Each post takes a token. When
+    the API reports a rate limit, the bucket is emptied and pauses refilling
+    until the limit resets. The bucket is thread safe.
+
+    Attributes:
+        capacity (int): Maximum number of tokens.
+        period (float): Seconds in which an empty bucket refills completely.
+        tokens (float): Tokens currently available.
+        paused_until (float): Time, in seconds since the epoch, before which the bucket doesn't refill.
+    """
+    def __init__(self, capacity=DEFAULT_BUCKET_CAPACITY, period=DEFAULT_BUCKET_PERIOD, clock=time.time):
+        self.capacity = capacity
+        self.period = period
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.paused_until = 0.0
+        self.updated_on = clock()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        """
+        Arguments:
+            now (float): The current time, in seconds since the epoch.
+        """
+        start = max(self.updated_on, self.paused_until)
+        if now > start:
+            self.tokens = min(float(self.capacity), self.tokens + (now - start) * self.capacity / self.period)
+        self.updated_on = max(now, self.updated_on)
+
+    def take(self):
+        """
+        Takes a token if one is available.
+
+        Returns:
+            float: ``0`` if a token was taken. Otherwise, the seconds until one is available.
+        """
+        with self.lock:
+            now = self.clock()
+            self.refill(now)
+            if self.tokens >= 1 and now >= self.paused_until:
+                self.tokens -= 1
+                return 0.0
+            wait = max(0.0, self.paused_until - now) + (1 - min(self.tokens, 1)) * self.period / self.capacity
+            return max(wait, 1e-3)
+
+    def pause_until(self, reset):
+        """
+        Empties the bucket until a rate limit resets.
+
+        Arguments:
+            reset (float): Time, in seconds since the epoch, when the limit resets.
+        """
+        with self.lock:
+            self.refill(self.clock())
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, reset)
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed post is retried.
+
+    Backoff is exponential with full jitter: before retry ``n``, counting from
+    zero, the wait is a random number of seconds between zero and
+    ``base_delay * 2 ** n``, capped at ``maximum_delay``. A rate limit response
+    instead waits until the limit resets, plus up to ``base_delay`` seconds of
+    jitter so that accounts don't resume in lockstep.
+
+    Attributes:
+        retries (int): Retries after a post's first attempt.
+        base_delay (float): Seconds of backoff before the first retry.
+        maximum_delay (float): Longest wait in seconds.
+    """
+    def __init__(self, retries=DEFAULT_RETRIES, base_delay=DEFAULT_BASE_DELAY,
+                 maximum_delay=DEFAULT_MAXIMUM_DELAY, random_generator=None):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.maximum_delay = maximum_delay
+        self.random = random_generator if random_generator is not None else random.Random()
+
+    def delay(self, attempt, error, now):
+        """
+        Arguments:
+            attempt (int): Number of retries already made.
+            error (Exception): The error the last attempt raised.
+            now (float): The current time, in seconds since the epoch.
+
+        Returns:
+            float: Seconds to wait before the next retry.
+        """
+        status, headers = get_response_details(error)
+        reset = get_rate_limit_reset(headers, now)
+        if reset is not None:
+            return min(self.maximum_delay, reset - now + self.random.uniform(0, self.base_delay))
+        return self.random.uniform(0, min(self.maximum_delay, self.base_delay * 2 ** attempt))
+
+
+def post_with_retries(manager, policy=None, bucket=None, clock=time.time, sleep=time.sleep):
+    """
+    Posts a manager's tweet, retrying retryable failures.
+
+    Each attempt first takes a token from the account's bucket, waiting if
+    none is available. Every attempt posts the same content tuple.
+
+    Arguments:
+        manager (Manager): The account's manager.
+        policy (RetryPolicy): Retry policy. Defaults to a ``RetryPolicy`` with default settings.
+        bucket (TokenBucket): The account's token bucket, or ``None`` to post without pacing.
+        clock: A function returning the current time, in seconds since the epoch.
+        sleep: A function that waits for a number of seconds.
+
+    Returns:
+        tuple: The posted content tuple.
+
+    Raises:
+        Exception: Raises the last attempt's error if it isn't retryable or the
+            retries are used up.
+    """
+    policy = policy if policy is not None else RetryPolicy()
+    attempt = 0
+    while True:
+        if bucket is not None:
+            wait = bucket.take()
+            while wait:
+                sleep(wait)
+                wait = bucket.take()
+        try:
+            return manager.post_tweet()
+        except Exception as error:
+            if not is_retryable(error) or attempt >= policy.retries:
+                raise
+            now = clock()
+            status, headers = get_response_details(error)
+            reset = get_rate_limit_reset(headers, now)
+            if bucket is not None and reset is not None:
+                bucket.pause_until(reset)
+            delay = policy.delay(attempt, error, now)
+            logger.warning('POST attempt {0} failed ({1}); retrying in {2:.1f}s.'.format(attempt + 1, error, delay))
+            sleep(delay)
+            attempt += 1
@@ -0,0 +1,188 @@
+"""
+Scheduler module. Runs tasks on an interval or cron-like schedule inside a single,
+long-running process, built on the standard library's ``sched`` module.
+"""
+from datetime import datetime, timedelta
+import sched
+import time
+
+CRON_FIELD_RANGES = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 6),
+)
+
+
+def parse_cron_field(field, minimum, maximum):
+    """
+    Expands one field of a cron expression into the set of values it matches.
+
+    Supports ``*``, single values, ranges (``1-5``), steps (``*/15``, ``0-30/10``)
+    and comma-separated lists of those.
+
+    Arguments:
+        field (str): A single cron field.
+        minimum (int): Smallest value allowed for the field.
+        maximum (int): Largest value allowed for the field.
+
+    Returns:
+        set: Matching integer values.
+
+    Raises:
+        ValueError: Raises exception if the field is malformed or out of range.
+    """
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError('Cron step must be positive: "{0}"'.format(field))
+        if part == '*':
+            start, end = minimum, maximum
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = maximum if step > 1 else start
+        if start < minimum or end > maximum or start > end:
+            raise ValueError('Cron field "{0}" is outside {1}-{2}.'.format(field, minimum, maximum))
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    A five-field cron schedule: minute, hour, day of month, month, day of week.
+
+    Day of week uses cron numbering, with ``0`` (or ``7``) for Sunday. As with cron,
+    when both the day of month and day of week are restricted, a time matches if
+    either one does.
+
+    Attributes:
+        expression (str): The cron expression, e.g. ``0 9 * * *``.
+    """
+    def __init__(self, expression):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError('Cron expression needs five fields: "{0}"'.format(expression))
+        # cron allows 7 as an alias for Sunday
+        fields[4] = ','.join('0' if value == '7' else value for value in fields[4].split(','))
+        parsed = dict()
+        for field, (name, minimum, maximum) in zip(fields, CRON_FIELD_RANGES):
+            parsed[name] = parse_cron_field(field, minimum, maximum)
+        self.minutes = parsed['minute']
+        self.hours = parsed['hour']
+        self.days = parsed['day']
+        self.months = parsed['month']
+        self.weekdays = parsed['weekday']
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    def matches_day(self, moment):
+        """
+        Checks the day of month and day of week fields against a datetime.
+
+        Arguments:
+            moment (datetime): The datetime to check.
+
+        Returns:
+            bool
+        """
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_time(self, after):
+        """
+        Finds the first matching minute strictly after a datetime.
+
+        Arguments:
+            after (datetime): The datetime to search from.
+
+        Returns:
+            datetime
+        """
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # a matching day always exists within a few years, even for February 29th
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                year = moment.year + moment.month // 12
+                moment = moment.replace(year=year, month=moment.month % 12 + 1, day=1, hour=0, minute=0)
+            elif not self.matches_day(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError('Cron expression never matches: "{0}"'.format(self.expression))
+
+
+class IntervalSchedule:
+    """
+    A fixed interval schedule.
+
+    Attributes:
+        seconds (float): Seconds between runs.
+    """
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError('Interval must be positive.')
+        self.seconds = seconds
+
+    def next_time(self, after):
+        """
+        Arguments:
+            after (datetime): The datetime of the previous run.
+
+        Returns:
+            datetime: The datetime one interval later.
+        """
+        return after + timedelta(seconds=self.seconds)
+
+
+def run_scheduled(task, schedule, scheduler=None, iterations=None):
+    """
+    Runs a task on a schedule until interrupted.
+
+    Each run is queued on a ``sched.scheduler`` for the schedule's next time,
+    and the following run is queued as soon as the current one finishes. Times
+    are local, as with cron.
+
+    Args:
+        task: A callable that takes no arguments.
+        schedule: A :class:`CronSchedule` or :class:`IntervalSchedule`.
+        scheduler: Optional ``sched.scheduler``. Defaults to one driven by
+            ``time.time`` and ``time.sleep``.
+        iterations (int): Optional number of runs after which the function returns.
+            By default, runs are scheduled forever.
+    """
+    if scheduler is None:
+        scheduler = sched.scheduler(time.time, time.sleep)
+    remaining = [iterations]
+
+    def enter_next():
+        now = datetime.fromtimestamp(scheduler.timefunc())
+        next_time = schedule.next_time(now)
+        scheduler.enterabs(next_time.timestamp(), 1, execute)
+
+    def execute():
+        task()
+        if remaining[0] is not None:
+            remaining[0] -= 1
+            if remaining[0] <= 0:
+                return
+        enter_next()
+
+    enter_next()
+    scheduler.run()
@@ -0,0 +1,205 @@
+"""
+Selection module. Picks the next image from a persisted, pre-shuffled posting
+queue instead of diffing the whole posting history against every available file.
+
+Attributes:
+    QUEUE_SUFFIX (str): Suffix of the posting queue file's default path, which replaces the
+        TinyDB file's extension. See :func:`~.goldfinchsong.utils.sibling_location`.
+"""
+import random
+from . import utils
+
+QUEUE_SUFFIX = '.queue.json'
+
+
+class PostingQueue:
+    """
+    A persisted random permutation of the image files plus a cursor.
+
+    Images before the cursor were posted during the current cycle; the image
+    at the cursor is the next one to post. Picking an image is O(1). New files
+    are swapped into random positions after the cursor, so they are merged
+    without reshuffling or rescanning the history. Files that disappear from the
+    image directory are skipped when the cursor reaches them. When the cursor
+    passes the last image, a new cycle starts with a fresh permutation and, as
+    with :func:`~.goldfinchsong.utils.get_unused_files`, a new generation starts
+    in the history database.
+
+    The permutation is only rewritten when it changes, which happens when the
+    image directory changes or a cycle ends. After each post, only a small cursor
+    file is rewritten. It sits next to the queue file with a ``.cursor`` suffix.
+
+    Attributes:
+        location (str): File path for the persisted permutation.
+        order (list): Image file names in posting order.
+        cursor (int): Index in ``order`` of the next image to post.
+        signature: Catalog directory ``mtime_ns`` the permutation was last merged against.
+        revision (int): Incremented whenever the permutation is rewritten.
+    """
+    version = 1
+
+    def __init__(self, location, random_generator=None):
+        self.location = location
+        self.cursor_location = ''.join([location, '.cursor'])
+        self.random = random_generator if random_generator is not None else random.Random()
+        self.order = list()
+        self.members = set()
+        self.cursor = 0
+        self.signature = None
+        self.revision = 0
+        self.load()
+
+    def load(self):
+        """
+        Reads the persisted permutation and cursor. The cursor file is only trusted
+        if it was written for the same permutation revision; otherwise the cursor
+        recorded with the permutation is used.
+        """
+        data = utils.read_json(self.location)
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            return
+        self.order = data['order']
+        self.members = set(self.order)
+        self.cursor = data['cursor']
+        self.signature = data['signature']
+        self.revision = data['revision']
+        cursor_data = utils.read_json(self.cursor_location)
+        if isinstance(cursor_data, dict) and cursor_data.get('revision') == self.revision:
+            self.cursor = cursor_data['cursor']
+
+    def save_order(self):
+        """Persists the permutation along with the cursor."""
+        self.revision += 1
+        utils.write_json(self.location, {
+            'version': self.version,
+            'revision': self.revision,
+            'signature': self.signature,
+            'cursor': self.cursor,
+            'order': self.order,
+        })
+        self.save_cursor()
+
+    def save_cursor(self):
+        """Persists the cursor alone."""
+        utils.write_json(self.cursor_location, {'revision': self.revision, 'cursor': self.cursor})
+
+    def rebuild(self, available_files, posted_files=None):
+        """
+        Starts a new permutation of the available image files.
+
+        Arguments:
+            available_files: Iterable of file names in the image directory.
+            posted_files (set): File names already posted during the current cycle.
+                They are placed before the cursor so they aren't repeated.
+        """
+        posted_files = posted_files if posted_files is not None else set()
+        posted = list()
+        unused = list()
+        for file_name in available_files:
+            if utils.is_image_file(file_name):
+                if file_name in posted_files:
+                    posted.append(file_name)
+                else:
+                    unused.append(file_name)
+        self.random.shuffle(unused)
+        self.order = posted + unused
+        self.members = set(self.order)
+        self.cursor = len(posted)
+
+    def merge(self, available_files):
+        """
+        Adds image files missing from the permutation at random positions after the cursor.
+
+        Arguments:
+            available_files: Iterable of file names in the image directory.
+
+        Returns:
+            int: Number of files merged.
+        """
+        merged = 0
+        for file_name in available_files:
+            if file_name not in self.members and utils.is_image_file(file_name):
+                self.order.append(file_name)
+                self.members.add(file_name)
+                position = self.random.randint(self.cursor, len(self.order) - 1)
+                self.order[position], self.order[-1] = self.order[-1], self.order[position]
+                merged += 1
+        return merged
+
+    def peek(self, available_files):
+        """
+        Provides the next image to post without consuming it. Files that no longer
+        exist are skipped.
+
+        Arguments:
+            available_files: Container of file names in the image directory. It should
+                support O(1) membership checks, e.g. a dict or set.
+
+        Returns:
+            str or ``None``: ``None`` if the current cycle is exhausted.
+        """
+        while self.cursor < len(self.order):
+            file_name = self.order[self.cursor]
+            if file_name in available_files:
+                return file_name
+            self.members.discard(file_name)
+            self.cursor += 1
+        return None
+
+    def consume(self, file_name):
+        """
+        Moves the cursor past a posted image.
+
+        Arguments:
+            file_name (str): The posted image's file name.
+        """
+        if self.cursor < len(self.order) and self.order[self.cursor] == file_name:
+            self.cursor += 1
+            self.save_cursor()
+
+    def select(self, db, available_files, signature, dry_run=False):
+        """
+        Provides the next image to post, merging new files and starting a new
+        cycle when needed.
+
+        The first time a queue is used, images posted during the history
+        database's current generation are treated as posted during the current cycle.
+
+        Arguments:
+            db: TinyDB instance.
+            available_files: Container of file names in the image directory with
+                O(1) membership checks.
+            signature: A value that changes whenever ``available_files`` changes,
+                such as the catalog directory's ``mtime_ns``.
+            dry_run (bool): If ``True``, the permutation is updated in memory only
+                and no generation is started in the history database.
+
+        A cycle only ends once the cursor passed an image that still exists, so
+        a library that looks empty, such as an unmounted network share, leaves
+        the history and the permutation alone.
+
+        Returns:
+            str or ``None``: ``None`` if there are no image files.
+        """
+        if not self.order:
+            self.rebuild(available_files, utils.get_posted_files(db))
+            if not self.order:
+                return None
+            self.signature = signature
+            if not dry_run:
+                self.save_order()
+        elif signature != self.signature:
+            self.merge(available_files)
+            self.signature = signature
+            if not dry_run:
+                self.save_order()
+        file_name = self.peek(available_files)
+        if file_name is None:
+            if not any(posted_file in available_files for posted_file in self.order):
+                return None
+            self.rebuild(available_files)
+            if not dry_run:
+                self.save_order()
+                utils.start_generation(db)
+            file_name = self.peek(available_files)
+        return file_name
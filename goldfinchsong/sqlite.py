@@ -0,0 +1,200 @@
+"""
+SQLite module. Stores the tweet history in a ``sqlite3`` database as an
+alternative to TinyDB.
+
+Attributes:
+    SCHEMA (tuple): Statements that create the tables.
+    INDEXES (tuple): Statements that create the indexes, run after databases
+        made by earlier versions are migrated.
+"""
+from datetime import datetime, timezone
+from os.path import getsize, isfile
+import sqlite3
+from . import utils
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS tweets ('
+    'id INTEGER PRIMARY KEY, image TEXT NOT NULL, delivered_on TEXT, generation INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE IF NOT EXISTS generations (generation INTEGER PRIMARY KEY, started_on TEXT)',
+)
+
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS tweets_image ON tweets (image)',
+    'CREATE INDEX IF NOT EXISTS tweets_delivered_on ON tweets (delivered_on)',
+    'CREATE INDEX IF NOT EXISTS tweets_generation_image ON tweets (generation, image)',
+)
+
+
+class SQLiteDatabase:
+    """
+    Tweet history stored in SQLite.
+
+    The class offers the ``insert``, ``all`` and ``purge`` methods that
+    :class:`~.goldfinchsong.classes.Manager` and the :mod:`~.goldfinchsong.utils`
+    functions use with a TinyDB instance, and it works with the same
+    ``{'image', 'delivered_on', 'generation'}`` documents. The ``image`` and
+    ``delivered_on`` columns and the ``generation`` and ``image`` pair are indexed,
+    so checking whether an image was posted doesn't load the history into memory.
+    The database uses write-ahead logging, so reports can read the history while
+    a post is being saved.
+
+    Generations after the first are rows of a ``generations`` table, so starting
+    one inserts a single row.
+
+    Attributes:
+        location (str): File path of the SQLite database.
+        connection: The ``sqlite3`` connection.
+    """
+    def __init__(self, location):
+        self.location = location
+        self.connection = sqlite3.connect(location)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            self.migrate()
+            for statement in INDEXES:
+                self.connection.execute(statement)
+
+    def migrate(self):
+        """Adds the ``generation`` column to a ``tweets`` table made by an earlier version."""
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(tweets)')]
+        if 'generation' not in columns:
+            self.connection.execute('ALTER TABLE tweets ADD COLUMN generation INTEGER NOT NULL DEFAULT 0')
+
+    @property
+    def generation(self):
+        """
+        Returns:
+            int: The current generation.
+        """
+        return self.connection.execute('SELECT COALESCE(MAX(generation), 0) FROM generations').fetchone()[0]
+
+    def start_generation(self):
+        """
+        Starts a new generation. Tweets of past generations are kept.
+
+        Returns:
+            int: The new generation.
+        """
+        with self.connection:
+            generation = self.generation + 1
+            self.connection.execute('INSERT INTO generations (generation, started_on) VALUES (?, ?)',
+                                    (generation, datetime.now(tz=timezone.utc).isoformat()))
+        return generation
+
+    def generations(self):
+        """
+        Returns:
+            list: A ``{'generation', 'started_on'}`` document for every generation after the first.
+        """
+        rows = self.connection.execute('SELECT generation, started_on FROM generations ORDER BY generation')
+        return [{'generation': generation, 'started_on': started_on} for generation, started_on in rows]
+
+    def insert(self, tweet):
+        """
+        Saves a tweet document.
+
+        Arguments:
+            tweet (dict): A tweet document with ``image`` and ``delivered_on`` items,
+                and optionally a ``generation`` item, which defaults to 0.
+
+        Returns:
+            int: The document's id.
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO tweets (image, delivered_on, generation) VALUES (?, ?, ?)',
+                (tweet['image'], tweet.get('delivered_on'), tweet.get('generation', 0)))
+        return cursor.lastrowid
+
+    def insert_multiple(self, tweets, generations=()):
+        """
+        Saves tweet documents, and optionally generations, in a single transaction.
+        If any of them can't be saved, none are.
+
+        Arguments:
+            tweets: Iterable of tweet documents.
+            generations: Iterable of ``{'generation', 'started_on'}`` documents.
+        """
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO tweets (image, delivered_on, generation) VALUES (?, ?, ?)',
+                ((tweet['image'], tweet.get('delivered_on'), tweet.get('generation', 0)) for tweet in tweets))
+            self.connection.executemany('INSERT INTO generations (generation, started_on) VALUES (?, ?)',
+                                        ((cycle['generation'], cycle.get('started_on')) for cycle in generations))
+
+    def all(self):
+        """
+        Returns:
+            list: Every tweet document of every generation, in insertion order.
+        """
+        rows = self.connection.execute('SELECT image, delivered_on, generation FROM tweets ORDER BY id')
+        return [{'image': image, 'delivered_on': delivered_on, 'generation': generation}
+                for image, delivered_on, generation in rows]
+
+    def purge(self):
+        """Removes every tweet document."""
+        with self.connection:
+            self.connection.execute('DELETE FROM tweets')
+
+    def posted_files(self, generation=None):
+        """
+        Arguments:
+            generation (int): A generation. Default: ``None``, which is the current generation.
+
+        Returns:
+            set: Image names posted during the generation, read from the ``generation`` and ``image`` index.
+        """
+        if generation is None:
+            generation = self.generation
+        rows = self.connection.execute('SELECT DISTINCT image FROM tweets WHERE generation = ?', (generation,))
+        return {image for image, in rows}
+
+    def close(self):
+        """Closes the connection."""
+        self.connection.close()
+
+    def __contains__(self, image):
+        cursor = self.connection.execute('SELECT 1 FROM tweets WHERE generation = ? AND image = ? LIMIT 1',
+                                         (self.generation, image))
+        return cursor.fetchone() is not None
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM tweets').fetchone()[0]
+
+
+def import_tinydb(source_location, database):
+    """
+    Copies the tweet history and its generations from a TinyDB file into an empty SQLite database.
+
+    Both TinyDB's default JSON files and :class:`~.goldfinchsong.storages.JournalStorage`
+    files can be imported. The source file is only read, and the tweets and
+    generations are saved in a single transaction, so a failed import leaves the
+    database empty and can be retried.
+
+    Arguments:
+        source_location (str): File path of the TinyDB database.
+        database (SQLiteDatabase): The destination database.
+
+    Returns:
+        int: Number of imported tweet documents.
+
+    Raises:
+        FileNotFoundError: Raises exception if there is no TinyDB file at the source location.
+        ValueError: Raises exception if the destination database already has tweets, or if
+            the source file isn't empty but no TinyDB data can be read from it.
+    """
+    if not isfile(source_location):
+        raise FileNotFoundError('No TinyDB file at {0}.'.format(source_location))
+    if len(database):
+        raise ValueError('The SQLite database at {0} already has tweets.'.format(database.location))
+    from .storages import read_data
+    data = read_data(source_location)
+    if not data and getsize(source_location):
+        raise ValueError('No TinyDB data could be read from {0}.'.format(source_location))
+    documents = data.get('_default', dict())
+    tweets = [documents[key] for key in sorted(documents, key=int)]
+    generations = sorted(data.get(utils.GENERATION_TABLE, dict()).values(), key=lambda cycle: cycle['generation'])
+    database.insert_multiple(tweets, generations)
+    return len(tweets)
@@ -0,0 +1,236 @@
+"""
+Storages module. Provides TinyDB storage backends for the tweet history.
+"""
+import json
+import os
+from tinydb.storages import Storage, touch
+from . import utils
+
+
+def apply_record(state, record):
+    """
+    Applies a journal line to data.
+
+    Arguments:
+        state (dict): The data, which is modified in place.
+        record (dict): A journal record, or a complete data snapshot.
+
+    Returns:
+        dict: The data after the record, which is the snapshot itself for a snapshot.
+    """
+    operation = record.get('op')
+    if operation is None:
+        return record
+    table = record['table']
+    if operation == 'create':
+        state[table] = dict()
+    elif operation == 'insert':
+        state.setdefault(table, dict())[record['id']] = record['doc']
+    elif operation == 'delete':
+        state.get(table, dict()).pop(record['id'], None)
+    elif operation == 'drop':
+        state.pop(table, None)
+    return state
+
+
+def read_data(path):
+    """
+    Reads a TinyDB ``JSONStorage`` file, indented or not, or a :class:`JournalStorage`
+    file without changing it. An incomplete last journal line is ignored.
+
+    Arguments:
+        path (str): File path of the database.
+
+    Returns:
+        dict: Documents keyed to document ids, keyed to table names.
+
+    Raises:
+        ValueError: Raises exception if a journal line other than the last can't be read.
+    """
+    with open(path, 'rb') as data_file:
+        content = data_file.read()
+    try:
+        data = json.loads(content.decode('utf-8'))
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        return data
+    state = dict()
+    lines = content.splitlines()
+    for index, line in enumerate(lines):
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except ValueError:
+            if index < len(lines) - 1:
+                raise ValueError('Line {0} of the journal at {1} is corrupt.'.format(index + 1, path))
+            break
+        state = apply_record(state, record)
+    return state
+
+
+class JournalStorage(Storage):
+    """
+    Append-only, line-delimited JSON storage for TinyDB.
+
+    TinyDB hands its storage the complete data on every write. Instead of
+    rewriting the whole file, this storage compares the data with what it last
+    wrote and appends one JSON line per changed document::
+
+        {"op": "create", "table": "_default"}
+        {"op": "insert", "table": "_default", "id": "7", "doc": {"image": "image.jpg", "delivered_on": "..."}}
+        {"op": "delete", "table": "_default", "id": "7"}
+        {"op": "drop", "table": "_default"}
+
+    Updated documents are journaled as inserts that replace the earlier version.
+    After ``compact_every`` journal lines, the file is compacted into a single
+    snapshot line holding the complete data, which is the same JSON object
+    TinyDB's default ``JSONStorage`` writes. An existing ``JSONStorage`` file is
+    therefore read as a snapshot, so switching storages requires no migration. A
+    ``JSONStorage`` file written with ``indent`` spans several lines; it's read as
+    a whole and rewritten as a single snapshot line when the journal is opened.
+
+    If the process dies while appending, the incomplete last line is discarded
+    the next time the journal is opened. A line that can't be read anywhere else
+    raises ``ValueError`` and leaves the file as it is.
+
+    Attributes:
+        path (str): File path of the journal.
+        compact_every (int): Number of journal lines after which the file is compacted.
+    """
+    def __init__(self, path, compact_every=1000, create_dirs=False):
+        super().__init__()
+        touch(path, create_dirs=create_dirs)
+        self.path = path
+        self.compact_every = int(compact_every)
+        self._state = dict()
+        self._records = 0
+        self._empty = True
+        self._replay()
+        self._handle = open(path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        """
+        Rebuilds the data from the journal file, truncating an incomplete last line.
+
+        Raises:
+            ValueError: Raises exception if a line other than the last can't be read.
+        """
+        valid_size = 0
+        needs_newline = False
+        with open(self.path, 'rb') as journal_file:
+            lines = journal_file.readlines()
+        for index, line in enumerate(lines):
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                if index == 0 and self._replay_snapshot():
+                    return
+                if index < len(lines) - 1:
+                    raise ValueError('Line {0} of the journal at {1} is corrupt.'.format(index + 1, self.path))
+                break
+            self._apply(record)
+            valid_size += len(line)
+            needs_newline = not line.endswith(b'\n')
+        if valid_size != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as journal_file:
+                journal_file.truncate(valid_size)
+        if needs_newline:
+            with open(self.path, 'ab') as journal_file:
+                journal_file.write(b'\n')
+
+    def _replay_snapshot(self):
+        """
+        Reads the journal file as a single JSON object, such as a ``JSONStorage``
+        file written with ``indent``, and rewrites it as a single snapshot line.
+
+        Returns:
+            bool: ``False`` if the file isn't a JSON object.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as journal_file:
+                data = json.load(journal_file)
+        except ValueError:
+            return False
+        if not isinstance(data, dict):
+            return False
+        self._apply(data)
+        self._write_snapshot()
+        return True
+
+    def _apply(self, record):
+        """
+        Applies a journal line to the in-memory data.
+
+        Arguments:
+            record (dict): A journal record, or a complete data snapshot.
+        """
+        self._empty = False
+        self._records = self._records + 1 if 'op' in record else 0
+        self._state = apply_record(self._state, record)
+
+    def _changes(self, data):
+        """
+        Lists journal records that turn the last written data into new data.
+
+        Arguments:
+            data (dict): Complete data from TinyDB.
+
+        Returns:
+            list
+        """
+        records = list()
+        for table, documents in data.items():
+            previous_documents = self._state.get(table)
+            if previous_documents is None:
+                records.append({'op': 'create', 'table': table})
+                previous_documents = dict()
+            keys = set()
+            for document_id, document in documents.items():
+                key = str(document_id)
+                keys.add(key)
+                if previous_documents.get(key) != document:
+                    records.append({'op': 'insert', 'table': table, 'id': key, 'doc': dict(document)})
+            for key in previous_documents:
+                if key not in keys:
+                    records.append({'op': 'delete', 'table': table, 'id': key})
+        for table in self._state:
+            if table not in data:
+                records.append({'op': 'drop', 'table': table})
+        return records
+
+    def read(self):
+        if self._empty:
+            return None
+        # TinyDB replaces or removes whole tables, but never modifies them in place
+        return dict(self._state)
+
+    def write(self, data):
+        records = self._changes(data)
+        if not records and not self._empty:
+            return
+        lines = [json.dumps(record) for record in records]
+        self._handle.write(''.join(line + '\n' for line in lines))
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        for record in records:
+            self._apply(record)
+        self._empty = False
+        if self._records >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the journal as a single snapshot line. A crash leaves either the
+        old journal or the new snapshot.
+        """
+        self._handle.close()
+        self._write_snapshot()
+        self._handle = open(self.path, 'a', encoding='utf-8')
+        self._records = 0
+
+    def _write_snapshot(self):
+        """Replaces the journal file with a single snapshot line."""
+        utils.atomic_write(self.path, json.dumps(self._state) + '\n', sync=True)
+
+    def close(self):
+        self._handle.close()
@@ -0,0 +1,278 @@
+"""
+Stub server module. A local HTTP server that mimics the Twitter media upload
+and status update endpoints, for testing and load testing the
+:mod:`~.goldfinchsong.aio` client offline. Both simple uploads and the chunked
+INIT/APPEND/FINALIZE/STATUS flow are supported.
+
+For example::
+
+    with StubTwitterServer(delay=0.1) as server:
+        api = AsyncAPI(credentials, api_url=server.url, upload_url=server.url)
+        asyncio.run(api.update_with_media('images/goldfinch1.jpg', 'goldfinch1'))
+    print(server.statuses)
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+
+def parse_multipart(content_type, body):
+    """
+    Arguments:
+        content_type (str): The ``Content-Type`` header value, with a boundary.
+        body (bytes): A ``multipart/form-data`` request body.
+
+    Returns:
+        dict: Field contents, as bytes, keyed to field names.
+    """
+    boundary = content_type.partition('boundary=')[2].strip('"').encode('latin-1')
+    fields = dict()
+    for part in body.split(b'--' + boundary)[1:]:
+        if part.startswith(b'--'):
+            break
+        head, separator, content = part.partition(b'\r\n\r\n')
+        name = head.decode('utf-8').partition('name="')[2].partition('"')[0]
+        fields[name] = content[:-2] if content.endswith(b'\r\n') else content
+    return fields
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Handles a request to a :class:`StubTwitterServer`."""
+
+    def log_message(self, format, *arguments):
+        pass
+
+    def is_authorized(self):
+        """Waits out the stub's delay and rejects requests without an OAuth header."""
+        if self.server.stub.delay:
+            time.sleep(self.server.stub.delay)
+        if not self.headers.get('Authorization', '').startswith('OAuth '):
+            self.send_json(401, {'errors': [{'code': 32, 'message': 'Could not authenticate you.'}]})
+            return False
+        return True
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        if not self.is_authorized():
+            return
+        parts = urlsplit(self.path)
+        fields = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if parts.path == '/1.1/media/upload.json' and fields.get('command') == 'STATUS':
+            self.send_json(*stub.media_status(fields))
+        else:
+            self.send_json(404, {'errors': [{'code': 34, 'message': 'Sorry, that page does not exist.'}]})
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with stub.lock:
+            stub.largest_request = max(stub.largest_request, len(body))
+        if not self.is_authorized():
+            return
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            fields = parse_multipart(content_type, body)
+            for name, value in fields.items():
+                if name != 'media':
+                    fields[name] = value.decode('utf-8')
+        else:
+            fields = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+        path = urlsplit(self.path).path
+        if path == '/1.1/statuses/update.json' and stub.take_rate_limit():
+            reset = int(time.time() + stub.rate_limit_reset_after)
+            self.send_json(429, {'errors': [{'code': 88, 'message': 'Rate limit exceeded'}]},
+                           {'x-rate-limit-limit': '300', 'x-rate-limit-remaining': '0',
+                            'x-rate-limit-reset': str(reset)})
+            return
+        if path == '/1.1/media/upload.json' and 'command' in fields:
+            self.send_json(*stub.chunked_upload(fields))
+        elif path == '/1.1/media/upload.json':
+            self.send_json(*stub.upload_media(fields))
+        elif path == '/1.1/statuses/update.json':
+            self.send_json(*stub.update_status(fields))
+        else:
+            self.send_json(404, {'errors': [{'code': 34, 'message': 'Sorry, that page does not exist.'}]})
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """A threaded HTTP server with a listen backlog deep enough for load tests."""
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StubTwitterServer:
+    """
+    A threaded local server for the media upload and status update endpoints.
+
+    The server listens on a free local port once started. Use it as a context
+    manager, or call :meth:`start` and :meth:`stop`.
+
+    Attributes:
+        delay (float): Seconds each request waits before it's handled, to simulate latency.
+        media (dict): Uploaded media sizes keyed to media ids. Chunked uploads
+            are added once they're finalized.
+        uploads (dict): Chunked uploads keyed to media ids, as dicts with
+            ``total_bytes``, ``media_category`` and ``segments`` items. ``segments``
+            holds each appended segment's size keyed to its index.
+        statuses (list): Posted statuses, as dicts with ``id``, ``text`` and ``media_ids`` items.
+        failing_appends (int): Number of upcoming APPEND requests to answer with
+            a 503 status, to simulate transient failures.
+        rate_limited_statuses (int): Number of upcoming status updates to answer
+            with a 429 status and rate limit headers.
+        rate_limit_reset_after (float): Seconds after a 429 response at which its
+            ``x-rate-limit-reset`` header says the limit resets.
+        largest_request (int): Size in bytes of the largest POST body received.
+        url (str): The server's base URL, once started.
+    """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.media = dict()
+        self.uploads = dict()
+        self.statuses = list()
+        self.failing_appends = 0
+        self.rate_limited_statuses = 0
+        self.rate_limit_reset_after = 0
+        self.largest_request = 0
+        self.url = None
+        self.lock = threading.Lock()
+        self.http_server = None
+        self.thread = None
+
+    def start(self):
+        """Starts serving on a background thread."""
+        self.http_server = StubHTTPServer(('127.0.0.1', 0), StubRequestHandler)
+        self.http_server.stub = self
+        host, port = self.http_server.server_address[:2]
+        self.url = 'http://{0}:{1}'.format(host, port)
+        self.thread = threading.Thread(target=self.http_server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops serving."""
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        self.thread.join()
+
+    def take_rate_limit(self):
+        """
+        Returns:
+            bool: ``True`` if the current status update should be rate limited.
+        """
+        with self.lock:
+            if self.rate_limited_statuses:
+                self.rate_limited_statuses -= 1
+                return True
+        return False
+
+    def upload_media(self, fields):
+        """
+        Arguments:
+            fields (dict): Request fields.
+
+        Returns:
+            tuple: The response status and data.
+        """
+        if 'media' not in fields:
+            return 400, {'errors': [{'code': 38, 'message': 'media parameter is missing.'}]}
+        with self.lock:
+            media_id = self.next_media_id()
+            self.media[media_id] = len(fields['media'])
+        return 200, {'media_id': int(media_id), 'media_id_string': media_id, 'size': self.media[media_id]}
+
+    def next_media_id(self):
+        """
+        Returns:
+            str: An unused media id.
+        """
+        return str(len(self.media) + len(self.uploads) + 1)
+
+    def chunked_upload(self, fields):
+        """
+        Handles the INIT, APPEND and FINALIZE commands.
+
+        GIFs report pending processing when they're finalized, so clients
+        have to check the STATUS command.
+
+        Arguments:
+            fields (dict): Request fields.
+
+        Returns:
+            tuple: The response status and data.
+        """
+        command = fields['command']
+        with self.lock:
+            if command == 'INIT':
+                media_id = self.next_media_id()
+                self.uploads[media_id] = {'total_bytes': int(fields['total_bytes']),
+                                          'media_category': fields.get('media_category'), 'segments': dict()}
+                return 202, {'media_id': int(media_id), 'media_id_string': media_id}
+            upload = self.uploads.get(fields.get('media_id'))
+            if upload is None:
+                return 400, {'errors': [{'code': 324, 'message': 'Invalid media id.'}]}
+            if command == 'APPEND':
+                if self.failing_appends:
+                    self.failing_appends -= 1
+                    return 503, {'errors': [{'code': 131, 'message': 'Internal error.'}]}
+                upload['segments'][int(fields['segment_index'])] = len(fields['media'])
+                return 204, None
+            if command == 'FINALIZE':
+                size = sum(upload['segments'].values())
+                if size != upload['total_bytes']:
+                    return 400, {'errors': [{'code': 324, 'message': 'File size does not match.'}]}
+                self.media[fields['media_id']] = size
+                data = {'media_id': int(fields['media_id']), 'media_id_string': fields['media_id'], 'size': size}
+                if upload['media_category'] == 'tweet_gif':
+                    data['processing_info'] = {'state': 'pending', 'check_after_secs': 0}
+                return 201, data
+        return 400, {'errors': [{'code': 38, 'message': 'command parameter is invalid.'}]}
+
+    def media_status(self, fields):
+        """
+        Handles the STATUS command.
+
+        Arguments:
+            fields (dict): Request query parameters.
+
+        Returns:
+            tuple: The response status and data.
+        """
+        with self.lock:
+            if fields.get('media_id') not in self.media:
+                return 400, {'errors': [{'code': 324, 'message': 'Invalid media id.'}]}
+        return 200, {'media_id': int(fields['media_id']), 'media_id_string': fields['media_id'],
+                     'processing_info': {'state': 'succeeded', 'progress_percent': 100}}
+
+    def update_status(self, fields):
+        """
+        Arguments:
+            fields (dict): Request fields.
+
+        Returns:
+            tuple: The response status and data.
+        """
+        media_ids = [media_id for media_id in fields.get('media_ids', '').split(',') if media_id]
+        with self.lock:
+            if any(media_id not in self.media for media_id in media_ids):
+                return 400, {'errors': [{'code': 324, 'message': 'Invalid media id.'}]}
+            status = {'id': len(self.statuses) + 1, 'text': fields.get('status', ''), 'media_ids': media_ids}
+            self.statuses.append(status)
+        return 200, {'id': status['id'], 'id_str': str(status['id']), 'text': status['text']}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exception_details):
+        self.stop()
@@ -1,12 +1,26 @@
 """
 Utilities module. Almost all **goldfinchsong** logic is handled by the
 functions in this module. It's the workhorse of the package.
+
+``tweepy`` and ``multiprocessing`` are imported by the functions that use them,
+so importing the module stays fast for commands that never reach them.
+
+Attributes:
+    IMAGE_EXTENSIONS (frozenset): Lowercase file extensions of image files.
+    GENERATION_TABLE (str): Name of the TinyDB table that records the posting
+        cycles, or generations, of a history database.
 """
+from datetime import datetime, timezone
+import json
+import os
 import random
-import re
-from os import listdir
-from os.path import isfile, join
-import tweepy
+from . import compaction, library, metrics
+
+IMAGE_EXTENSIONS = frozenset(('png', 'jpg', 'jpeg', 'gif'))
+
+GENERATION_TABLE = 'generations'
+
+status_worker_settings = dict()
 
 
 def access_api(credentials):
@@ -17,12 +31,80 @@ def access_api(credentials):
     Returns:
         A tweepy API instance.
     """
+    import tweepy
     auth = tweepy.OAuthHandler(credentials['consumer_key'], credentials['consumer_secret'])
     auth.set_access_token(credentials['access_token'], credentials['access_token_secret'])
     api = tweepy.API(auth)
     return api
 
 
+def read_json(location):
+    """
+    Arguments:
+        location (str): File path.
+
+    Returns:
+        The decoded JSON data or ``None`` if the file is missing or unreadable.
+    """
+    try:
+        with open(location, encoding='utf-8') as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+def sibling_location(location, suffix):
+    """
+    Provides the path of a file that sits next to another, such as the database's
+    catalog, queue or cache.
+
+    Arguments:
+        location (str): File path of the original file.
+        suffix (str): Suffix that replaces the original file's extension.
+
+    Returns:
+        str: For example, ``goldfinchsong_db.json`` and ``.queue.json`` give ``goldfinchsong_db.queue.json``.
+    """
+    root, extension = os.path.splitext(location)
+    return ''.join([root, suffix])
+
+
+def atomic_write(location, data, sync=False):
+    """
+    Writes a file to a temporary path and then moves it into place so that
+    readers never see a partially written file.
+
+    Arguments:
+        location (str): Destination file path.
+        data (str or bytes): File contents. Text is written as UTF-8, without
+            newline translation.
+        sync (bool): Whether the contents are flushed to disk before the move,
+            so a crash leaves either the old file or the new one.
+    """
+    temporary_location = ''.join([location, '.tmp'])
+    if isinstance(data, bytes):
+        output_file = open(temporary_location, 'wb')
+    else:
+        output_file = open(temporary_location, 'w', encoding='utf-8', newline='')
+    with output_file:
+        output_file.write(data)
+        if sync:
+            output_file.flush()
+            os.fsync(output_file.fileno())
+    os.replace(temporary_location, location)
+
+
+def write_json(location, data):
+    """
+    Writes JSON with :func:`atomic_write`.
+
+    Arguments:
+        location (str): Destination file path.
+        data: JSON-serializable data.
+    """
+    atomic_write(location, json.dumps(data))
+
+
 def apply_abbreviations(text, abbreviations, maximum_length=117):
     """
     Abbreviates words until status text does not exceed the maximum length.
@@ -30,6 +112,11 @@ def apply_abbreviations(text, abbreviations, maximum_length=117):
     Not all abbreviations are necessarily applied; the function iterates
     abbreviation-by-abbreviation, checking length after each substitution.
 
+    The abbreviations are compiled once into an
+    :class:`~.goldfinchsong.compaction.AbbreviationMatcher` that is cached per
+    table. Abbreviations whose words don't appear in the text are skipped,
+    since substituting them can't change the text.
+
     Args:
         text (str): A tweet's status text.
         abbreviations (OrderedDict): An ``OrderedDict`` keyed to a word with its abbreviation as the value.
@@ -38,14 +125,7 @@ def apply_abbreviations(text, abbreviations, maximum_length=117):
     Returns:
         str: New status text
     """
-    new_text = text
-    for not_abbreviated, abbreviated in abbreviations.items():
-        pattern = ''.join([r'\b', not_abbreviated, r'\b'])
-        regex = re.compile(pattern)
-        new_text = regex.sub(abbreviated, new_text)
-        if len(new_text) <= maximum_length:
-            return new_text
-    return new_text
+    return compaction.compile_abbreviations(abbreviations).apply(text, maximum_length)
 
 
 def assemble_elided_status(complete_words, elided_words):
@@ -72,6 +152,10 @@ def apply_vowel_elision(text, maximum_length=117):
     """
     Removes a strings non-boundary vowels until it does not exceed the maximum character length.
 
+    Running lengths of the complete and elided words are kept as words are elided,
+    so the function is linear in the number of words. See
+    :func:`~.goldfinchsong.compaction.elide_words`.
+
     Args:
         text (str): A twitter status text.
         maximum_length (int): Maximum character length.
@@ -79,25 +163,18 @@ def apply_vowel_elision(text, maximum_length=117):
     Returns:
         str: Status text with whatever vowel elisions were necessary to meet length constraint.
     """
-    words = text.split()
-    words.reverse()
-    elided_words = list()
-    vowel_regex = re.compile(r'\B[aeiou]\B', re.IGNORECASE)
-    while words:
-        word = words.pop(0)
-        elided_word = vowel_regex.sub('', word)
-        elided_words.append(elided_word)
-        complete_word_length = len(' '.join(words))
-        elided_word_length = len(' '.join(elided_words))
-        if (complete_word_length + elided_word_length) <= maximum_length:
-            return assemble_elided_status(words, elided_words)
-    return assemble_elided_status(words, elided_words)
+    words, lengths = compaction.elide_words(text.split(), maximum_length)
+    return ' '.join(words)
 
 
 def chop_words(text, maximum_length=117):
     """
     Deletes last word in a string until it does not exceed maximum length.
 
+    The cut point is computed from prefix sums of the word lengths rather than
+    by joining the remaining words after each deletion. See
+    :func:`~.goldfinchsong.compaction.chop_count`.
+
     Args:
         text (str): Status text.
         maximum_length (int): Maximum character length.
@@ -107,40 +184,107 @@ def chop_words(text, maximum_length=117):
 
     """
     words = text.split()
-    for i in range(len(words)):
-        words.pop()
-        chopped_text = ' '.join(words)
-        if len(chopped_text) <= maximum_length:
-            return chopped_text
-    return None
+    count = compaction.chop_count([len(word) for word in words], maximum_length)
+    if count is None:
+        return None
+    return ' '.join(words[:count])
+
+
+def get_generation(db):
+    """
+    Provides the history database's current generation, the number of the
+    posting cycle in progress. Tweet documents carry the generation they were
+    posted in as a ``generation`` item; documents without one belong to generation 0.
+
+    Args:
+        db: TinyDB, :class:`~.goldfinchsong.history.History` or
+            :class:`~.goldfinchsong.sqlite.SQLiteDatabase` instance.
+
+    Returns:
+        int: The current generation. A database that never finished a cycle is at generation 0.
+    """
+    if hasattr(db, 'generation'):
+        return db.generation
+    return max((cycle['generation'] for cycle in db.table(GENERATION_TABLE).all()), default=0)
+
+
+def get_generations(db):
+    """
+    Args:
+        db: TinyDB, :class:`~.goldfinchsong.history.History` or
+            :class:`~.goldfinchsong.sqlite.SQLiteDatabase` instance.
+
+    Returns:
+        list: A ``{'generation', 'started_on'}`` document for every generation after
+            the first, in order. ``started_on`` is an ISO 8601 timestamp.
+    """
+    if hasattr(db, 'generations'):
+        return db.generations()
+    return sorted(db.table(GENERATION_TABLE).all(), key=lambda cycle: cycle['generation'])
+
+
+def start_generation(db):
+    """
+    Starts a new posting cycle. The cycle's number is recorded in a small table
+    of its own, so the tweet documents of past cycles are left in place and can
+    still be read with :func:`get_posted_files` and the database's ``all`` method.
 
+    Args:
+        db: TinyDB, :class:`~.goldfinchsong.history.History` or
+            :class:`~.goldfinchsong.sqlite.SQLiteDatabase` instance.
 
-def get_posted_files(db):
+    Returns:
+        int: The new generation.
     """
-    Extracts a set of image file names for persisted tweets.
+    if hasattr(db, 'start_generation'):
+        return db.start_generation()
+    generation = get_generation(db) + 1
+    db.table(GENERATION_TABLE).insert({'generation': generation,
+                                       'started_on': datetime.now(tz=timezone.utc).isoformat()})
+    return generation
+
+
+def get_posted_files(db, generation=None):
+    """
+    Extracts a set of image file names for persisted tweets of a generation.
 
     The application's expected image file format is ``an-image-name-without-the-path.png``. So,
     it does not include the path to the image file in the saved string.
 
+    If ``db`` is a :class:`~.goldfinchsong.history.History`, its maintained
+    index is used instead of reading every tweet document.
+
     Args:
-        db: TinyDB instance.
+        db: TinyDB or :class:`~.goldfinchsong.history.History` instance.
+        generation (int): A posting cycle, as :func:`get_generation` numbers them.
+            Default: ``None``, which is the current generation.
 
     Returns:
-        set
+        set: A set, or a set-like view for a ``History``.
     """
-    posted_files = set()
-    all_tweets = db.all()
-    for tweet in all_tweets:
-        posted_files.add(tweet['image'])
+    if hasattr(db, 'posted_files'):
+        posted_files = db.posted_files(generation)
+        if metrics.hooks:
+            metrics.gauge('history_size', len(db))
+    else:
+        if generation is None:
+            generation = get_generation(db)
+        posted_files = set()
+        all_tweets = db.all()
+        for tweet in all_tweets:
+            if tweet.get('generation', 0) == generation:
+                posted_files.add(tweet['image'])
+        metrics.gauge('history_size', len(all_tweets))
     return posted_files
 
 
-def get_unused_files(db, available_files):
+def get_unused_files(db, available_files, dry_run=False):
     """
     Determines image files that can be used for new image posts
-    by taking out used images from available images. If all
-    images have been used, the database is purged, allowing for
-    repetition of past images.
+    by taking out images used in the current generation from available
+    images. If all images have been used, a new generation is started
+    with :func:`start_generation`, allowing for repetition of past images.
+    Without available files, or in a dry run, no generation is started.
 
     The application's expected image file format for available files is
     ``an-image-name-without-the-path.png``. It should not include the
@@ -149,17 +293,20 @@ def get_unused_files(db, available_files):
     Args:
         db: TinyDB instance.
         available_files (list): All of the existing files in the image directory.
+        dry_run (bool): If ``True``, the history database isn't changed.
 
     Returns:
         list
     """
-    unused_files = list()
-    posted_files = get_posted_files(db)
-    for available_file in available_files:
-        if available_file not in posted_files:
-            unused_files.append(available_file)
+    with metrics.phase('get_unused_files'):
+        unused_files = list()
+        posted_files = get_posted_files(db)
+        for available_file in available_files:
+            if available_file not in posted_files:
+                unused_files.append(available_file)
     if len(unused_files) == 0:
-        db.purge()
+        if available_files and not dry_run:
+            start_generation(db)
         return available_files
     else:
         return unused_files
@@ -175,9 +322,8 @@ def is_image_file(file_name):
     Returns:
         bool: Returns ``True`` if the file name has image extension. ``False`` otherwise.
     """
-    regex = re.compile(r"(.+)\.(png|jpg|jpeg|gif)$", re.IGNORECASE)
-    result = regex.match(file_name)
-    return True if result else False
+    stem, dot, extension = file_name.rpartition('.')
+    return bool(stem) and extension.lower() in IMAGE_EXTENSIONS
 
 
 def trim_file_extension(file_name):
@@ -189,10 +335,13 @@ def trim_file_extension(file_name):
 
     Returns:
         str: File name string without the image type extension.
+
+    Raises:
+        ValueError: Raises exception if the file name doesn't have an image extension.
     """
-    regex = re.compile(r"(.+)\.(png|jpg|jpeg|gif)$", re.IGNORECASE)
-    result = regex.match(file_name)
-    return result.group(1)
+    if not is_image_file(file_name):
+        raise ValueError('{0} is not an image file name.'.format(file_name))
+    return file_name.rpartition('.')[0]
 
 
 def to_compact_text(candidate_text, maximum_length=117, text_conversions=None):
@@ -214,6 +363,10 @@ def to_compact_text(candidate_text, maximum_length=117, text_conversions=None):
     - If the text is still too long, then words are deleted from last to first until
       the resulting text does not exceed the maximum length.
 
+    The text is split into words once, after the abbreviations are applied, and
+    the vowel elision and word deletion steps share those words. See
+    :func:`~.goldfinchsong.compaction.compact_text`.
+
     Arguments:
         candidate_text (str): Original text before function processing.
         maximum_length (int): The maximum character length for the text.
@@ -226,20 +379,28 @@ def to_compact_text(candidate_text, maximum_length=117, text_conversions=None):
         str: A text string that shorter than the passed maximum length argument.
 
     """
-    if len(candidate_text) <= maximum_length:
-        return candidate_text
-    else:
-        compact_text = candidate_text
-        compact_text = apply_abbreviations(compact_text, text_conversions, maximum_length)
-        if len(compact_text) <= maximum_length:
-            return compact_text
-        else:
-            compact_text = apply_vowel_elision(compact_text, maximum_length)
-            if len(compact_text) <= maximum_length:
-                return compact_text
-            else:
-                chopped_text = chop_words(compact_text, maximum_length)
-                return chopped_text if chopped_text else ''
+    # called for every file when status texts are computed in bulk, so it skips the phase without hooks
+    if not metrics.hooks:
+        return compaction.compact_text(candidate_text, maximum_length, text_conversions)[0]
+    with metrics.phase('to_compact_text'):
+        return compaction.compact_text(candidate_text, maximum_length, text_conversions)[0]
+
+
+def status_source_text(file_name):
+    """
+    Provides the text a status is compacted from: the file name without its
+    directories or extension, with underscores turned into blank spaces.
+
+    Arguments:
+        file_name (str): An image file name or library key. For example: ``birds/selected_image.png``.
+
+    Returns:
+        str: The uncompacted status text. For example: ``selected image``.
+
+    Raises:
+        ValueError: Raises exception if the file name doesn't have an image extension.
+    """
+    return trim_file_extension(file_name.rpartition('/')[2]).replace('_', ' ')
 
 
 def extract_status_text(file_name, text_conversions=None, maximum_length=117):
@@ -249,7 +410,8 @@ def extract_status_text(file_name, text_conversions=None, maximum_length=117):
 
     As part of generating the status, the function transforms
     underscores ``_`` into blank spaces. Use underscores to
-    create white space in your text status.
+    create white space in your text status. The directories of
+    an image library key are left out of the status.
 
     An image link consumes 23 characters, leaving 117 for text.
 
@@ -258,44 +420,144 @@ def extract_status_text(file_name, text_conversions=None, maximum_length=117):
         text_conversions (dict): Keys represent full-length versions of a word.
             If the string value paired with the key is an abbreviated form that may
             be used by the function in an attempt to reduce the length of the
-            candidate text.
+            candidate text. An :class:`~.goldfinchsong.compaction.AbbreviationMatcher`
+            compiled from the conversions is also accepted.
         maximum_length (int): The maximum character length for the text.
 
     Returns:
         text (str): A string of text based on the file name.
 
     """
-    text = trim_file_extension(file_name)
-    text = text.replace('_', ' ')
+    text = status_source_text(file_name)
     compact_text = to_compact_text(text, text_conversions=text_conversions,
                                    maximum_length=maximum_length)
     return compact_text
 
 
-def load_content(db, image_directory, text_conversions=None):
+def initialize_status_worker(text_conversions, maximum_length):
+    """
+    Compiles the text conversions once in each :func:`extract_status_texts` worker process.
+
+    Args:
+        text_conversions (dict): Text conversions for the status texts.
+        maximum_length (int): The maximum character length for the text.
+    """
+    status_worker_settings['matcher'] = compaction.compile_abbreviations(text_conversions)
+    status_worker_settings['maximum_length'] = maximum_length
+
+
+def extract_status_in_worker(file_name):
+    """
+    Arguments:
+        file_name (str): An image file name.
+
+    Returns:
+        str: The status text, computed with the worker process's settings.
+    """
+    return extract_status_text(file_name, status_worker_settings['matcher'],
+                               status_worker_settings['maximum_length'])
+
+
+def extract_status_texts(file_names, text_conversions=None, maximum_length=117, processes=1, chunksize=256):
+    """
+    Provides the tweet status texts for many image files.
+
+    The text conversions are compiled once and shared by every file. Status
+    texts are yielded as they're computed, in the same order as the file names,
+    so large libraries can be streamed. With more than one process, the file
+    names are spread over a ``multiprocessing`` pool in chunks; each worker
+    process compiles the text conversions once.
+
+    Args:
+        file_names: Iterable of image file names. For example: ``selected_image.png``.
+        text_conversions (dict): Keys represent full-length versions of a word.
+            If the string value paired with the key is an abbreviated form that may
+            be used by the function in an attempt to reduce the length of the
+            candidate text.
+        maximum_length (int): The maximum character length for the text.
+        processes (int): Number of worker processes. Default: ``1``, which computes
+            the texts in the calling process.
+        chunksize (int): Number of file names sent to a worker process at a time.
+
+    Yields:
+        str: A status text for each file name.
+    """
+    if processes > 1:
+        from multiprocessing import Pool
+        with Pool(processes, initializer=initialize_status_worker,
+                  initargs=(text_conversions, maximum_length)) as pool:
+            yield from pool.imap(extract_status_in_worker, file_names, chunksize)
+    else:
+        matcher = compaction.compile_abbreviations(text_conversions)
+        for file_name in file_names:
+            yield extract_status_text(file_name, matcher, maximum_length)
+
+
+def load_content(db, image_directory, text_conversions=None, catalog=None, queue=None, cache=None,
+                 derivatives=None, dry_run=False):
     """
     Generates content tuple after selecting random image from image directory.
 
+    Only image files are candidates for selection, so any image available in the
+    directory produces content even when the directory holds other files.
+
+    The image directory can also be an :class:`~.goldfinchsong.library.ImageLibrary`
+    with several roots or recursive discovery. The images are then named by their
+    library keys, paths relative to their roots, which the history records.
+
+    The ``scan``, ``select``, ``derivative`` and ``status_text`` phases and the
+    ``images_found`` counter, the number of candidate images in the library, are
+    reported to the :mod:`~.goldfinchsong.metrics` hooks.
+
     Args:
         db: A TinyDB instance.
-        image_directory (str): File path to image directory.
+        image_directory (str | ImageLibrary): File path to image directory, or an image library.
         text_conversions (dict): Keys represent full-length versions of a word.
             If the string value paired with the key is an abbreviated form that may
             be used by the function in an attempt to reduce the length of the
             candidate text.
+        catalog (ImageCatalog): Optional :class:`~.goldfinchsong.catalog.ImageCatalog`.
+            If present, available images are read from the catalog, which classifies
+            files when it scans the directory, instead of listing the image directories.
+        queue (PostingQueue): Optional :class:`~.goldfinchsong.selection.PostingQueue`.
+            If present along with a catalog, the image is picked from the queue
+            instead of randomly choosing among unused files.
+        cache (StatusTextCache): Optional :class:`~.goldfinchsong.cache.StatusTextCache`.
+            If present, the status text is read from the cache when it was already
+            computed with the same text conversions.
+        derivatives (DerivativeCache): Optional :class:`~.goldfinchsong.derivatives.DerivativeCache`.
+            If present and the selected image is oversized, the content tuple's
+            first element is the path of the image's processed derivative.
+        dry_run (bool): If ``True``, selection doesn't change the history or the posting queue.
 
     Returns:
         tuple or ``None``: A content tuple with full image path, status text, and
-            image file, if an image file is available in image directory. ``None`` otherwise.
-
-    """
-    available_files = [file for file in listdir(image_directory) if isfile(join(image_directory, file))]
-    if len(available_files):
-        unused_files = get_unused_files(db, available_files)
-        selected_file = random.choice(unused_files)
-        if is_image_file(selected_file):
-            with_full_path = join(image_directory, selected_file)
-            text = extract_status_text(selected_file, text_conversions)
-            content = (with_full_path, text, selected_file)
-            return content
+            image file, or library key, if an image file is available in image directory.
+            ``None`` otherwise.
+
+    """
+    image_library = library.as_library(image_directory)
+    selected_file = None
+    with metrics.phase('scan'):
+        images = image_library.images(catalog)
+    metrics.count('images_found', len(images))
+    if catalog is not None and queue is not None:
+        with metrics.phase('select'):
+            selected_file = queue.select(db, images, image_library.signature, dry_run)
+    elif len(images):
+        with metrics.phase('select'):
+            unused_files = get_unused_files(db, list(images), dry_run)
+            selected_file = random.choice(unused_files)
+    if selected_file is not None and is_image_file(selected_file):
+        with_full_path = image_library.path(selected_file)
+        if derivatives is not None:
+            with metrics.phase('derivative'):
+                with_full_path = derivatives.resolve(with_full_path)
+        with metrics.phase('status_text'):
+            if cache is not None:
+                text = cache.status_text(selected_file, text_conversions)
+            else:
+                text = extract_status_text(selected_file, text_conversions)
+        content = (with_full_path, text, selected_file)
+        return content
     return None
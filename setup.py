@@ -24,6 +24,7 @@ setup(
             'goldfinchsong=goldfinchsong.cli:run',
         ],
     },
+    extras_require={'images': ['Pillow']},
     install_requires=['click',  'tinydb', 'tweepy'],
     keywords="twitter api images",
     license="MIT",
@@ -32,6 +33,7 @@ setup(
     packages=find_packages(include=['goldfinchsong', 'goldfinchsong.*'],
                            exclude=['tests', 'tests.*']),
     platforms=['Any'],
+    python_requires='>=3.8',
     url='https://github.com/jga/goldfinchsong',
     version='0.1.4',
 )
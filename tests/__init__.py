@@ -0,0 +1,22 @@
+import os
+import shutil
+import tempfile
+from goldfinchsong import cli
+
+log_locations = list()
+
+
+def setUpModule():
+    """
+    Points the CLI's log file handler at a temporary directory, so test modules that
+    configure logging don't write ``goldfinchsong.log`` into the working tree.
+    """
+    log_directory = tempfile.mkdtemp()
+    log_locations.append((cli.LOGGER_CONFIG['handlers']['file']['filename'], log_directory))
+    cli.LOGGER_CONFIG['handlers']['file']['filename'] = os.path.join(log_directory, 'goldfinchsong.log')
+
+
+def tearDownModule():
+    log_location, log_directory = log_locations.pop()
+    cli.LOGGER_CONFIG['handlers']['file']['filename'] = log_location
+    shutil.rmtree(log_directory)
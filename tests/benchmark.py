@@ -0,0 +1,240 @@
+"""
+Benchmarks for selection, compaction and history at scale.
+
+Synthetic image libraries and tweet histories are generated for each size,
+and the best of several timings is reported for every benchmark. Results are
+written as JSON so they can be compared across releases::
+
+    python -m tests.benchmark --sizes 1000 100000 --output benchmark.json
+
+Only the 1k size runs by default. The 100k and 1M sizes take minutes and a
+few gigabytes of memory, so they have to be requested.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+from os.path import abspath, join
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from tinydb import TinyDB, storages
+from goldfinchsong import compaction, utils
+from goldfinchsong.catalog import ImageCatalog
+from goldfinchsong.classes import Manager
+from goldfinchsong.history import History
+from goldfinchsong.selection import PostingQueue
+from goldfinchsong.sqlite import SQLiteDatabase
+
+DEFAULT_SIZES = (1000,)
+
+# above this size, images are only cataloged rather than created on disk
+MAXIMUM_FILES_ON_DISK = 100000
+
+MAXIMUM_CONVERSIONS = 100000
+
+WORDS = ('american', 'goldfinch', 'perched', 'on', 'a', 'thistle', 'in', 'the', 'early', 'morning',
+         'light', 'with', 'bright', 'yellow', 'plumage', 'and', 'black', 'wings', 'near', 'river')
+
+
+class FakeAPI:
+
+    def __init__(self):
+        self.uploads = 0
+
+    def update_with_media(self, image, text):
+        self.uploads += 1
+
+
+def best_time(function, repeat=3):
+    """Returns the shortest of ``repeat`` timings of a callable, in seconds."""
+    timings = list()
+    for attempt in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def make_file_names(size):
+    """Returns ``size`` image file names, each a long, distinct phrase."""
+    names = list()
+    for index in range(size):
+        words = [WORDS[(index * 7 + offset * 3) % len(WORDS)] for offset in range(24)]
+        names.append('{0}_{1}.jpg'.format('_'.join(words), index))
+    return names
+
+
+def make_tweets(file_names):
+    """Returns a tweet document for each file name."""
+    return [{'image': name, 'delivered_on': '2016-05-04T17:06:54.987654+00:00'} for name in file_names]
+
+
+def make_text_conversions(size):
+    """Returns a text conversion table of ``size`` entries, with the library's words at the end."""
+    text_conversions = dict(('phrase{0} {1}'.format(index, WORDS[index % len(WORDS)]), 'p{0}'.format(index))
+                            for index in range(max(0, size - len(WORDS))))
+    for word in WORDS:
+        text_conversions[word] = word[:3]
+    return text_conversions
+
+
+class Library:
+    """A synthetic image library with a history of half its images."""
+
+    def __init__(self, size, directory):
+        self.size = size
+        self.directory = directory
+        self.file_names = make_file_names(size)
+        self.posted = self.file_names[::2]
+        self.image_directory = join(directory, 'images')
+        os.mkdir(self.image_directory)
+        self.on_disk = size <= MAXIMUM_FILES_ON_DISK
+        if self.on_disk:
+            for name in self.file_names:
+                open(join(self.image_directory, name), 'wb').close()
+
+    def tinydb(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        db.insert_multiple(make_tweets(self.posted))
+        return db
+
+    def history(self, name='history'):
+        return History(self.tinydb(), join(self.directory, '{0}.index.json'.format(name)))
+
+    def sqlite(self):
+        location = join(self.directory, 'history.sqlite3')
+        if os.path.exists(location):
+            os.remove(location)
+        database = SQLiteDatabase(location)
+        database.insert_multiple(make_tweets(self.posted))
+        return database
+
+    def catalog(self):
+        catalog = ImageCatalog(join(self.directory, 'catalog.json'))
+        files = dict((name, [0, 0, True]) for name in self.file_names)
+        catalog.directories[abspath(self.image_directory)] = {
+            'mtime_ns': os.stat(self.image_directory).st_mtime_ns, 'files': files, 'directories': []}
+        return catalog
+
+
+def benchmark_posted_files(library, record):
+    db = library.tinydb()
+    record('get_posted_files.tinydb', lambda: utils.get_posted_files(db))
+    history = library.history()
+    record('get_posted_files.history', lambda: utils.get_posted_files(history))
+    database = library.sqlite()
+    record('get_posted_files.sqlite', lambda: utils.get_posted_files(database))
+    database.close()
+
+
+def benchmark_unused_files(library, record):
+    history = library.history()
+    record('get_unused_files.history', lambda: utils.get_unused_files(history, library.file_names))
+    db = library.tinydb()
+    record('get_unused_files.tinydb', lambda: utils.get_unused_files(db, library.file_names))
+
+
+def benchmark_load_content(library, record):
+    text_conversions = make_text_conversions(20)
+    history = library.history()
+    catalog = library.catalog()
+    queue = PostingQueue(join(library.directory, 'queue.json'))
+    record('load_content.queue.first', lambda: utils.load_content(history, library.image_directory,
+                                                                  text_conversions, catalog, queue), repeat=1)
+    record('load_content.queue', lambda: utils.load_content(history, library.image_directory,
+                                                            text_conversions, catalog, queue))
+    record('load_content.catalog', lambda: utils.load_content(history, library.image_directory,
+                                                              text_conversions, catalog))
+    if library.on_disk:
+        record('load_content.listdir', lambda: utils.load_content(history, library.image_directory,
+                                                                  text_conversions))
+
+
+def benchmark_compact_text(library, record):
+    texts = [utils.trim_file_extension(name).replace('_', ' ') for name in library.file_names[:1000]]
+    for table_size in sorted({10, 1000, min(library.size, MAXIMUM_CONVERSIONS)}):
+        text_conversions = make_text_conversions(table_size)
+        record('compile_abbreviations.{0}'.format(table_size),
+               lambda: compaction.AbbreviationMatcher(tuple(text_conversions.items())), repeat=1)
+        record('to_compact_text.{0}x{1}'.format(len(texts), table_size),
+               lambda: [utils.to_compact_text(text, 117, text_conversions) for text in texts])
+        matcher = compaction.compile_abbreviations(text_conversions)
+        record('to_compact_text.compiled.{0}x{1}'.format(len(texts), table_size),
+               lambda: [utils.to_compact_text(text, 117, matcher) for text in texts])
+    # vowel elision is linear, so eight times the words should take about eight times as long
+    for repetitions in (100, 800):
+        long_text = ' '.join(WORDS * repetitions)
+        record('apply_vowel_elision.{0}words'.format(len(WORDS) * repetitions),
+               lambda: utils.apply_vowel_elision(long_text, 0))
+
+
+def benchmark_post_tweet(library, record, posts=20):
+    manager = Manager(db=library.history('post'), image_directory=library.image_directory)
+    manager.api = FakeAPI()
+    names = iter(library.file_names[1::2])
+
+    def post():
+        for count in range(posts):
+            name = next(names)
+            manager.content = (join(library.image_directory, name), 'status', name)
+            manager.post_tweet()
+
+    record('post_tweet.x{0}'.format(posts), post, repeat=1)
+
+
+BENCHMARKS = (benchmark_posted_files, benchmark_unused_files, benchmark_load_content,
+              benchmark_compact_text, benchmark_post_tweet)
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3):
+    """
+    Runs every benchmark for every library size.
+
+    Returns:
+        dict: The JSON report.
+    """
+    results = list()
+    for size in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            library = Library(size, directory)
+
+            def record(name, function, repeat=repeat):
+                seconds = best_time(function, repeat)
+                results.append({'benchmark': name, 'size': size, 'seconds': seconds, 'repeat': repeat})
+
+            for benchmark in BENCHMARKS:
+                benchmark(library, record)
+        finally:
+            shutil.rmtree(directory)
+    return {
+        'version': 1,
+        'created_on': datetime.now(tz=timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Benchmarks goldfinchsong selection, compaction and history.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='library sizes, for example: 1000 100000 1000000')
+    parser.add_argument('--repeat', type=int, default=3, help='timings per benchmark; the best is reported')
+    parser.add_argument('--output', default=None, help='JSON file for the results; printed by default')
+    options = parser.parse_args(arguments)
+    report = run_benchmarks(options.sizes, options.repeat)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import pytest
+from tinydb import TinyDB, storages
+from goldfinchsong import aio
+from goldfinchsong.classes import Manager
+from goldfinchsong.ratelimit import RetryPolicy, post_with_retries
+from goldfinchsong.stubserver import StubTwitterServer, parse_multipart
+
+CREDENTIALS = {
+    'consumer_key': 'xvz1evFS4wEEPTGEFPHBog',
+    'consumer_secret': 'kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw',
+    'access_token': '370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb',
+    'access_token_secret': 'LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE',
+}
+
+
+def get_stub_manager(server, image_name='goldfinch1.jpg'):
+    manager = Manager(CREDENTIALS, TinyDB(storage=storages.MemoryStorage), 'tests/images')
+    manager.content = ('tests/images/{0}'.format(image_name), image_name.partition('.')[0], image_name)
+    manager.async_api = aio.AsyncAPI(CREDENTIALS, api_url=server.url, upload_url=server.url)
+    return manager
+
+
+class AsyncAPITests(unittest.TestCase):
+
+    def test_get_authorization(self):
+        # the example from Twitter's "Creating a signature" guide
+        authorization = aio.get_authorization(
+            CREDENTIALS, 'POST', 'https://api.twitter.com/1.1/statuses/update.json',
+            {'status': 'Hello Ladies + Gentlemen, a signed OAuth request!', 'include_entities': 'true'},
+            nonce='kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg', timestamp=1318622958)
+        self.assertTrue(authorization.startswith('OAuth '))
+        self.assertTrue('oauth_signature="hCtSmYh%2BiHYCEqBWrE7C7hYmtUk%3D"' in authorization)
+
+    def test_decode_chunked(self):
+        self.assertEqual(aio.decode_chunked(b'4\r\nWiki\r\n5;name=value\r\npedia\r\n0\r\n\r\n'), b'Wikipedia')
+
+    def test_multipart_round_trip(self):
+        content_type, body = aio.encode_multipart('media', 'image.jpg', b'\x00\r\n\xff')
+        self.assertEqual(parse_multipart(content_type, body), {'media': b'\x00\r\n\xff'})
+
+    def test_update_with_media(self):
+        with StubTwitterServer() as server:
+            api = aio.AsyncAPI(CREDENTIALS, api_url=server.url, upload_url=server.url)
+            status = asyncio.run(api.update_with_media('tests/images/goldfinch1.jpg', 'goldfinch1'))
+        self.assertEqual(status['text'], 'goldfinch1')
+        with open('tests/images/goldfinch1.jpg', 'rb') as image_file:
+            self.assertEqual(server.media['1'], len(image_file.read()))
+        self.assertEqual(server.statuses, [{'id': 1, 'text': 'goldfinch1', 'media_ids': ['1']}])
+
+    def test_error_status(self):
+        with StubTwitterServer() as server:
+            api = aio.AsyncAPI(CREDENTIALS, api_url=server.url, upload_url=server.url)
+            with pytest.raises(aio.TwitterAPIError) as error_info:
+                asyncio.run(api.update_status('goldfinch1', ['99']))
+        self.assertEqual(error_info.value.status, 400)
+        self.assertEqual(server.statuses, [])
+
+
+class MockStatusAPI:
+
+    def __init__(self):
+        self.statuses = list()
+
+    def update_status(self, status, media_ids):
+        self.statuses.append((status, media_ids))
+
+    def update_with_media(self, image, text):
+        raise Exception('Large images must be uploaded in chunks.')
+
+
+class ChunkedUploadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.temporary_directory, 'large.gif')
+        with open(self.image_path, 'wb') as image_file:
+            image_file.write(os.urandom(300000))
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def get_api(self, server, **options):
+        return aio.AsyncAPI(CREDENTIALS, api_url=server.url, upload_url=server.url, chunk_size=65536,
+                            retry_delay=0, **options)
+
+    def test_upload_session(self):
+        session = aio.UploadSession(self.image_path, 65536)
+        self.assertEqual(session.total_bytes, 300000)
+        self.assertEqual(session.segment_count, 5)
+        self.assertEqual(session.media_type, 'image/gif')
+        self.assertEqual(session.media_category, 'tweet_gif')
+
+    def test_chunked_upload(self):
+        with StubTwitterServer() as server:
+            media_id = asyncio.run(self.get_api(server).chunked_upload(self.image_path))
+        self.assertEqual(server.media[media_id], 300000)
+        self.assertEqual(sorted(server.uploads[media_id]['segments']), [0, 1, 2, 3, 4])
+        # request bodies are bounded by the chunk size, not the image size
+        self.assertTrue(server.largest_request < 65536 + 1024)
+
+    def test_upload_media_threshold(self):
+        with StubTwitterServer() as server:
+            api = self.get_api(server, chunked_threshold=100000)
+            status = asyncio.run(api.update_with_media(self.image_path, 'large'))
+            self.assertEqual(len(server.uploads), 1)
+            api = self.get_api(server, chunked_threshold=1000000)
+            asyncio.run(api.upload_media(self.image_path))
+        self.assertEqual(status['text'], 'large')
+        self.assertEqual(len(server.uploads), 1)
+        self.assertEqual(len(server.media), 2)
+
+    def test_transient_failures_are_retried(self):
+        with StubTwitterServer() as server:
+            server.failing_appends = 2
+            media_id = asyncio.run(self.get_api(server, retries=2).chunked_upload(self.image_path))
+        self.assertEqual(server.media[media_id], 300000)
+
+    def test_resume_interrupted_upload(self):
+        with StubTwitterServer() as server:
+            api = self.get_api(server, retries=0)
+            with pytest.raises(aio.UploadInterrupted) as error_info:
+                server.failing_appends = 1
+                asyncio.run(api.chunked_upload(self.image_path))
+            session = error_info.value.session
+            self.assertEqual(session.segment_index, 0)
+            self.assertFalse(session.media_id is None)
+            media_id = asyncio.run(api.chunked_upload(self.image_path, session))
+        self.assertEqual(media_id, session.media_id)
+        self.assertEqual(len(server.uploads), 1)
+        self.assertEqual(server.media[media_id], 300000)
+
+    def test_manager_chunked_post(self):
+        with StubTwitterServer() as server:
+            manager = Manager(CREDENTIALS, TinyDB(storage=storages.MemoryStorage), self.temporary_directory,
+                              chunked_threshold=100000)
+            manager.content = (self.image_path, 'large', 'large.gif')
+            manager.api = MockStatusAPI()
+            manager.async_api = self.get_api(server)
+            manager.post_tweet()
+        self.assertEqual(manager.api.statuses, [('large', ['1'])])
+        self.assertEqual(manager.db.all()[0]['image'], 'large.gif')
+
+
+    def test_manager_resumes_interrupted_upload(self):
+        with StubTwitterServer() as server:
+            manager = Manager(CREDENTIALS, TinyDB(storage=storages.MemoryStorage), self.temporary_directory,
+                              chunked_threshold=100000)
+            manager.content = (self.image_path, 'large', 'large.gif')
+            manager.api = MockStatusAPI()
+            manager.async_api = self.get_api(server, retries=0)
+            server.failing_appends = 1
+            post_with_retries(manager, RetryPolicy(retries=1, base_delay=0), sleep=lambda seconds: None)
+        self.assertEqual(len(server.uploads), 1)
+        self.assertEqual(manager.api.statuses, [('large', ['1'])])
+        self.assertEqual(manager.upload_session, None)
+        self.assertEqual(manager.db.all()[0]['image'], 'large.gif')
+
+
+class AsyncPostingTests(unittest.TestCase):
+
+    def test_post_tweet_async(self):
+        with StubTwitterServer() as server:
+            manager = get_stub_manager(server)
+            content = asyncio.run(manager.post_tweet_async())
+        self.assertEqual(content[2], 'goldfinch1.jpg')
+        self.assertEqual(manager.db.all()[0]['image'], 'goldfinch1.jpg')
+        manager.content = None
+        with pytest.raises(Exception):
+            asyncio.run(manager.post_tweet_async())
+
+    def test_post_tweets_in_flight(self):
+        with StubTwitterServer(delay=0.1) as server:
+            managers = [get_stub_manager(server, 'goldfinch{0}.jpg'.format(index % 5 + 1)) for index in range(20)]
+            start = time.perf_counter()
+            results = asyncio.run(aio.post_tweets(managers))
+            elapsed = time.perf_counter() - start
+        self.assertEqual([result[2] for result in results], [manager.content[2] for manager in managers])
+        self.assertEqual(len(server.statuses), 20)
+        self.assertTrue(all(len(manager.db) == 1 for manager in managers))
+        # twenty posts of two 0.1s requests each, overlapping rather than taking four seconds
+        self.assertTrue(elapsed < 2, msg=elapsed)
+
+    def test_post_tweets_isolates_failures(self):
+        with StubTwitterServer() as server:
+            managers = [get_stub_manager(server), get_stub_manager(server)]
+            managers[1].content = None
+            results = asyncio.run(aio.post_tweets(managers, concurrency=1))
+        self.assertEqual(results[0][2], 'goldfinch1.jpg')
+        self.assertTrue(isinstance(results[1], Exception))
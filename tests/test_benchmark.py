@@ -0,0 +1,28 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from . import benchmark
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_report(self):
+        temporary_directory = tempfile.mkdtemp()
+        try:
+            output = os.path.join(temporary_directory, 'benchmark.json')
+            benchmark.main(['--sizes', '50', '--repeat', '1', '--output', output])
+            with open(output, encoding='utf-8') as output_file:
+                report = json.load(output_file)
+        finally:
+            shutil.rmtree(temporary_directory)
+        self.assertEqual(report['version'], 1)
+        names = set(result['benchmark'] for result in report['results'])
+        for name in ('get_posted_files.history', 'get_unused_files.tinydb', 'load_content.queue',
+                     'load_content.listdir', 'to_compact_text.50x1000', 'apply_vowel_elision.16000words',
+                     'post_tweet.x20'):
+            self.assertTrue(name in names, msg=name)
+        for result in report['results']:
+            self.assertEqual(result['size'], 50)
+            self.assertTrue(result['seconds'] >= 0)
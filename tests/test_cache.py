@@ -0,0 +1,74 @@
+from collections import OrderedDict
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from tinydb import TinyDB, storages
+from goldfinchsong import utils
+from goldfinchsong.cache import CACHE_SUFFIX, StatusTextCache, get_digest
+
+LONG_FILE_NAME = 'Some_goldfinchsong_image-file_with_a_very_long_set_of_' \
+                 'characters_and_abbreviations_that_conveys_important_info.png'
+
+
+class StatusTextCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.temporary_directory, 'db.cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_cache_location(self):
+        self.assertEqual(utils.sibling_location('tests/goldfinchsong_db.json', CACHE_SUFFIX),
+                         'tests/goldfinchsong_db.cache.sqlite3')
+
+    def test_get_digest(self):
+        text_conversions = OrderedDict([('goldfinchsong', 'gf'), ('important', 'impt')])
+        self.assertEqual(get_digest(text_conversions, 117), get_digest(OrderedDict(text_conversions), 117))
+        self.assertNotEqual(get_digest(text_conversions, 117), get_digest(text_conversions, 100))
+        reordered = OrderedDict([('important', 'impt'), ('goldfinchsong', 'gf')])
+        self.assertNotEqual(get_digest(text_conversions, 117), get_digest(reordered, 117))
+
+    def test_hit_skips_compaction(self):
+        text_conversions = OrderedDict([('goldfinchsong', 'gf')])
+        cache = StatusTextCache(self.location)
+        expected_text = utils.extract_status_text(LONG_FILE_NAME, text_conversions)
+        self.assertEqual(cache.status_text(LONG_FILE_NAME, text_conversions), expected_text)
+        cache.close()
+        cache = StatusTextCache(self.location)
+        with mock.patch('goldfinchsong.utils.extract_status_text') as extract_status_text:
+            self.assertEqual(cache.status_text(LONG_FILE_NAME, text_conversions), expected_text)
+            self.assertFalse(extract_status_text.called)
+        cache.close()
+
+    def test_conversion_change_invalidates(self):
+        cache = StatusTextCache(self.location)
+        cache.status_text(LONG_FILE_NAME, OrderedDict([('goldfinchsong', 'gf')]))
+        cache.status_text('goldfinch1.jpg', OrderedDict([('goldfinchsong', 'gf')]))
+        text_conversions = OrderedDict([('goldfinchsong', 'gfnch')])
+        self.assertEqual(cache.status_text(LONG_FILE_NAME, text_conversions),
+                         utils.extract_status_text(LONG_FILE_NAME, text_conversions))
+        self.assertEqual(len(cache), 1)
+        cache.close()
+
+    def test_least_recently_used_eviction(self):
+        cache = StatusTextCache(self.location, maximum_entries=2)
+        cache.status_text('goldfinch1.jpg')
+        cache.status_text('goldfinch2.jpg')
+        cache.status_text('goldfinch1.jpg')
+        cache.status_text('goldfinch3.jpg')
+        self.assertEqual(len(cache), 2)
+        file_names = {row[0] for row in cache.connection.execute('SELECT file_name FROM status_texts')}
+        self.assertEqual(file_names, {'goldfinch1.jpg', 'goldfinch3.jpg'})
+        cache.close()
+
+    def test_load_content_uses_cache(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        cache = StatusTextCache(self.location)
+        content = utils.load_content(db, 'tests/images', cache=cache)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(content[1], content[2].replace('.jpg', ''))
+        cache.close()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from tinydb import TinyDB, storages
+from goldfinchsong import utils
+from goldfinchsong.catalog import CATALOG_SUFFIX, ImageCatalog
+
+IMAGE_NAMES = ['goldfinch1.jpg', 'goldfinch2.jpg', 'goldfinch3.jpg',
+               'goldfinch4.jpg', 'goldfinch5.jpg']
+
+
+class ImageCatalogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.image_directory = os.path.join(self.temporary_directory, 'images')
+        shutil.copytree('tests/images', self.image_directory)
+        os.mkdir(os.path.join(self.image_directory, 'nested'))
+        self.location = os.path.join(self.temporary_directory, 'db.catalog.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_catalog_location(self):
+        self.assertEqual(utils.sibling_location('tests/goldfinchsong_db.json', CATALOG_SUFFIX),
+                         'tests/goldfinchsong_db.catalog.json')
+
+    def test_files(self):
+        catalog = ImageCatalog(self.location)
+        self.assertEqual(sorted(catalog.files(self.image_directory)), IMAGE_NAMES)
+        self.assertTrue(os.path.isfile(self.location))
+        entry = catalog.directories[os.path.abspath(self.image_directory)]
+        size = os.path.getsize(os.path.join(self.image_directory, 'goldfinch1.jpg'))
+        self.assertEqual(entry['files']['goldfinch1.jpg'][0], size)
+
+    def test_images(self):
+        with open(os.path.join(self.image_directory, 'notes.txt'), 'w') as notes:
+            notes.write('notes')
+        catalog = ImageCatalog(self.location)
+        self.assertEqual(sorted(catalog.files(self.image_directory)), sorted(IMAGE_NAMES + ['notes.txt']))
+        self.assertEqual(sorted(catalog.images(self.image_directory)), IMAGE_NAMES)
+        entry = catalog.directories[os.path.abspath(self.image_directory)]
+        self.assertFalse(entry['files']['notes.txt'][2])
+        self.assertTrue(entry['files']['goldfinch1.jpg'][2])
+
+    def test_persisted_catalog_skips_unchanged_directory(self):
+        ImageCatalog(self.location).files(self.image_directory)
+        catalog = ImageCatalog(self.location)
+        self.assertFalse(catalog.refresh(self.image_directory))
+        self.assertEqual(sorted(catalog.files(self.image_directory)), IMAGE_NAMES)
+
+    def test_changed_directory_is_rescanned(self):
+        ImageCatalog(self.location).files(self.image_directory)
+        os.remove(os.path.join(self.image_directory, 'goldfinch5.jpg'))
+        stat = os.stat(self.image_directory)
+        os.utime(self.image_directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        catalog = ImageCatalog(self.location)
+        self.assertTrue(catalog.refresh(self.image_directory))
+        self.assertEqual(sorted(catalog.files(self.image_directory)), IMAGE_NAMES[:4])
+
+    def test_unreadable_catalog_is_ignored(self):
+        with open(self.location, 'w') as catalog_file:
+            catalog_file.write('not json')
+        catalog = ImageCatalog(self.location)
+        self.assertEqual(catalog.directories, dict())
+        self.assertEqual(sorted(catalog.files(self.image_directory)), IMAGE_NAMES)
+
+    def test_load_content_from_catalog(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        catalog = ImageCatalog(self.location)
+        content = utils.load_content(db, self.image_directory, catalog=catalog)
+        self.assertTrue(content[2] in IMAGE_NAMES)
+        self.assertEqual(content[0], os.path.join(self.image_directory, content[2]))
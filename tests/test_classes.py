@@ -1,10 +1,12 @@
 import configparser
 import os
 import unittest
+from unittest import mock
 import pytest
 from tinydb import TinyDB, Query, storages
 from goldfinchsong.cli import parse_configuration
 from goldfinchsong.classes import Manager
+from tests import setUpModule, tearDownModule  # noqa: F401
 
 
 class MockManagerAPI:
@@ -39,10 +41,40 @@ class ManagerTests(unittest.TestCase):
             db = TinyDB(active_configuration['db_location'])
             manager = Manager(credentials, db, active_configuration['image_directory'], text_conversions)
             manager.api = MockManagerAPI()
-            manager.post_tweet()
+            content = manager.post_tweet()
             tweets = db.all()
             self.assertEqual(len(tweets), 1)
+            # the posted image is no longer a candidate once content is reloaded
+            next_content = manager.reload_content()
+            self.assertNotEqual(content[2], next_content[2])
         finally:
             if os.path.isfile(active_configuration['db_location']):
                 os.remove(active_configuration['db_location'])
 
+
+    def test_lazy_construction(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        with mock.patch('goldfinchsong.utils.load_content') as load_content, \
+                mock.patch('goldfinchsong.utils.access_api') as access_api:
+            manager = Manager({'consumer_key': 'key'}, db, 'tests/images')
+            self.assertFalse(load_content.called)
+            self.assertFalse(access_api.called)
+            manager.prepare()
+            manager.prepare()
+            self.assertEqual(load_content.call_count, 1)
+            self.assertEqual(access_api.call_count, 1)
+            manager.reload_content()
+            self.assertEqual(load_content.call_count, 2)
+
+    def test_no_credentials(self):
+        manager = Manager(None, TinyDB(storage=storages.MemoryStorage), 'tests/images')
+        self.assertEqual(manager.api, None)
+
+    def test_dry_run(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        with mock.patch('goldfinchsong.utils.access_api') as access_api:
+            manager = Manager({'consumer_key': 'key'}, db, 'tests/images', dry_run=True)
+            content = manager.post_tweet()
+            self.assertFalse(access_api.called)
+        self.assertEqual(manager.api.posts, [(content[0], content[1])])
+        self.assertEqual(len(db), 0)
@@ -1,6 +1,40 @@
+import json
+import os
+import shutil
+import tempfile
 import unittest
 import configparser
-from goldfinchsong import cli
+from goldfinchsong import cli, metrics, utils
+import pytest
+from tinydb import TinyDB
+from tinydb.storages import JSONStorage
+from click.testing import CliRunner
+from goldfinchsong.ratelimit import DEFAULT_RETRIES, RetryPolicy
+from goldfinchsong.scheduler import CronSchedule, IntervalSchedule
+from goldfinchsong.sqlite import SQLiteDatabase
+from goldfinchsong.storages import JournalStorage
+from tests import setUpModule, tearDownModule  # noqa: F401
+
+
+class MockDaemonManager:
+
+    def __init__(self, fail=False, error=None):
+        self.fail = fail
+        self.error = error if error is not None else Exception('Upload failed.')
+        self.content = ('tests/images/goldfinch1.jpg', 'goldfinch1', 'goldfinch1.jpg')
+        self.posts = 0
+        self.attempts = 0
+        self.reloads = 0
+
+    def post_tweet(self):
+        self.attempts += 1
+        if self.fail:
+            raise self.error
+        self.posts += 1
+        return ('tests/images/goldfinch1.jpg', 'goldfinch1', 'goldfinch1.jpg')
+
+    def reload_content(self):
+        self.reloads += 1
 
 
 class CommandLineInterfaceTests(unittest.TestCase):
@@ -28,6 +62,346 @@ class CommandLineInterfaceTests(unittest.TestCase):
         self.assertEqual(cli.get_image_directory(None, active_configuration), 'image-dir-test')
         self.assertEqual(cli.get_image_directory(None, {}), 'images')
 
+    def test_get_image_library(self):
+        config_parser = configparser.ConfigParser()
+        config_parser.optionxform = str
+        config_parser.read_string('[goldfinchsong]\n'
+                                  '[goldfinchsong.images]\nrecursive=yes\nscan_workers=3\n'
+                                  'root.birds=birds-images\nroot.landscapes=landscape-images\n'
+                                  '[goldfinchsong.account.bob]\nconsumer_key=bob-key\n'
+                                  'db_location=bob.json\nimage_directory=bob-images\n')
+        active_configuration = cli.parse_configuration(config_parser)
+        library = cli.get_image_library(None, active_configuration)
+        self.assertEqual(library.roots, {'birds': 'birds-images', 'landscapes': 'landscape-images'})
+        self.assertTrue(library.recursive)
+        self.assertEqual(library.workers, 3)
+        library = cli.get_image_library('command-line-image-arg', active_configuration)
+        self.assertEqual(library.roots, {'': 'command-line-image-arg'})
+        bob = cli.parse_accounts(config_parser, active_configuration)['bob']
+        self.assertEqual(bob['credentials'], {'consumer_key': 'bob-key'})
+        self.assertEqual(cli.get_image_library(None, bob).roots, {'': 'bob-images'})
+        self.assertFalse(cli.get_image_library(None, {}).recursive)
+
+    def test_get_cache(self):
+        temporary_directory = tempfile.mkdtemp()
+        try:
+            db_location = os.path.join(temporary_directory, 'db.json')
+            cache = cli.get_cache({'db_location': db_location})
+            self.assertEqual(cache.location, os.path.join(temporary_directory, 'db.cache.sqlite3'))
+            cache.close()
+            cache_location = os.path.join(temporary_directory, 'my-cache.sqlite3')
+            cache = cli.get_cache({'db_location': db_location, 'cache_location': cache_location})
+            self.assertEqual(cache.location, cache_location)
+            cache.close()
+        finally:
+            shutil.rmtree(temporary_directory)
+
+    def test_get_catalog(self):
+        catalog = cli.get_catalog({'db_location': 'tests/goldfinchsong_db.json'})
+        self.assertEqual(catalog.location, 'tests/goldfinchsong_db.catalog.json')
+        catalog = cli.get_catalog({'db_location': 'tests/goldfinchsong_db.json',
+                                   'catalog_location': 'tests/my-catalog.json'})
+        self.assertEqual(catalog.location, 'tests/my-catalog.json')
+
+    def test_get_db(self):
+        temporary_directory = tempfile.mkdtemp()
+        try:
+            db_location = os.path.join(temporary_directory, 'db.json')
+            db = cli.get_db({'db_location': db_location})
+            self.assertTrue(isinstance(db._storage, JSONStorage))
+            db.close()
+            db = cli.get_db({'db_location': db_location, 'db_storage': 'journal',
+                             'journal_compact_every': '10'})
+            self.assertTrue(isinstance(db._storage, JournalStorage))
+            self.assertEqual(db._storage.compact_every, 10)
+            db.close()
+            with pytest.raises(ValueError):
+                cli.get_db({'db_location': db_location, 'db_storage': 'xml'})
+        finally:
+            shutil.rmtree(temporary_directory)
+
+    def test_get_derivatives(self):
+        self.assertEqual(cli.get_derivatives({'db_location': 'tests/goldfinchsong_db.json'}), None)
+        derivatives = cli.get_derivatives({'db_location': 'tests/goldfinchsong_db.json', 'preprocess_images': True})
+        self.assertEqual(derivatives.location, 'tests/goldfinchsong_db.derivatives')
+        config_parser = configparser.ConfigParser()
+        config_parser.optionxform = str
+        config_parser.read_string('[goldfinchsong]\n[goldfinchsong.db]\ndb_location=db.json\n'
+                                  '[goldfinchsong.derivatives]\nlocation=derivatives\nmaximum_bytes=1000\n'
+                                  'quality=70\nprocesses=4\n')
+        active_configuration = cli.parse_configuration(config_parser)
+        self.assertEqual(active_configuration['derivative_processes'], '4')
+        derivatives = cli.get_derivatives(active_configuration)
+        self.assertEqual(derivatives.location, 'derivatives')
+        self.assertEqual(derivatives.maximum_bytes, 1000)
+        self.assertEqual(derivatives.quality, 70)
+
+    def test_get_history(self):
+        temporary_directory = tempfile.mkdtemp()
+        try:
+            db_location = os.path.join(temporary_directory, 'db.json')
+            history = cli.get_history({'db_location': db_location})
+            self.assertEqual(history.location, os.path.join(temporary_directory, 'db.index.json'))
+            self.assertEqual(history.db_location, db_location)
+            self.assertEqual(len(history.db), 0)
+            index_location = os.path.join(temporary_directory, 'my-index.json')
+            history = cli.get_history({'db_location': db_location, 'index_location': index_location})
+            self.assertEqual(history.location, index_location)
+            history = cli.get_history({'db_location': os.path.join(temporary_directory, 'db.sqlite3'),
+                                       'db_engine': 'sqlite'})
+            self.assertTrue(isinstance(history, SQLiteDatabase))
+            history.close()
+            with pytest.raises(ValueError):
+                cli.get_history({'db_location': db_location, 'db_engine': 'mysql'})
+        finally:
+            shutil.rmtree(temporary_directory)
+
+    def test_get_manager_reads_history(self):
+        temporary_directory = tempfile.mkdtemp()
+        recorder = metrics.Recorder()
+        metrics.add_hook(recorder)
+        try:
+            db_location = os.path.join(temporary_directory, 'db.json')
+            db = TinyDB(db_location)
+            db.insert({'image': 'goldfinch1.jpg', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+            db.close()
+            manager = cli.get_manager({'credentials': None, 'text_conversions': None, 'db_location': db_location},
+                                      'tests/images')
+            self.assertEqual(len(manager.db), 1)
+            record = recorder.snapshot()
+            self.assertEqual(record['phases']['history_read'][0], 1)
+            self.assertEqual(record['gauges'], {'history_size': 1})
+        finally:
+            metrics.remove_hook(recorder)
+            shutil.rmtree(temporary_directory)
+
+    def test_import_action(self):
+        temporary_directory = tempfile.mkdtemp()
+        log_location = cli.LOGGER_CONFIG['handlers']['file']['filename']
+        try:
+            source_location = os.path.join(temporary_directory, 'db.json')
+            source = TinyDB(source_location)
+            source.insert({'image': 'image1.png', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+            source.close()
+            db_location = os.path.join(temporary_directory, 'db.sqlite3')
+            conf = os.path.join(temporary_directory, 'goldfinchsong.ini')
+            with open(conf, 'w') as conf_file:
+                conf_file.write('[goldfinchsong]\nconsumer_key=key\n'
+                                '[goldfinchsong.log]\nlog_location={0}\n'
+                                '[goldfinchsong.db]\ndb_location={1}\ndb_engine=sqlite\n'.format(
+                                    os.path.join(temporary_directory, 'goldfinchsong.log'), db_location))
+            result = CliRunner().invoke(cli.run, ['--action', 'import', '--conf', conf,
+                                                  '--source', source_location])
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            database = SQLiteDatabase(db_location)
+            self.assertEqual(len(database), 1)
+            database.close()
+        finally:
+            cli.LOGGER_CONFIG['handlers']['file']['filename'] = log_location
+            shutil.rmtree(temporary_directory)
+
+    def test_metrics_export(self):
+        temporary_directory = tempfile.mkdtemp()
+        log_location = cli.LOGGER_CONFIG['handlers']['file']['filename']
+        try:
+            source_location = os.path.join(temporary_directory, 'db.json')
+            TinyDB(source_location).close()
+            jsonl_location = os.path.join(temporary_directory, 'metrics.jsonl')
+            prometheus_location = os.path.join(temporary_directory, 'goldfinchsong.prom')
+            conf = os.path.join(temporary_directory, 'goldfinchsong.ini')
+            with open(conf, 'w') as conf_file:
+                conf_file.write('[goldfinchsong]\nconsumer_key=key\n'
+                                '[goldfinchsong.log]\nlog_location={0}\n'
+                                '[goldfinchsong.db]\ndb_location={1}\ndb_engine=sqlite\n'
+                                '[goldfinchsong.metrics]\njsonl_location={2}\nprometheus_location={3}\n'.format(
+                                    os.path.join(temporary_directory, 'goldfinchsong.log'),
+                                    os.path.join(temporary_directory, 'db.sqlite3'),
+                                    jsonl_location, prometheus_location))
+            for attempt in range(2):
+                result = CliRunner().invoke(cli.run, ['--action', 'import', '--conf', conf,
+                                                      '--source', source_location])
+                self.assertEqual(result.exit_code, 0, msg=result.output)
+            self.assertEqual(metrics.hooks, [])
+            with open(jsonl_location) as jsonl_file:
+                records = [json.loads(line) for line in jsonl_file]
+            self.assertEqual(len(records), 2)
+            self.assertEqual(sorted(records[1]['phases']), ['action.import', 'configuration'])
+            with open(prometheus_location) as prometheus_file:
+                text = prometheus_file.read()
+            self.assertTrue('goldfinchsong_phase_calls{phase="action.import"} 1\n' in text)
+        finally:
+            cli.LOGGER_CONFIG['handlers']['file']['filename'] = log_location
+            shutil.rmtree(temporary_directory)
+
+    def test_profile(self):
+        temporary_directory = tempfile.mkdtemp()
+        log_location = cli.LOGGER_CONFIG['handlers']['file']['filename']
+        try:
+            db_location = os.path.join(temporary_directory, 'db.json')
+            # every image was posted, so a real post would start a new cycle
+            db = TinyDB(db_location)
+            for index in range(1, 6):
+                db.insert({'image': 'goldfinch{0}.jpg'.format(index)})
+            db.close()
+            conf = os.path.join(temporary_directory, 'goldfinchsong.ini')
+            with open(conf, 'w') as conf_file:
+                conf_file.write('[goldfinchsong]\nconsumer_key=key\n'
+                                '[goldfinchsong.log]\nlog_location={0}\n'
+                                '[goldfinchsong.images]\nimage_directory=tests/images\n'
+                                '[goldfinchsong.db]\ndb_location={1}\n'.format(
+                                    os.path.join(temporary_directory, 'goldfinchsong.log'), db_location))
+            result = CliRunner().invoke(cli.run, ['--action', 'post', '--conf', conf, '--profile'])
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            self.assertTrue(os.path.isfile(os.path.join(temporary_directory, 'goldfinchsong.prof')))
+            self.assertTrue(os.path.isfile(os.path.join(temporary_directory, 'goldfinchsong.allocations.txt')))
+            db = TinyDB(db_location)
+            self.assertEqual(len(db), 5)
+            self.assertEqual(utils.get_generation(db), 0)
+            db.close()
+            self.assertFalse(os.path.isfile(os.path.join(temporary_directory, 'db.queue.json')))
+            # importing writes the database, so it isn't profiled
+            sqlite_location = os.path.join(temporary_directory, 'db.sqlite3')
+            sqlite_conf = os.path.join(temporary_directory, 'sqlite.ini')
+            with open(sqlite_conf, 'w') as conf_file:
+                conf_file.write('[goldfinchsong]\nconsumer_key=key\n'
+                                '[goldfinchsong.log]\nlog_location={0}\n'
+                                '[goldfinchsong.db]\ndb_location={1}\ndb_engine=sqlite\n'.format(
+                                    os.path.join(temporary_directory, 'goldfinchsong.log'), sqlite_location))
+            result = CliRunner().invoke(cli.run, ['--action', 'import', '--conf', sqlite_conf, '--source', db_location,
+                                                  '--profile'])
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            self.assertFalse(os.path.isfile(sqlite_location))
+        finally:
+            cli.LOGGER_CONFIG['handlers']['file']['filename'] = log_location
+            shutil.rmtree(temporary_directory)
+
+    def test_preview_action(self):
+        temporary_directory = tempfile.mkdtemp()
+        log_location = cli.LOGGER_CONFIG['handlers']['file']['filename']
+        try:
+            db_location = os.path.join(temporary_directory, 'db.json')
+            db = TinyDB(db_location)
+            db.insert({'image': 'goldfinch1.jpg', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+            db.close()
+            preview_location = os.path.join(temporary_directory, 'preview.json')
+            conf = os.path.join(temporary_directory, 'goldfinchsong.ini')
+            with open(conf, 'w') as conf_file:
+                conf_file.write('[goldfinchsong]\nconsumer_key=key\n'
+                                '[goldfinchsong.log]\nlog_location={0}\n'
+                                '[goldfinchsong.images]\nimage_directory=tests/images\n'
+                                '[goldfinchsong.db]\ndb_location={1}\n'
+                                '[goldfinchsong.preview]\nlocation={2}\nprocesses=1\n'.format(
+                                    os.path.join(temporary_directory, 'goldfinchsong.log'), db_location,
+                                    preview_location))
+            result = CliRunner().invoke(cli.run, ['--action', 'preview', '--conf', conf])
+            self.assertEqual(result.exit_code, 0, msg=result.output)
+            with open(preview_location) as preview_file:
+                report = json.load(preview_file)
+            self.assertEqual(report['stages']['none'], 5)
+            rows = {row['file_name']: row for row in report['files']}
+            self.assertEqual(sorted(rows), ['goldfinch{0}.jpg'.format(index) for index in range(1, 6)])
+            self.assertTrue(rows['goldfinch1.jpg']['posted'])
+            self.assertFalse(rows['goldfinch2.jpg']['posted'])
+            self.assertEqual(rows['goldfinch2.jpg']['status_text'], 'goldfinch2')
+        finally:
+            cli.LOGGER_CONFIG['handlers']['file']['filename'] = log_location
+            shutil.rmtree(temporary_directory)
+
+    def test_get_location(self):
+        self.assertEqual(cli.get_location({'db_location': 'tests/goldfinchsong_db.json'}, 'queue_location',
+                                          '.queue.json'), 'tests/goldfinchsong_db.queue.json')
+        self.assertEqual(cli.get_location({'db_location': 'tests/goldfinchsong_db.json',
+                                           'queue_location': 'tests/my-queue.json'}, 'queue_location',
+                                          '.queue.json'), 'tests/my-queue.json')
+
+    def test_get_metric_hooks(self):
+        self.assertEqual(cli.get_metric_hooks({}), [])
+        hooks = cli.get_metric_hooks({'metrics_jsonl_location': 'metrics.jsonl',
+                                      'metrics_prometheus_location': 'goldfinchsong.prom'})
+        self.assertTrue(isinstance(hooks[0], metrics.JSONLinesExporter))
+        self.assertTrue(isinstance(hooks[1], metrics.PrometheusExporter))
+
+    def test_get_queue(self):
+        queue = cli.get_queue({'db_location': 'tests/goldfinchsong_db.json'})
+        self.assertEqual(queue.location, 'tests/goldfinchsong_db.queue.json')
+        queue = cli.get_queue({'db_location': 'tests/goldfinchsong_db.json',
+                               'queue_location': 'tests/my-queue.json'})
+        self.assertEqual(queue.location, 'tests/my-queue.json')
+
+    def test_get_schedule(self):
+        self.assertEqual(cli.get_schedule({}).seconds, cli.DEFAULT_DAEMON_INTERVAL)
+        schedule = cli.get_schedule({'daemon_interval': '3600'})
+        self.assertTrue(isinstance(schedule, IntervalSchedule))
+        self.assertEqual(schedule.seconds, 3600)
+        schedule = cli.get_schedule({'daemon_interval': '3600', 'daemon_schedule': '0 9 * * *'})
+        self.assertTrue(isinstance(schedule, CronSchedule))
+
+    def test_post_scheduled_tweet(self):
+        manager = MockDaemonManager()
+        cli.post_scheduled_tweet(manager)
+        self.assertEqual(manager.posts, 1)
+        self.assertEqual(manager.reloads, 1)
+        # failures don't stop the daemon and new content is still selected
+        failing_manager = MockDaemonManager(fail=True)
+        cli.post_scheduled_tweet(failing_manager)
+        self.assertEqual(failing_manager.reloads, 1)
+        # content that failed to post for a retryable reason is kept for the next post
+        limited_manager = MockDaemonManager(fail=True, error=ConnectionResetError())
+        cli.post_scheduled_tweet(limited_manager, RetryPolicy(retries=0))
+        self.assertEqual(limited_manager.reloads, 0)
+        # an image deleted after it was selected is replaced at once
+        missing_manager = MockDaemonManager(fail=True, error=FileNotFoundError())
+        cli.post_scheduled_tweet(missing_manager, RetryPolicy(retries=3, base_delay=0))
+        self.assertEqual(missing_manager.attempts, 1)
+        self.assertEqual(missing_manager.reloads, 1)
+
+    def test_get_retry_policy(self):
+        policy = cli.get_retry_policy({})
+        self.assertEqual(policy.retries, DEFAULT_RETRIES)
+        config_parser = configparser.ConfigParser()
+        config_parser.optionxform = str
+        config_parser.read_string('[goldfinchsong]\n[goldfinchsong.retry]\nretries=2\nbase_delay=0.5\n'
+                                  'maximum_delay=60\nbucket_capacity=10\nbucket_period=600\n')
+        active_configuration = cli.parse_configuration(config_parser)
+        policy = cli.get_retry_policy(active_configuration)
+        self.assertEqual((policy.retries, policy.base_delay, policy.maximum_delay), (2, 0.5, 60))
+        bucket = cli.get_token_bucket(active_configuration)
+        self.assertEqual((bucket.capacity, bucket.period), (10, 600))
+
+    def test_parse_accounts(self):
+        config_parser = configparser.ConfigParser()
+        config_parser.optionxform = str
+        config_parser.read_string('[goldfinchsong]\n'
+                                  '[goldfinchsong.db]\ndb_location=shared.json\ndb_storage=journal\n'
+                                  '[goldfinchsong.images]\nimage_directory=shared-images\n'
+                                  '[goldfinchsong.fanout]\nworkers=3\n'
+                                  '[goldfinchsong.conversions]\nFYI=for your information\n'
+                                  '[goldfinchsong.account.alice]\nconsumer_key=alice-key\n'
+                                  'db_location=alice.sqlite3\ndb_engine=sqlite\n'
+                                  '[goldfinchsong.account.bob]\nconsumer_key=bob-key\n'
+                                  'db_location=bob.json\nimage_directory=bob-images\n')
+        active_configuration = cli.parse_configuration(config_parser)
+        self.assertEqual(active_configuration['fanout_workers'], '3')
+        accounts = cli.parse_accounts(config_parser, active_configuration)
+        self.assertEqual(list(accounts), ['alice', 'bob'])
+        alice = accounts['alice']
+        self.assertEqual(alice['credentials'], {'consumer_key': 'alice-key'})
+        self.assertEqual(alice['db_location'], 'alice.sqlite3')
+        self.assertEqual(alice['db_engine'], 'sqlite')
+        self.assertEqual(alice['image_directory'], 'shared-images')
+        self.assertEqual(alice['text_conversions']['for your information'], 'FYI')
+        bob = accounts['bob']
+        self.assertEqual(bob['credentials'], {'consumer_key': 'bob-key'})
+        self.assertEqual(bob['image_directory'], 'bob-images')
+        # database entries aren't shared between accounts
+        self.assertFalse('db_storage' in bob)
+        config_parser.read_string('[goldfinchsong.account.carol]\nconsumer_key=carol-key\n')
+        with pytest.raises(ValueError):
+            cli.parse_accounts(config_parser, active_configuration)
+        config_parser.read_string('[goldfinchsong.account.carol]\ndb_location=carol.json\nimage_dir=carol-images\n')
+        with pytest.raises(ValueError):
+            cli.parse_accounts(config_parser, active_configuration)
+
     def test_conversion_ordering(self):
         # config parser should return an OrderedDict
         config_parser = configparser.ConfigParser()
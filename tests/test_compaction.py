@@ -0,0 +1,137 @@
+from collections import OrderedDict
+import random
+import re
+import unittest
+from goldfinchsong import compaction, utils
+from .test_utils import TEST_TEXT1, reference_vowel_elision
+
+
+def reference_abbreviations(text, abbreviations, maximum_length=117):
+    # the original, uncompiled implementation of utils.apply_abbreviations
+    new_text = text
+    for not_abbreviated, abbreviated in abbreviations.items():
+        pattern = ''.join([r'\b', not_abbreviated, r'\b'])
+        regex = re.compile(pattern)
+        new_text = regex.sub(abbreviated, new_text)
+        if len(new_text) <= maximum_length:
+            return new_text
+    return new_text
+
+
+def reference_chop_words(text, maximum_length=117):
+    # the original, trial-join implementation of utils.chop_words
+    words = text.split()
+    for i in range(len(words)):
+        words.pop()
+        chopped_text = ' '.join(words)
+        if len(chopped_text) <= maximum_length:
+            return chopped_text
+    return None
+
+
+def reference_compact_text(candidate_text, maximum_length=117, text_conversions=None):
+    # the original, three-pass implementation of utils.to_compact_text
+    if len(candidate_text) <= maximum_length:
+        return candidate_text
+    compact_text = reference_abbreviations(candidate_text, text_conversions or {}, maximum_length)
+    if len(compact_text) <= maximum_length:
+        return compact_text
+    compact_text = reference_vowel_elision(compact_text, maximum_length)
+    if len(compact_text) <= maximum_length:
+        return compact_text
+    chopped_text = reference_chop_words(compact_text, maximum_length)
+    return chopped_text if chopped_text else ''
+
+
+WORDS = ['for', 'your', 'information', 'your information', 'for your', 'in', 'inform',
+         'Better', 'View', 'Desired', 'etcetera', 'etc', 'a', 'an', 'and', 'B.V', 'Vi.w', 'e+']
+
+
+class AbbreviationMatcherTests(unittest.TestCase):
+
+    def test_candidates(self):
+        matcher = compaction.compile_abbreviations(OrderedDict([
+            ('for your information', 'FYI'),
+            ('your', 'yr'),
+            ('information', 'info'),
+            ('missing', 'msng'),
+            ('e.g', 'eg'),
+        ]))
+        self.assertEqual(matcher.candidates('this is for your information'), [0, 1, 2, 4])
+        self.assertEqual(matcher.candidates('nothing'), [4])
+
+    def test_first_word_index_matches_reference(self):
+        words = ['naïve', 'café', 'x_y', "it's", 'it', 's', '-x', 'x-', '#tag', 'tag', 'a b', 'a  b', 'b', '2016']
+        generator = random.Random(23)
+        for trial in range(2000):
+            abbreviations = OrderedDict()
+            for entry in range(generator.randint(0, 6)):
+                abbreviations[generator.choice(words)] = generator.choice(words + ['', 'z'])
+            text = generator.choice(['', ' ', '-']).join(generator.choice(words)
+                                                           for word in range(generator.randint(0, 12)))
+            maximum_length = generator.randint(0, 40)
+            self.assertEqual(utils.apply_abbreviations(text, abbreviations, maximum_length),
+                             reference_abbreviations(text, abbreviations, maximum_length),
+                             msg=(text, abbreviations, maximum_length))
+
+    def test_cached_per_table(self):
+        text_conversions = OrderedDict([('goldfinchsong', 'gf')])
+        self.assertTrue(compaction.compile_abbreviations(text_conversions) is
+                        compaction.compile_abbreviations(OrderedDict(text_conversions)))
+
+    def test_matches_reference(self):
+        generator = random.Random(117)
+        for trial in range(2000):
+            abbreviations = OrderedDict()
+            for entry in range(generator.randint(0, 8)):
+                not_abbreviated = generator.choice(WORDS)
+                abbreviations[not_abbreviated] = generator.choice(WORDS + ['x', 'yy', 'zzzzzzzz'])
+            text = ' '.join(generator.choice(WORDS) for word in range(generator.randint(0, 20)))
+            maximum_length = generator.randint(0, 120)
+            self.assertEqual(utils.apply_abbreviations(text, abbreviations, maximum_length),
+                             reference_abbreviations(text, abbreviations, maximum_length),
+                             msg=(text, abbreviations, maximum_length))
+
+    def test_no_abbreviations(self):
+        self.assertEqual(utils.apply_abbreviations('a long text', None, 5), 'a long text')
+
+
+class CompactTextTests(unittest.TestCase):
+
+    def random_cases(self, trials):
+        generator = random.Random(140)
+        words = WORDS + TEST_TEXT1.split() + ['aeiou', 'queueing']
+        for trial in range(trials):
+            text_conversions = OrderedDict()
+            for entry in range(generator.randint(0, 5)):
+                text_conversions[generator.choice(words)] = generator.choice(['x', 'abbr', 'longer-word'])
+            separator = generator.choice([' ', '  ', ' \t'])
+            text = separator.join(generator.choice(words) for word in range(generator.randint(0, 30)))
+            yield text, generator.randint(-2, 130), text_conversions
+
+    def test_chop_words_matches_reference(self):
+        for text, maximum_length, text_conversions in self.random_cases(1000):
+            self.assertEqual(utils.chop_words(text, maximum_length),
+                             reference_chop_words(text, maximum_length), msg=(text, maximum_length))
+
+    def test_matches_reference(self):
+        for text, maximum_length, text_conversions in self.random_cases(2000):
+            self.assertEqual(utils.to_compact_text(text, maximum_length, text_conversions),
+                             reference_compact_text(text, maximum_length, text_conversions),
+                             msg=(text, maximum_length, text_conversions))
+
+    def test_stages(self):
+        text_conversions = OrderedDict([('goldfinchsong', 'gf')])
+        self.assertEqual(compaction.compact_text('short', 117, text_conversions), ('short', 'none'))
+        self.assertEqual(compaction.compact_text('the goldfinchsong', 10, text_conversions),
+                         ('the gf', 'abbreviation'))
+        self.assertEqual(compaction.compact_text('the goldfinchsong', 6), ('the', 'chop'))
+        self.assertEqual(compaction.compact_text('the goldfinchsong', 14), ('the gldfnchsng', 'elision'))
+
+    def test_chop_count(self):
+        self.assertEqual(compaction.chop_count([3, 4, 5], 117), 2)
+        self.assertEqual(compaction.chop_count([3, 4, 5], 8), 2)
+        self.assertEqual(compaction.chop_count([3, 4, 5], 7), 1)
+        self.assertEqual(compaction.chop_count([3, 4, 5], 0), 0)
+        self.assertEqual(compaction.chop_count([3, 4, 5], -1), None)
+        self.assertEqual(compaction.chop_count([], 117), None)
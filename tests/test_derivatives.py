@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pytest
+from tinydb import TinyDB, storages
+from goldfinchsong import derivatives, utils
+
+processed = list()
+
+
+def truncating_processor(source_location, derivative_location, maximum_bytes, maximum_dimension, quality):
+    if 'broken' in source_location:
+        raise ValueError('Unreadable image.')
+    processed.append(source_location)
+    location = ''.join([derivative_location, '.jpg'])
+    with open(source_location, 'rb') as source_file, open(location, 'wb') as derivative_file:
+        derivative_file.write(source_file.read(maximum_bytes))
+    return location
+
+
+class DerivativeCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        del processed[:]
+        self.temporary_directory = tempfile.mkdtemp()
+        self.image_directory = os.path.join(self.temporary_directory, 'images')
+        os.mkdir(self.image_directory)
+        self.location = os.path.join(self.temporary_directory, 'db.derivatives')
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def write_image(self, name, size, content=None):
+        location = os.path.join(self.image_directory, name)
+        with open(location, 'wb') as image_file:
+            image_file.write(content if content is not None else os.urandom(size))
+        return location
+
+    def get_cache(self, **options):
+        options.setdefault('maximum_bytes', 1000)
+        return derivatives.DerivativeCache(self.location, processor=truncating_processor, **options)
+
+    def test_derivative_location(self):
+        self.assertEqual(utils.sibling_location('tests/goldfinchsong_db.json', derivatives.DERIVATIVE_SUFFIX),
+                         'tests/goldfinchsong_db.derivatives')
+
+    def test_small_images_are_unchanged(self):
+        source = self.write_image('small.jpg', 1000)
+        self.assertEqual(self.get_cache().process(source), source)
+        self.assertEqual(processed, [])
+        self.assertFalse(os.path.exists(self.location))
+
+    def test_process_once(self):
+        source = self.write_image('large.jpg', 5000)
+        cache = self.get_cache()
+        derivative = cache.process(source)
+        self.assertTrue(derivative.startswith(self.location))
+        self.assertEqual(os.path.getsize(derivative), 1000)
+        self.assertEqual(cache.process(source), derivative)
+        # a new cache reads the manifest instead of hashing the source again
+        with mock.patch('goldfinchsong.derivatives.hash_file') as hash_file:
+            self.assertEqual(self.get_cache().process(source), derivative)
+            self.assertFalse(hash_file.called)
+        self.assertEqual(processed, [source])
+
+    def test_keyed_by_content_and_parameters(self):
+        content = os.urandom(5000)
+        source = self.write_image('large.jpg', 0, content)
+        renamed = self.write_image('renamed.jpg', 0, content)
+        cache = self.get_cache()
+        derivative = cache.process(source)
+        self.assertEqual(cache.process(renamed), derivative)
+        self.assertNotEqual(self.get_cache(quality=70).process(source), derivative)
+        # an edited source gets a new derivative
+        self.write_image('large.jpg', 6000)
+        self.assertNotEqual(self.get_cache().process(source), derivative)
+
+    def test_resolve_falls_back_to_source(self):
+        source = self.write_image('broken.jpg', 5000)
+        cache = self.get_cache()
+        with pytest.raises(ValueError):
+            cache.process(source)
+        self.assertEqual(cache.resolve(source), source)
+
+    def test_prepare(self):
+        sources = [self.write_image('large{0}.jpg'.format(index), 5000) for index in range(3)]
+        sources.append(self.write_image('broken.jpg', 5000))
+        sources.append(self.write_image('small.jpg', 10))
+        prepared = self.get_cache().prepare(sources, processes=2)
+        self.assertEqual(sorted(prepared), sorted(sources[:3]))
+        for derivative in prepared.values():
+            self.assertEqual(os.path.getsize(derivative), 1000)
+        # every derivative exists, so nothing is processed again
+        del processed[:]
+        self.assertEqual(self.get_cache().prepare(sources), prepared)
+        self.assertEqual(processed, [])
+
+    def test_load_content(self):
+        self.write_image('large.jpg', 5000)
+        db = TinyDB(storage=storages.MemoryStorage)
+        content = utils.load_content(db, self.image_directory, derivatives=self.get_cache())
+        self.assertTrue(content[0].startswith(self.location))
+        self.assertEqual(content[1], 'large')
+        self.assertEqual(content[2], 'large.jpg')
+
+    def test_make_derivative(self):
+        Image = pytest.importorskip('PIL.Image')
+        source = os.path.join(self.image_directory, 'large.png')
+        Image.effect_noise((1600, 1200), 64).convert('RGB').save(source)
+        derivative = derivatives.make_derivative(source, os.path.join(self.temporary_directory, 'derivative'),
+                                                 maximum_bytes=200000, maximum_dimension=1024)
+        self.assertTrue(derivative.endswith('.jpg'))
+        self.assertTrue(os.path.getsize(derivative) <= 200000)
+        with Image.open(derivative) as image:
+            self.assertTrue(max(image.size) <= 1024)
+
+    def test_make_derivative_too_small_limit(self):
+        Image = pytest.importorskip('PIL.Image')
+        source = os.path.join(self.image_directory, 'large.png')
+        Image.effect_noise((64, 48), 64).convert('RGB').save(source)
+        with pytest.raises(ValueError):
+            derivatives.make_derivative(source, os.path.join(self.temporary_directory, 'derivative'),
+                                        maximum_bytes=100)
@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+from goldfinchsong import fanout
+
+
+class MockAccountManager:
+
+    def __init__(self, name, delay=0.0, fail=False, tracker=None):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.tracker = tracker
+
+    def post_tweet(self):
+        if self.tracker is not None:
+            self.tracker.enter()
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise Exception('Upload failed.')
+            return ('images/{0}.jpg'.format(self.name), self.name, '{0}.jpg'.format(self.name))
+        finally:
+            if self.tracker is not None:
+                self.tracker.leave()
+
+
+class ConcurrencyTracker:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.maximum = 0
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.maximum = max(self.maximum, self.active)
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+class FanoutTests(unittest.TestCase):
+
+    def test_post_account(self):
+        result = fanout.post_account('alice', lambda name: MockAccountManager(name))
+        self.assertEqual(result['account'], 'alice')
+        self.assertEqual(result['image'], 'images/alice.jpg')
+        self.assertEqual(result['status_text'], 'alice')
+        self.assertEqual(result['error'], None)
+        self.assertTrue(result['seconds'] >= 0)
+        result = fanout.post_account('bob', lambda name: MockAccountManager(name, fail=True))
+        self.assertEqual(result['image'], None)
+        self.assertEqual(result['error'], 'Exception: Upload failed.')
+
+    def test_post_account_build_failure(self):
+        def build_manager(name):
+            raise KeyError('db_location')
+        result = fanout.post_account('alice', build_manager)
+        self.assertTrue(result['error'].startswith('KeyError'))
+
+    def test_post_all_isolation(self):
+        names = ['alice', 'bob', 'carol']
+        results = fanout.post_all(names, lambda name: MockAccountManager(name, fail=(name == 'bob')))
+        self.assertEqual([result['account'] for result in results], names)
+        self.assertEqual([result['error'] is None for result in results], [True, False, True])
+
+    def test_post_all_overlaps_uploads(self):
+        names = ['account{0}'.format(index) for index in range(4)]
+        start = time.perf_counter()
+        results = fanout.post_all(names, lambda name: MockAccountManager(name, delay=0.2), workers=4)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(results), 4)
+        # about as long as the slowest upload, not the sum of all four
+        self.assertTrue(elapsed < 0.6, msg=elapsed)
+
+    def test_post_all_bounded(self):
+        tracker = ConcurrencyTracker()
+        names = ['account{0}'.format(index) for index in range(6)]
+        fanout.post_all(names, lambda name: MockAccountManager(name, delay=0.05, tracker=tracker), workers=2)
+        self.assertTrue(tracker.maximum <= 2)
+        self.assertEqual(fanout.post_all([], lambda name: MockAccountManager(name)), [])
+
+    def test_summarize(self):
+        results = [
+            {'account': 'alice', 'image': 'a.jpg', 'status_text': 'a', 'error': None, 'seconds': 0.5},
+            {'account': 'bob', 'image': None, 'status_text': None, 'error': 'Exception: x', 'seconds': 1.5},
+            {'account': 'carol', 'image': 'c.jpg', 'status_text': 'c', 'error': None, 'seconds': 1.0},
+        ]
+        report = fanout.summarize(results, 1.6)
+        self.assertEqual(report['posted'], 2)
+        self.assertEqual(report['failed'], 1)
+        self.assertEqual(report['failed_accounts'], ['bob'])
+        self.assertEqual(report['slowest']['account'], 'bob')
+        self.assertEqual(report['seconds'], 1.6)
+        self.assertEqual(fanout.summarize([])['slowest'], None)
@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+import unittest
+from tinydb import TinyDB, storages
+from goldfinchsong import utils
+from goldfinchsong.classes import Manager
+from goldfinchsong.history import History, INDEX_SUFFIX
+
+
+class MockManagerAPI:
+
+    def update_with_media(self, image, text):
+        pass
+
+
+class HistoryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.db_location = os.path.join(self.temporary_directory, 'db.json')
+        self.location = utils.sibling_location(self.db_location, INDEX_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_index_location(self):
+        self.assertEqual(utils.sibling_location('tests/goldfinchsong_db.json', INDEX_SUFFIX),
+                         'tests/goldfinchsong_db.index.json')
+
+    def test_insert_updates_index(self):
+        history = History(TinyDB(self.db_location), self.location)
+        history.insert({'image': 'image1.png', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+        history.insert({'image': 'image2.png', 'delivered_on': '2016-05-05T17:06:54.987654+00:00'})
+        self.assertTrue('image1.png' in history)
+        self.assertFalse('image3.png' in history)
+        self.assertEqual(len(history), 2)
+        self.assertEqual(len(history.all()), 2)
+        reloaded_history = History(TinyDB(self.db_location), self.location)
+        self.assertEqual(reloaded_history.images, history.images)
+
+    def test_insert_appends_to_log(self):
+        history = History(TinyDB(self.db_location), self.location, compact_every=3)
+        history.insert({'image': 'image1.png'})
+        with open(self.location, 'rb') as index_file:
+            index = index_file.read()
+        history.insert({'image': 'image2.png'})
+        history.insert({'image': 'image3.png'})
+        with open(self.location, 'rb') as index_file:
+            self.assertEqual(index_file.read(), index)
+        with open(history.log_location) as log_file:
+            self.assertEqual(len(log_file.readlines()), 2)
+        reloaded_history = History(TinyDB(self.db_location), self.location)
+        self.assertEqual(reloaded_history.images, history.images)
+        self.assertEqual(len(reloaded_history), 3)
+        # the third log entry compacts the log into the index
+        history.insert({'image': 'image4.png'})
+        self.assertEqual(os.path.getsize(history.log_location), 0)
+        self.assertEqual(len(utils.read_json(self.location)['images']), 4)
+
+    def test_incomplete_log_line(self):
+        history = History(TinyDB(self.db_location), self.location)
+        history.insert({'image': 'image1.png'})
+        with open(history.log_location, 'a') as log_file:
+            log_file.write('{"count": 2, "ima')
+        history = History(TinyDB(self.db_location), self.location)
+        history.insert({'image': 'image2.png'})
+        history = History(TinyDB(self.db_location), self.location)
+        self.assertEqual(sorted(history.images), ['image1.png', 'image2.png'])
+        self.assertEqual(len(history), 2)
+
+    def test_stale_index_is_rebuilt(self):
+        History(TinyDB(self.db_location), self.location).insert({'image': 'image1.png'})
+        # a write that bypasses the index
+        TinyDB(self.db_location).insert({'image': 'image2.png'})
+        history = History(TinyDB(self.db_location), self.location)
+        self.assertTrue('image2.png' in history)
+        self.assertEqual(len(history), 2)
+
+    def test_fingerprint(self):
+        opened = list()
+
+        def open_db():
+            opened.append(self.db_location)
+            return TinyDB(self.db_location)
+
+        history = History(open_db, self.location, db_location=self.db_location)
+        history.insert({'image': 'image1.png'})
+        history.insert({'image': 'image2.png'})
+        self.assertEqual(len(opened), 1)
+        # a current index is loaded without opening the database
+        history = History(open_db, self.location, db_location=self.db_location)
+        self.assertEqual(sorted(history.images), ['image1.png', 'image2.png'])
+        self.assertEqual(len(history), 2)
+        self.assertEqual(len(opened), 1)
+        # a write that bypasses the index changes the fingerprint
+        TinyDB(self.db_location).insert({'image': 'image3.png'})
+        history = History(open_db, self.location, db_location=self.db_location)
+        self.assertTrue('image3.png' in history)
+        self.assertEqual(len(history), 3)
+        self.assertEqual(len(opened), 2)
+
+    def test_purge(self):
+        history = History(TinyDB(self.db_location), self.location)
+        history.insert({'image': 'image1.png'})
+        history.purge()
+        self.assertFalse('image1.png' in history)
+        self.assertEqual(len(History(TinyDB(self.db_location), self.location)), 0)
+
+    def test_unused_files(self):
+        history = History(TinyDB(storage=storages.MemoryStorage))
+        for index in range(1, 52):
+            history.insert({'image': 'image{0}.png'.format(index)})
+        available_files = ['image{0}.png'.format(index) for index in range(1, 101)]
+        unused_files = utils.get_unused_files(history, available_files)
+        self.assertEqual(len(unused_files), 49)
+        self.assertEqual(unused_files[0], 'image52.png')
+        for index in range(52, 101):
+            history.insert({'image': 'image{0}.png'.format(index)})
+        self.assertEqual(utils.get_unused_files(history, available_files), available_files)
+        self.assertEqual(len(history), 100)
+        self.assertEqual(len(utils.get_posted_files(history)), 0)
+        self.assertEqual(len(utils.get_posted_files(history, 0)), 100)
+
+    def test_generations(self):
+        history = History(TinyDB(self.db_location), self.location)
+        history.insert({'image': 'image1.png'})
+        self.assertEqual(history.start_generation(), 1)
+        history.insert({'image': 'image2.png', 'generation': 1})
+        self.assertFalse('image1.png' in history)
+        self.assertTrue('image2.png' in history)
+        reloaded_history = History(TinyDB(self.db_location), self.location)
+        self.assertEqual(reloaded_history.generation, 1)
+        self.assertEqual(reloaded_history.images, history.images)
+        self.assertEqual(set(reloaded_history.posted_files(0)), {'image1.png'})
+        self.assertEqual([cycle['generation'] for cycle in reloaded_history.generations()], [1])
+        # a generation started without going through the index
+        self.assertEqual(utils.start_generation(TinyDB(self.db_location)), 2)
+        reloaded_history = History(TinyDB(self.db_location), self.location)
+        self.assertEqual(reloaded_history.generation, 2)
+        self.assertEqual(len(reloaded_history.posted_files()), 0)
+        self.assertEqual(len(reloaded_history), 2)
+
+    def test_manager_updates_index(self):
+        history = History(TinyDB(self.db_location), self.location)
+        manager = Manager(None, history, 'tests/images')
+        manager.api = MockManagerAPI()
+        content = manager.post_tweet()
+        self.assertTrue(content[2] in History(TinyDB(self.db_location), self.location))
+        history.start_generation()
+        content = manager.reload_content()
+        manager.post_tweet()
+        self.assertEqual(history.all()[-1]['generation'], 1)
+        self.assertTrue(content[2] in History(TinyDB(self.db_location), self.location))
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pytest
+from tinydb import TinyDB, storages
+from goldfinchsong import utils
+from goldfinchsong.catalog import ImageCatalog
+from goldfinchsong.library import ImageLibrary, as_library
+
+
+class ImageLibraryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.birds = os.path.join(self.temporary_directory, 'birds')
+        os.makedirs(os.path.join(self.birds, 'finches', 'american'))
+        os.makedirs(os.path.join(self.birds, 'empty'))
+        shutil.copy('tests/images/goldfinch1.jpg', self.birds)
+        shutil.copy('tests/images/goldfinch2.jpg', os.path.join(self.birds, 'finches'))
+        shutil.copy('tests/images/goldfinch3.jpg', os.path.join(self.birds, 'finches', 'american'))
+        with open(os.path.join(self.birds, 'finches', 'notes.txt'), 'w') as notes:
+            notes.write('notes')
+        self.landscapes = os.path.join(self.temporary_directory, 'landscapes')
+        os.mkdir(self.landscapes)
+        shutil.copy('tests/images/goldfinch1.jpg', self.landscapes)
+        self.location = os.path.join(self.temporary_directory, 'db.catalog.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_flat_library_keys_are_file_names(self):
+        library = ImageLibrary(self.birds)
+        self.assertTrue(library.is_flat())
+        self.assertEqual(list(library.images()), ['goldfinch1.jpg'])
+        self.assertEqual(library.path('goldfinch1.jpg'), os.path.join(self.birds, 'goldfinch1.jpg'))
+
+    def test_recursive_library(self):
+        library = ImageLibrary(self.birds, recursive=True)
+        self.assertEqual(sorted(library.images()),
+                         ['finches/american/goldfinch3.jpg', 'finches/goldfinch2.jpg', 'goldfinch1.jpg'])
+        self.assertEqual(library.path('finches/american/goldfinch3.jpg'),
+                         os.path.join(self.birds, 'finches', 'american', 'goldfinch3.jpg'))
+
+    def test_named_roots(self):
+        library = ImageLibrary({'birds': self.birds, 'landscapes': self.landscapes}, recursive=True, workers=4)
+        images = library.images()
+        self.assertEqual(sorted(images), ['birds/finches/american/goldfinch3.jpg', 'birds/finches/goldfinch2.jpg',
+                                          'birds/goldfinch1.jpg', 'landscapes/goldfinch1.jpg'])
+        for key in images:
+            self.assertTrue(os.path.isfile(library.path(key)))
+        self.assertEqual(library.path('landscapes/goldfinch1.jpg'), os.path.join(self.landscapes, 'goldfinch1.jpg'))
+
+    def test_roots_need_names(self):
+        with pytest.raises(ValueError):
+            ImageLibrary({'': self.birds, 'landscapes': self.landscapes})
+        with pytest.raises(ValueError):
+            ImageLibrary({'birds/finches': self.birds, 'landscapes': self.landscapes})
+
+    def test_catalog_matches_scan(self):
+        library = ImageLibrary({'birds': self.birds, 'landscapes': self.landscapes}, recursive=True)
+        images = library.images()
+        signature = library.signature
+        cataloged_images = library.images(ImageCatalog(self.location))
+        self.assertEqual(list(cataloged_images), list(images))
+        self.assertEqual(library.signature, signature)
+        self.assertTrue(os.path.isfile(self.location))
+        self.assertEqual(list(library.images(ImageCatalog(self.location))), list(images))
+
+    def test_signature_changes_with_subdirectory(self):
+        library = ImageLibrary(self.birds, recursive=True)
+        catalog = ImageCatalog(self.location)
+        library.images(catalog)
+        signature = library.signature
+        american = os.path.join(self.birds, 'finches', 'american')
+        shutil.copy('tests/images/goldfinch4.jpg', american)
+        stat = os.stat(american)
+        os.utime(american, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertIn('finches/american/goldfinch4.jpg', library.images(catalog))
+        self.assertNotEqual(library.signature, signature)
+
+    def test_as_library(self):
+        library = ImageLibrary(self.birds, recursive=True)
+        self.assertIs(as_library(library), library)
+        self.assertEqual(as_library(self.birds).roots, {'': self.birds})
+
+    def test_load_content(self):
+        library = ImageLibrary({'birds': self.birds, 'landscapes': self.landscapes}, recursive=True)
+        db = TinyDB(storage=storages.MemoryStorage)
+        db.insert({'image': 'birds/goldfinch1.jpg', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+        selected = set()
+        for attempt in range(30):
+            image_path, status_text, key = utils.load_content(db, library)
+            self.assertEqual(image_path, library.path(key))
+            self.assertEqual(status_text, utils.trim_file_extension(key.rpartition('/')[2]))
+            selected.add(key)
+        self.assertNotIn('birds/goldfinch1.jpg', selected)
+        self.assertIn('landscapes/goldfinch1.jpg', selected)
@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from tinydb import TinyDB, storages
+from goldfinchsong import metrics, utils
+from goldfinchsong.classes import Manager
+
+
+class MockManagerAPI:
+
+    def update_with_media(self, image, text):
+        pass
+
+
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = metrics.Recorder()
+        metrics.add_hook(self.recorder)
+
+    def tearDown(self):
+        metrics.remove_hook(self.recorder)
+
+    def test_disabled(self):
+        metrics.remove_hook(self.recorder)
+        self.assertTrue(metrics.phase('scan') is metrics.NULL_PHASE)
+        with metrics.phase('scan'):
+            metrics.count('files_scanned', 5)
+            metrics.gauge('history_size', 3)
+        metrics.flush()
+        self.assertEqual(self.recorder.snapshot(), {'phases': {}, 'counters': {}, 'gauges': {}})
+
+    def test_recorder(self):
+        for attempt in range(2):
+            with metrics.phase('scan'):
+                metrics.count('files_scanned', 5)
+        metrics.gauge('history_size', 3)
+        metrics.gauge('history_size', 4)
+        record = self.recorder.snapshot()
+        self.assertEqual(record['phases']['scan'][0], 2)
+        self.assertTrue(record['phases']['scan'][1] >= 0)
+        self.assertEqual(record['counters'], {'files_scanned': 10})
+        self.assertEqual(record['gauges'], {'history_size': 4})
+
+    def test_phase_records_failures(self):
+        with self.assertRaises(ValueError):
+            with metrics.phase('upload'):
+                raise ValueError('Upload failed.')
+        self.assertEqual(self.recorder.phases['upload'][0], 1)
+
+    def test_load_content(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        db.insert({'image': 'goldfinch1.jpg', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+        content = utils.load_content(db, 'tests/images')
+        self.assertTrue(content is not None)
+        record = self.recorder.snapshot()
+        for name in ('scan', 'select', 'get_unused_files', 'status_text', 'to_compact_text'):
+            self.assertEqual(record['phases'][name][0], 1, msg=name)
+        self.assertEqual(record['counters'], {'images_found': 5})
+        self.assertEqual(record['gauges'], {'history_size': 1})
+
+    def test_post_tweet(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        manager = Manager(db=db, image_directory='tests/images')
+        manager.api = MockManagerAPI()
+        content = manager.post_tweet()
+        record = self.recorder.snapshot()
+        for name in ('load_content', 'upload', 'history_write'):
+            self.assertEqual(record['phases'][name][0], 1, msg=name)
+        self.assertEqual(record['counters']['bytes_uploaded'], os.path.getsize(content[0]))
+
+
+class ExporterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_json_lines_exporter(self):
+        location = os.path.join(self.temporary_directory, 'metrics.jsonl')
+        exporter = metrics.JSONLinesExporter(location)
+        exporter.on_phase('scan', 0.5)
+        exporter.on_count('files_scanned', 5)
+        exporter.flush()
+        exporter.on_gauge('history_size', 3)
+        exporter.flush()
+        with open(location) as jsonl_file:
+            records = [json.loads(line) for line in jsonl_file]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['phases'], {'scan': [1, 0.5]})
+        self.assertEqual(records[0]['counters'], {'files_scanned': 5})
+        self.assertEqual(records[1]['phases'], {})
+        self.assertEqual(records[1]['gauges'], {'history_size': 3})
+        self.assertTrue('recorded_on' in records[1])
+
+    def test_prometheus_exporter(self):
+        location = os.path.join(self.temporary_directory, 'goldfinchsong.prom')
+        exporter = metrics.PrometheusExporter(location)
+        exporter.on_phase('upload', 1.5)
+        exporter.on_phase('upload', 0.5)
+        exporter.on_count('bytes_uploaded', 1024)
+        exporter.flush()
+        with open(location) as prometheus_file:
+            lines = prometheus_file.read().splitlines()
+        self.assertTrue('# TYPE goldfinchsong_phase_seconds gauge' in lines)
+        self.assertTrue('goldfinchsong_phase_seconds{phase="upload"} 2.0' in lines)
+        self.assertTrue('goldfinchsong_phase_calls{phase="upload"} 2' in lines)
+        self.assertTrue('goldfinchsong_bytes_uploaded 1024' in lines)
+        self.assertTrue(any(line.startswith('goldfinchsong_last_run_timestamp_seconds ') for line in lines))
+        self.assertFalse(os.path.exists(''.join([location, '.tmp'])))
@@ -0,0 +1,74 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+from goldfinchsong import preview, utils
+
+TEXT_CONVERSIONS = OrderedDict([('goldfinch', 'gf'), ('information', 'info')])
+
+FILE_NAMES = ['short.jpg', 'the_goldfinch_sings.png', 'information_about_goldfinches.gif'] + [
+    'image_{0}_with_a_fairly_long_name.jpg'.format(index) for index in range(50)]
+
+
+class PreviewTests(unittest.TestCase):
+
+    def test_preview_location(self):
+        self.assertEqual(utils.sibling_location('tests/goldfinchsong_db.json', preview.PREVIEW_SUFFIX),
+                         'tests/goldfinchsong_db.preview.csv')
+
+    def test_preview_status(self):
+        self.assertEqual(preview.preview_status('short.jpg'), ('short', 'none'))
+        self.assertEqual(preview.preview_status('the_goldfinch_sings.png', TEXT_CONVERSIONS, 16),
+                         ('the gf sings', 'abbreviation'))
+        self.assertEqual(preview.preview_status('the_goldfinch_sings.png', None, 16), ('the gldfnch sngs', 'elision'))
+        self.assertEqual(preview.preview_status('the_goldfinch_sings.png', None, 8), ('the', 'chop'))
+        for file_name in FILE_NAMES:
+            self.assertEqual(preview.preview_status(file_name, TEXT_CONVERSIONS, 20)[0],
+                             utils.extract_status_text(file_name, TEXT_CONVERSIONS, 20))
+
+    def test_processes(self):
+        serial = list(preview.preview_statuses(FILE_NAMES, TEXT_CONVERSIONS, 20))
+        parallel = list(preview.preview_statuses(FILE_NAMES, TEXT_CONVERSIONS, 20, processes=2, chunksize=8))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(serial), len(FILE_NAMES))
+
+    def test_preview_library(self):
+        rows = list(preview.preview_library(FILE_NAMES[:2], {'short.jpg'}, TEXT_CONVERSIONS, 16))
+        self.assertEqual(rows, [
+            {'file_name': 'short.jpg', 'status_text': 'short', 'length': 5, 'stage': 'none', 'posted': True},
+            {'file_name': 'the_goldfinch_sings.png', 'status_text': 'the gf sings', 'length': 12,
+             'stage': 'abbreviation', 'posted': False},
+        ])
+
+
+class ReportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.rows = list(preview.preview_library(FILE_NAMES[:3], set(), TEXT_CONVERSIONS, 16))
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_csv_report(self):
+        location = os.path.join(self.temporary_directory, 'preview.csv')
+        stages = preview.write_report(iter(self.rows), location)
+        self.assertEqual(stages, {'none': 1, 'abbreviation': 1, 'elision': 0, 'chop': 1})
+        with open(location, newline='', encoding='utf-8') as report_file:
+            rows = list(csv.DictReader(report_file))
+        self.assertEqual([row['file_name'] for row in rows], FILE_NAMES[:3])
+        self.assertEqual(rows[1]['status_text'], 'the gf sings')
+        self.assertEqual(rows[1]['length'], '12')
+        self.assertEqual(rows[2]['stage'], 'chop')
+
+    def test_json_report(self):
+        location = os.path.join(self.temporary_directory, 'preview.json')
+        preview.write_report(iter(self.rows), location)
+        with open(location, encoding='utf-8') as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report['stages']['abbreviation'], 1)
+        self.assertEqual(report['files'], self.rows)
+        self.assertFalse(os.path.exists(''.join([location, '.tmp'])))
@@ -0,0 +1,49 @@
+import os
+import pstats
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+import pytest
+from goldfinchsong import profiling
+
+
+def allocate():
+    return [str(number) * 10 for number in range(10000)]
+
+
+class ProfilingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.stats_location, self.allocations_location = profiling.get_profile_locations(
+            os.path.join(self.temporary_directory, 'goldfinchsong.log'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_get_profile_locations(self):
+        self.assertEqual(profiling.get_profile_locations('logs/goldfinchsong.log'),
+                         ('logs/goldfinchsong.prof', 'logs/goldfinchsong.allocations.txt'))
+
+    def test_profile(self):
+        result = profiling.profile(allocate, self.stats_location, self.allocations_location, limit=5)
+        self.assertEqual(len(result), 10000)
+        self.assertFalse(tracemalloc.is_tracing())
+        stats = pstats.Stats(self.stats_location)
+        self.assertTrue(any(function[2] == 'allocate' for function in stats.stats))
+        with open(self.allocations_location) as allocations_file:
+            lines = allocations_file.read().splitlines()
+        self.assertTrue(lines[0].startswith('Traced memory:'))
+        self.assertTrue(lines[1].startswith('Peak traced memory:'))
+        self.assertTrue(lines[2].startswith('Top '))
+        self.assertTrue(len(lines) <= 8)
+        self.assertTrue('test_profiling.py' in lines[3])
+
+    def test_profile_failure(self):
+        def fail():
+            raise ValueError('Failed.')
+        with pytest.raises(ValueError):
+            profiling.profile(fail, self.stats_location, self.allocations_location)
+        self.assertTrue(os.path.isfile(self.stats_location))
+        self.assertTrue(os.path.isfile(self.allocations_location))
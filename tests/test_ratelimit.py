@@ -0,0 +1,171 @@
+import random
+import time
+import unittest
+import pytest
+from tinydb import TinyDB, storages
+from goldfinchsong import aio, ratelimit
+from goldfinchsong.classes import Manager
+from goldfinchsong.stubserver import StubTwitterServer
+from .test_aio import CREDENTIALS
+
+
+class FakeClock:
+
+    def __init__(self, start=1000000.0):
+        self.now = start
+        self.sleeps = list()
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class MockResponse:
+
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class MockTweepError(Exception):
+
+    def __init__(self, response=None):
+        super().__init__('Request failed.')
+        self.response = response
+
+
+class MockRetryManager:
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.content = ('images/goldfinch1.jpg', 'goldfinch1', 'goldfinch1.jpg')
+        self.attempts = 0
+
+    def post_tweet(self):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.content
+
+
+class RateLimitTests(unittest.TestCase):
+
+    def test_get_response_details(self):
+        error = aio.TwitterAPIError(429, {'X-Rate-Limit-Reset': '100'}, b'')
+        self.assertEqual(ratelimit.get_response_details(error), (429, {'x-rate-limit-reset': '100'}))
+        error = MockTweepError(MockResponse(503, {'Retry-After': '5'}))
+        self.assertEqual(ratelimit.get_response_details(error), (503, {'retry-after': '5'}))
+        self.assertEqual(ratelimit.get_response_details(ValueError()), (None, {}))
+
+    def test_is_retryable(self):
+        self.assertTrue(ratelimit.is_retryable(aio.TwitterAPIError(429, {}, b'')))
+        self.assertTrue(ratelimit.is_retryable(aio.TwitterAPIError(503, {}, b'')))
+        self.assertFalse(ratelimit.is_retryable(aio.TwitterAPIError(403, {}, b'')))
+        self.assertTrue(ratelimit.is_retryable(ConnectionResetError()))
+        self.assertTrue(ratelimit.is_retryable(MockTweepError()))
+        self.assertFalse(ratelimit.is_retryable(MockTweepError(MockResponse(400, {}))))
+        self.assertFalse(ratelimit.is_retryable(Exception('No content available.')))
+        self.assertTrue(ratelimit.is_retryable(TimeoutError()))
+        self.assertFalse(ratelimit.is_retryable(FileNotFoundError()))
+        self.assertFalse(ratelimit.is_retryable(PermissionError()))
+        self.assertFalse(ratelimit.is_retryable(IsADirectoryError()))
+        session = aio.UploadSession('tests/images/goldfinch1.jpg', 65536)
+        interruption = aio.UploadInterrupted(session, ConnectionResetError())
+        interruption.__cause__ = ConnectionResetError()
+        self.assertTrue(ratelimit.is_retryable(interruption))
+        interruption.__cause__ = FileNotFoundError()
+        self.assertFalse(ratelimit.is_retryable(interruption))
+
+    def test_get_rate_limit_reset(self):
+        self.assertEqual(ratelimit.get_rate_limit_reset({'retry-after': '30'}, 100.0), 130.0)
+        headers = {'x-rate-limit-remaining': '0', 'x-rate-limit-reset': '160'}
+        self.assertEqual(ratelimit.get_rate_limit_reset(headers, 100.0), 160.0)
+        headers = {'x-rate-limit-remaining': '0', 'x-rate-limit-reset': '60'}
+        self.assertEqual(ratelimit.get_rate_limit_reset(headers, 100.0), 100.0)
+        headers = {'x-rate-limit-remaining': '12', 'x-rate-limit-reset': '160'}
+        self.assertEqual(ratelimit.get_rate_limit_reset(headers, 100.0), None)
+        self.assertEqual(ratelimit.get_rate_limit_reset({'retry-after': 'soon'}, 100.0), None)
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = ratelimit.TokenBucket(capacity=2, period=10, clock=clock.time)
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), pytest.approx(5.0))
+        clock.sleep(5)
+        self.assertEqual(bucket.take(), 0)
+        clock.sleep(100)
+        bucket.pause_until(clock.now + 60)
+        self.assertEqual(bucket.take(), pytest.approx(65.0))
+        clock.sleep(65)
+        self.assertEqual(bucket.take(), 0)
+        # refills never exceed the capacity
+        clock.sleep(1000)
+        self.assertEqual([bucket.take() for attempt in range(2)], [0, 0])
+        self.assertTrue(bucket.take() > 0)
+
+    def test_retry_policy(self):
+        policy = ratelimit.RetryPolicy(base_delay=2, maximum_delay=10, random_generator=random.Random(7))
+        error = aio.TwitterAPIError(503, {}, b'')
+        for attempt in range(6):
+            delay = policy.delay(attempt, error, 100.0)
+            self.assertTrue(0 <= delay <= min(10, 2 * 2 ** attempt))
+        limited = aio.TwitterAPIError(429, {'x-rate-limit-remaining': '0', 'x-rate-limit-reset': '105'}, b'')
+        self.assertTrue(5 <= policy.delay(0, limited, 100.0) <= 7)
+        limited = aio.TwitterAPIError(429, {'retry-after': '3600'}, b'')
+        self.assertEqual(policy.delay(0, limited, 100.0), 10)
+
+
+class PostWithRetriesTests(unittest.TestCase):
+
+    def test_retries_same_content(self):
+        clock = FakeClock()
+        manager = MockRetryManager([aio.TwitterAPIError(503, {}, b''), ConnectionResetError()])
+        content = ratelimit.post_with_retries(manager, ratelimit.RetryPolicy(base_delay=1), None,
+                                              clock.time, clock.sleep)
+        self.assertEqual(content, manager.content)
+        self.assertEqual(manager.attempts, 3)
+        self.assertEqual(len(clock.sleeps), 2)
+
+    def test_gives_up(self):
+        clock = FakeClock()
+        manager = MockRetryManager([aio.TwitterAPIError(403, {}, b'')])
+        with pytest.raises(aio.TwitterAPIError):
+            ratelimit.post_with_retries(manager, ratelimit.RetryPolicy(), None, clock.time, clock.sleep)
+        self.assertEqual(manager.attempts, 1)
+        manager = MockRetryManager([ConnectionResetError()] * 3)
+        with pytest.raises(ConnectionResetError):
+            ratelimit.post_with_retries(manager, ratelimit.RetryPolicy(retries=2), None, clock.time, clock.sleep)
+        self.assertEqual(manager.attempts, 3)
+
+    def test_rate_limit_pauses_bucket(self):
+        clock = FakeClock()
+        bucket = ratelimit.TokenBucket(capacity=10, period=100, clock=clock.time)
+        limited = aio.TwitterAPIError(429, {'x-rate-limit-remaining': '0',
+                                            'x-rate-limit-reset': str(clock.now + 30)}, b'')
+        manager = MockRetryManager([limited])
+        policy = ratelimit.RetryPolicy(base_delay=1, random_generator=random.Random(3))
+        ratelimit.post_with_retries(manager, policy, bucket, clock.time, clock.sleep)
+        self.assertEqual(manager.attempts, 2)
+        # the retry waited for the reset and then for a refilled token
+        self.assertTrue(clock.now >= 1000000.0 + 30 + 10)
+
+    def test_stub_rate_limits(self):
+        with StubTwitterServer() as server:
+            server.rate_limited_statuses = 2
+            manager = Manager(CREDENTIALS, TinyDB(storage=storages.MemoryStorage), 'tests/images')
+            manager.content = ('tests/images/goldfinch2.jpg', 'goldfinch2', 'goldfinch2.jpg')
+            manager.api = aio.BlockingAPI(aio.AsyncAPI(CREDENTIALS, api_url=server.url, upload_url=server.url))
+            # the stub's rate limit headers use the real time
+            clock = FakeClock(time.time())
+            content = ratelimit.post_with_retries(manager, ratelimit.RetryPolicy(base_delay=0.01),
+                                                  ratelimit.TokenBucket(capacity=5, period=5, clock=clock.time),
+                                                  clock.time, clock.sleep)
+        self.assertEqual(content[2], 'goldfinch2.jpg')
+        self.assertEqual(server.statuses[0]['text'], 'goldfinch2')
+        self.assertEqual(len(server.statuses), 1)
+        self.assertEqual(len(manager.db), 1)
+        self.assertTrue(len(clock.sleeps) >= 2)
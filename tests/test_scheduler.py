@@ -0,0 +1,79 @@
+from datetime import datetime
+import sched
+import unittest
+import pytest
+from goldfinchsong import scheduler
+
+
+class FakeClock:
+
+    def __init__(self, start):
+        self.now = start.timestamp()
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class CronScheduleTests(unittest.TestCase):
+
+    def test_parse_cron_field(self):
+        self.assertEqual(scheduler.parse_cron_field('*', 0, 6), {0, 1, 2, 3, 4, 5, 6})
+        self.assertEqual(scheduler.parse_cron_field('*/15', 0, 59), {0, 15, 30, 45})
+        self.assertEqual(scheduler.parse_cron_field('1-3,9', 0, 23), {1, 2, 3, 9})
+        self.assertEqual(scheduler.parse_cron_field('10-30/10', 0, 59), {10, 20, 30})
+        with pytest.raises(ValueError):
+            scheduler.parse_cron_field('60', 0, 59)
+
+    def test_daily(self):
+        schedule = scheduler.CronSchedule('0 9 * * *')
+        self.assertEqual(schedule.next_time(datetime(2016, 2, 4, 8, 30)), datetime(2016, 2, 4, 9, 0))
+        self.assertEqual(schedule.next_time(datetime(2016, 2, 4, 9, 0)), datetime(2016, 2, 5, 9, 0))
+        self.assertEqual(schedule.next_time(datetime(2016, 12, 31, 10, 0)), datetime(2017, 1, 1, 9, 0))
+
+    def test_weekdays(self):
+        # 2016-02-05 is a Friday
+        schedule = scheduler.CronSchedule('30 17 * * 1-5')
+        self.assertEqual(schedule.next_time(datetime(2016, 2, 5, 18, 0)), datetime(2016, 2, 8, 17, 30))
+        sunday = scheduler.CronSchedule('0 0 * * 7')
+        self.assertEqual(sunday.next_time(datetime(2016, 2, 5, 18, 0)), datetime(2016, 2, 7, 0, 0))
+
+    def test_day_or_weekday(self):
+        # the 1st of the month or any Monday
+        schedule = scheduler.CronSchedule('0 0 1 * 1')
+        self.assertEqual(schedule.next_time(datetime(2016, 2, 2, 0, 0)), datetime(2016, 2, 8, 0, 0))
+        self.assertEqual(schedule.next_time(datetime(2016, 2, 29, 0, 0)), datetime(2016, 3, 1, 0, 0))
+
+    def test_leap_day(self):
+        schedule = scheduler.CronSchedule('0 12 29 2 *')
+        self.assertEqual(schedule.next_time(datetime(2016, 3, 1)), datetime(2020, 2, 29, 12, 0))
+
+    def test_bad_expression(self):
+        with pytest.raises(ValueError):
+            scheduler.CronSchedule('0 9 * *')
+
+
+class RunScheduledTests(unittest.TestCase):
+
+    def test_interval(self):
+        clock = FakeClock(datetime(2016, 2, 4, 9, 0))
+        runs = list()
+        schedule = scheduler.IntervalSchedule(60)
+        scheduler.run_scheduled(lambda: runs.append(clock.time()), schedule,
+                                sched.scheduler(clock.time, clock.sleep), iterations=3)
+        start = datetime(2016, 2, 4, 9, 0).timestamp()
+        self.assertEqual(runs, [start + 60, start + 120, start + 180])
+
+    def test_cron(self):
+        clock = FakeClock(datetime(2016, 2, 4, 8, 59, 30))
+        runs = list()
+        schedule = scheduler.CronSchedule('0 9 * * *')
+        scheduler.run_scheduled(lambda: runs.append(datetime.fromtimestamp(clock.time())), schedule,
+                                sched.scheduler(clock.time, clock.sleep), iterations=2)
+        self.assertEqual(runs, [datetime(2016, 2, 4, 9, 0), datetime(2016, 2, 5, 9, 0)])
+
+    def test_bad_interval(self):
+        with pytest.raises(ValueError):
+            scheduler.IntervalSchedule(0)
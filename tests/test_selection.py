@@ -0,0 +1,134 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from tinydb import TinyDB, storages
+from goldfinchsong import utils
+from goldfinchsong.catalog import ImageCatalog
+from goldfinchsong.classes import Manager
+from goldfinchsong.selection import PostingQueue, QUEUE_SUFFIX
+
+IMAGE_NAMES = ['goldfinch1.jpg', 'goldfinch2.jpg', 'goldfinch3.jpg',
+               'goldfinch4.jpg', 'goldfinch5.jpg']
+
+
+class MockManagerAPI:
+
+    def update_with_media(self, image, text):
+        pass
+
+
+class PostingQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.temporary_directory, 'db.queue.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_queue_location(self):
+        self.assertEqual(utils.sibling_location('tests/goldfinchsong_db.json', QUEUE_SUFFIX),
+                         'tests/goldfinchsong_db.queue.json')
+
+    def test_cycle(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        available_files = dict.fromkeys(IMAGE_NAMES + ['notes.txt'])
+        queue = PostingQueue(self.location, random.Random(4))
+        selected = list()
+        for index in range(5):
+            file_name = queue.select(db, available_files, 1)
+            db.insert({'image': file_name})
+            queue.consume(file_name)
+            selected.append(file_name)
+        self.assertEqual(sorted(selected), IMAGE_NAMES)
+        # a new cycle starts once every image was posted
+        file_name = queue.select(db, available_files, 1)
+        self.assertTrue(file_name in IMAGE_NAMES)
+        # the past cycle's posts are kept
+        self.assertEqual(len(db.all()), 5)
+        self.assertEqual(utils.get_generation(db), 1)
+        self.assertEqual(utils.get_posted_files(db), set())
+
+    def test_empty_library_leaves_history(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        db.insert({'image': 'goldfinch1.jpg'})
+        queue = PostingQueue(self.location, random.Random(4))
+        self.assertEqual(queue.select(db, dict.fromkeys(['notes.txt']), 1), None)
+        self.assertFalse(os.path.isfile(self.location))
+        # every image vanishes, as when a network share is unmounted
+        available_files = dict.fromkeys(IMAGE_NAMES)
+        file_name = queue.select(db, available_files, 2)
+        for attempt in range(3):
+            self.assertEqual(queue.select(db, dict(), 3), None)
+        self.assertEqual(len(db.all()), 1)
+        self.assertEqual(utils.get_generation(db), 0)
+        self.assertTrue(queue.order)
+        self.assertTrue(file_name in IMAGE_NAMES)
+
+    def test_empty_library_keeps_generation(self):
+        image_directory = os.path.join(self.temporary_directory, 'images')
+        os.mkdir(image_directory)
+        db = TinyDB(storage=storages.MemoryStorage)
+        db.insert({'image': 'goldfinch1.jpg'})
+        catalog = ImageCatalog(os.path.join(self.temporary_directory, 'db.catalog.json'))
+        queue = PostingQueue(self.location, random.Random(4))
+        for attempt in range(3):
+            self.assertEqual(utils.load_content(db, image_directory, catalog=catalog, queue=queue), None)
+        self.assertEqual(utils.get_unused_files(db, []), [])
+        self.assertEqual(utils.get_generation(db), 0)
+        # the mount comes back and the current generation's posts are still skipped
+        shutil.copy('tests/images/goldfinch1.jpg', image_directory)
+        shutil.copy('tests/images/goldfinch2.jpg', image_directory)
+        stat = os.stat(image_directory)
+        os.utime(image_directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        content = utils.load_content(db, image_directory, catalog=catalog, queue=queue)
+        self.assertEqual(content[2], 'goldfinch2.jpg')
+
+    def test_persistence(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        available_files = dict.fromkeys(IMAGE_NAMES)
+        queue = PostingQueue(self.location)
+        first = queue.select(db, available_files, 1)
+        queue.consume(first)
+        second = queue.select(db, available_files, 1)
+        reloaded_queue = PostingQueue(self.location)
+        self.assertEqual(reloaded_queue.order, queue.order)
+        self.assertEqual(reloaded_queue.cursor, 1)
+        self.assertEqual(reloaded_queue.select(db, available_files, 1), second)
+
+    def test_history_seeds_queue(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        for image_name in IMAGE_NAMES[:4]:
+            db.insert({'image': image_name})
+        queue = PostingQueue(self.location)
+        self.assertEqual(queue.select(db, dict.fromkeys(IMAGE_NAMES), 1), 'goldfinch5.jpg')
+
+    def test_merge_and_removal(self):
+        db = TinyDB(storage=storages.MemoryStorage)
+        queue = PostingQueue(self.location, random.Random(7))
+        first = queue.select(db, dict.fromkeys(IMAGE_NAMES[:3]), 1)
+        queue.consume(first)
+        # new files join the unposted part of the queue
+        queue.select(db, dict.fromkeys(IMAGE_NAMES), 2)
+        self.assertEqual(sorted(queue.order), IMAGE_NAMES)
+        self.assertEqual(queue.order[0], first)
+        # removed files are skipped
+        remaining = set(IMAGE_NAMES) - {first, queue.order[1]}
+        self.assertTrue(queue.select(db, dict.fromkeys(remaining), 3) in remaining)
+
+    def test_manager_consumes_queue(self):
+        image_directory = os.path.join(self.temporary_directory, 'images')
+        shutil.copytree('tests/images', image_directory)
+        catalog = ImageCatalog(os.path.join(self.temporary_directory, 'db.catalog.json'))
+        queue = PostingQueue(self.location)
+        db = TinyDB(storage=storages.MemoryStorage)
+        manager = Manager(None, db, image_directory, None, catalog, queue)
+        manager.api = MockManagerAPI()
+        posted = list()
+        for index in range(5):
+            posted.append(manager.post_tweet()[2])
+            manager.reload_content()
+        self.assertEqual(sorted(posted), IMAGE_NAMES)
+        self.assertEqual(manager.content, utils.load_content(db, image_directory, None, catalog, queue))
@@ -0,0 +1,166 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import pytest
+from tinydb import TinyDB
+from goldfinchsong import utils
+from goldfinchsong.classes import Manager
+from goldfinchsong.sqlite import SQLiteDatabase, import_tinydb
+from goldfinchsong.storages import JournalStorage
+
+
+class MockManagerAPI:
+
+    def update_with_media(self, image, text):
+        pass
+
+
+class SQLiteDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.temporary_directory, 'db.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def test_insert_and_all(self):
+        database = SQLiteDatabase(self.location)
+        database.insert({'image': 'image1.png', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+        database.insert({'image': 'image2.png', 'delivered_on': '2016-05-05T17:06:54.987654+00:00'})
+        database.close()
+        database = SQLiteDatabase(self.location)
+        self.assertEqual(database.all(), [
+            {'image': 'image1.png', 'delivered_on': '2016-05-04T17:06:54.987654+00:00', 'generation': 0},
+            {'image': 'image2.png', 'delivered_on': '2016-05-05T17:06:54.987654+00:00', 'generation': 0},
+        ])
+        self.assertEqual(len(database), 2)
+        self.assertTrue('image1.png' in database)
+        self.assertFalse('image3.png' in database)
+        self.assertEqual(database.posted_files(), {'image1.png', 'image2.png'})
+        journal_mode = database.connection.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(journal_mode, 'wal')
+        database.close()
+
+    def test_indexes(self):
+        database = SQLiteDatabase(self.location)
+        plan = database.connection.execute('EXPLAIN QUERY PLAN SELECT 1 FROM tweets WHERE image = ?',
+                                           ('image1.png',)).fetchall()
+        self.assertTrue('tweets_image' in str(plan))
+        plan = database.connection.execute('EXPLAIN QUERY PLAN SELECT image FROM tweets WHERE delivered_on > ?',
+                                           ('2016',)).fetchall()
+        self.assertTrue('tweets_delivered_on' in str(plan))
+        database.close()
+
+    def test_unused_files_and_purge(self):
+        database = SQLiteDatabase(self.location)
+        for index in range(1, 52):
+            database.insert({'image': 'image{0}.png'.format(index)})
+        available_files = ['image{0}.png'.format(index) for index in range(1, 101)]
+        unused_files = utils.get_unused_files(database, available_files)
+        self.assertEqual(len(unused_files), 49)
+        self.assertEqual(unused_files[0], 'image52.png')
+        database.purge()
+        self.assertEqual(len(database), 0)
+        database.close()
+
+    def test_generations(self):
+        database = SQLiteDatabase(self.location)
+        for index in range(1, 4):
+            database.insert({'image': 'image{0}.png'.format(index)})
+        available_files = ['image1.png', 'image2.png', 'image3.png']
+        self.assertEqual(utils.get_unused_files(database, available_files), available_files)
+        self.assertEqual(database.generation, 1)
+        self.assertEqual(len(database), 3)
+        self.assertFalse('image1.png' in database)
+        database.insert({'image': 'image1.png', 'generation': 1})
+        self.assertEqual(utils.get_unused_files(database, available_files), ['image2.png', 'image3.png'])
+        self.assertEqual(database.posted_files(0), set(available_files))
+        self.assertEqual([cycle['generation'] for cycle in database.generations()], [1])
+        plan = database.connection.execute('EXPLAIN QUERY PLAN SELECT DISTINCT image FROM tweets WHERE generation = ?',
+                                           (1,)).fetchall()
+        self.assertTrue('tweets_generation_image' in str(plan))
+        database.close()
+
+    def test_migrate(self):
+        connection = sqlite3.connect(self.location)
+        connection.execute('CREATE TABLE tweets (id INTEGER PRIMARY KEY, image TEXT NOT NULL, delivered_on TEXT)')
+        connection.execute("INSERT INTO tweets (image, delivered_on) VALUES ('image1.png', NULL)")
+        connection.commit()
+        connection.close()
+        database = SQLiteDatabase(self.location)
+        self.assertEqual(database.all(), [{'image': 'image1.png', 'delivered_on': None, 'generation': 0}])
+        self.assertTrue('image1.png' in database)
+        database.close()
+
+    def test_manager(self):
+        database = SQLiteDatabase(self.location)
+        manager = Manager(None, database, 'tests/images')
+        manager.api = MockManagerAPI()
+        content = manager.post_tweet()
+        self.assertTrue(content[2] in database)
+        database.close()
+
+    def test_import_tinydb(self):
+        source_location = os.path.join(self.temporary_directory, 'db.json')
+        source = TinyDB(source_location)
+        source.insert({'image': 'image1.png', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+        source.insert({'image': 'image2.png', 'delivered_on': '2016-05-05T17:06:54.987654+00:00'})
+        utils.start_generation(source)
+        source.close()
+        database = SQLiteDatabase(self.location)
+        self.assertEqual(import_tinydb(source_location, database), 2)
+        self.assertEqual([tweet['image'] for tweet in database.all()], ['image1.png', 'image2.png'])
+        self.assertEqual(database.generation, 1)
+        with pytest.raises(ValueError):
+            import_tinydb(source_location, database)
+        with pytest.raises(FileNotFoundError):
+            import_tinydb(os.path.join(self.temporary_directory, 'missing.json'), SQLiteDatabase(':memory:'))
+        database.close()
+
+    def test_failed_import_saves_nothing(self):
+        source_location = os.path.join(self.temporary_directory, 'db.json')
+        source = TinyDB(source_location)
+        source.insert({'image': 'image1.png'})
+        # a repeated generation fails after the tweets were inserted
+        source.table(utils.GENERATION_TABLE).insert_multiple([{'generation': 1}, {'generation': 1}])
+        source.close()
+        database = SQLiteDatabase(self.location)
+        with pytest.raises(sqlite3.IntegrityError):
+            import_tinydb(source_location, database)
+        self.assertEqual(len(database), 0)
+        self.assertEqual(database.generations(), [])
+        source = TinyDB(source_location)
+        source.table(utils.GENERATION_TABLE).remove(doc_ids=[2])
+        source.close()
+        self.assertEqual(import_tinydb(source_location, database), 1)
+        self.assertEqual(database.generation, 1)
+        database.close()
+
+    def test_import_leaves_source_unchanged(self):
+        source_location = os.path.join(self.temporary_directory, 'db.json')
+        source = TinyDB(source_location, indent=4)
+        for index in range(1, 4):
+            source.insert({'image': 'image{0}.png'.format(index)})
+        source.close()
+        with open(source_location, 'rb') as source_file:
+            content = source_file.read()
+        database = SQLiteDatabase(self.location)
+        self.assertEqual(import_tinydb(source_location, database), 3)
+        self.assertEqual([tweet['image'] for tweet in database.all()], ['image1.png', 'image2.png', 'image3.png'])
+        database.close()
+        with open(source_location, 'rb') as source_file:
+            self.assertEqual(source_file.read(), content)
+        journal_location = os.path.join(self.temporary_directory, 'journal.json')
+        journal = TinyDB(journal_location, storage=JournalStorage)
+        journal.insert({'image': 'image1.png'})
+        journal.close()
+        database = SQLiteDatabase(':memory:')
+        self.assertEqual(import_tinydb(journal_location, database), 1)
+        garbage_location = os.path.join(self.temporary_directory, 'garbage.json')
+        with open(garbage_location, 'w') as garbage_file:
+            garbage_file.write('not json')
+        with pytest.raises(ValueError):
+            import_tinydb(garbage_location, SQLiteDatabase(':memory:'))
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import unittest
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must only be imported on the code paths that use them
+DEFERRED_MODULES = ('tweepy', 'requests', 'tinydb', 'multiprocessing')
+
+# generous, so that slow machines pass; the deferred module check catches most regressions
+MAXIMUM_CLI_IMPORT_MICROSECONDS = 500000
+
+
+def run_python(*arguments):
+    result = subprocess.run([sys.executable] + list(arguments), cwd=PROJECT_DIRECTORY,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    return result
+
+
+def import_times(module):
+    """Runs ``python -X importtime`` and returns cumulative import microseconds keyed to module names."""
+    result = run_python('-X', 'importtime', '-c', 'import {0}'.format(module))
+    times = dict()
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            self_time, cumulative_time, name = line[len('import time:'):].split('|')
+            if cumulative_time.strip().isdigit():
+                times[name.strip()] = int(cumulative_time)
+    return times
+
+
+class StartupTests(unittest.TestCase):
+
+    def test_cli_import_defers_heavy_modules(self):
+        times = import_times('goldfinchsong.cli')
+        self.assertTrue('goldfinchsong.cli' in times)
+        for module in DEFERRED_MODULES:
+            self.assertFalse(module in times, msg='{0} is imported with the CLI'.format(module))
+
+    def test_cli_import_time(self):
+        best_time = min(import_times('goldfinchsong.cli')['goldfinchsong.cli'] for attempt in range(3))
+        self.assertTrue(best_time < MAXIMUM_CLI_IMPORT_MICROSECONDS, msg=best_time)
+
+    def test_help_defers_heavy_modules(self):
+        script = ('import sys\n'
+                  'from goldfinchsong.cli import run\n'
+                  'try:\n'
+                  '    run(["--help"])\n'
+                  'except SystemExit:\n'
+                  '    pass\n'
+                  'print("imported:" + ",".join(module for module in {0!r} if module in sys.modules))\n').format(DEFERRED_MODULES)
+        result = run_python('-c', script)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'imported:')
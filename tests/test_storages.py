@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pytest
+from tinydb import TinyDB
+from goldfinchsong.storages import JournalStorage
+
+
+class JournalStorageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.temporary_directory, 'db.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temporary_directory)
+
+    def read_lines(self):
+        with open(self.path) as journal_file:
+            return journal_file.read().splitlines()
+
+    def test_insert_appends(self):
+        db = TinyDB(self.path, storage=JournalStorage)
+        db.insert({'image': 'image1.png', 'delivered_on': '2016-05-04T17:06:54.987654+00:00'})
+        db.insert({'image': 'image2.png', 'delivered_on': '2016-05-05T17:06:54.987654+00:00'})
+        db.close()
+        self.assertEqual(len(self.read_lines()), 3)
+        db = TinyDB(self.path, storage=JournalStorage)
+        self.assertEqual([tweet['image'] for tweet in db.all()], ['image1.png', 'image2.png'])
+        self.assertEqual(db.all()[0]['delivered_on'], '2016-05-04T17:06:54.987654+00:00')
+        db.close()
+
+    def test_reads_json_storage_file(self):
+        db = TinyDB(self.path)
+        db.insert({'image': 'image1.png'})
+        db.close()
+        db = TinyDB(self.path, storage=JournalStorage)
+        db.insert({'image': 'image2.png'})
+        self.assertEqual(len(db), 2)
+        db.close()
+
+    def test_reads_indented_json_storage_file(self):
+        db = TinyDB(self.path, indent=4)
+        db.insert({'image': 'image1.png'})
+        db.insert({'image': 'image2.png'})
+        db.close()
+        db = TinyDB(self.path, storage=JournalStorage)
+        self.assertEqual([tweet['image'] for tweet in db.all()], ['image1.png', 'image2.png'])
+        db.insert({'image': 'image3.png'})
+        db.close()
+        self.assertEqual(len(self.read_lines()), 2)
+        db = TinyDB(self.path, storage=JournalStorage)
+        self.assertEqual([tweet['image'] for tweet in db.all()], ['image1.png', 'image2.png', 'image3.png'])
+        db.close()
+
+    def test_corrupt_line_is_kept(self):
+        db = TinyDB(self.path, storage=JournalStorage)
+        db.insert({'image': 'image1.png'})
+        db.close()
+        lines = self.read_lines()
+        with open(self.path, 'w') as journal_file:
+            journal_file.write('\n'.join([lines[0], '{"op": "ins', lines[1]]) + '\n')
+        size = os.path.getsize(self.path)
+        with pytest.raises(ValueError):
+            JournalStorage(self.path)
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_purge_and_compaction(self):
+        db = TinyDB(self.path, storage=JournalStorage, compact_every=5)
+        for index in range(4):
+            db.insert({'image': 'image{0}.png'.format(index)})
+        self.assertEqual(len(self.read_lines()), 1)
+        db.purge()
+        db.insert({'image': 'image5.png'})
+        db.close()
+        db = TinyDB(self.path, storage=JournalStorage)
+        self.assertEqual(db.all(), [{'image': 'image5.png'}])
+        db.close()
+
+    def test_incomplete_line_is_discarded(self):
+        db = TinyDB(self.path, storage=JournalStorage)
+        db.insert({'image': 'image1.png'})
+        db.close()
+        with open(self.path, 'a') as journal_file:
+            journal_file.write('{"op": "insert", "table": "_def')
+        db = TinyDB(self.path, storage=JournalStorage)
+        db.insert({'image': 'image2.png'})
+        db.close()
+        db = TinyDB(self.path, storage=JournalStorage)
+        self.assertEqual([tweet['image'] for tweet in db.all()], ['image1.png', 'image2.png'])
+        db.close()
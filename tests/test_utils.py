@@ -1,7 +1,13 @@
 from collections import OrderedDict
 from datetime import datetime, timezone
-import unittest
+import os
 from os.path import join
+import random
+import re
+import shutil
+import tempfile
+import unittest
+import pytest
 from tinydb import TinyDB, storages
 from goldfinchsong import utils
 
@@ -17,6 +23,24 @@ TEST_TEXT2 = 'This is a test of the goldfinchsong project. Tests ' \
             'Tests are important!'
 
 
+
+def reference_vowel_elision(text, maximum_length=117):
+    # the original, quadratic implementation of utils.apply_vowel_elision
+    words = text.split()
+    words.reverse()
+    elided_words = list()
+    vowel_regex = re.compile(r'\B[aeiou]\B', re.IGNORECASE)
+    while words:
+        word = words.pop(0)
+        elided_word = vowel_regex.sub('', word)
+        elided_words.append(elided_word)
+        complete_word_length = len(' '.join(words))
+        elided_word_length = len(' '.join(elided_words))
+        if (complete_word_length + elided_word_length) <= maximum_length:
+            return utils.assemble_elided_status(words, elided_words)
+    return utils.assemble_elided_status(words, elided_words)
+
+
 class LoadContentTests(unittest.TestCase):
 
     def test_basic_load(self):
@@ -49,6 +73,21 @@ class LoadContentTests(unittest.TestCase):
         self.assertEqual(len(tweets), 4, msg=tweets)
 
 
+    def test_only_images_are_selected(self):
+        temporary_directory = tempfile.mkdtemp()
+        try:
+            shutil.copy('tests/images/goldfinch1.jpg', temporary_directory)
+            for index in range(50):
+                with open(os.path.join(temporary_directory, 'sidecar{0}.txt'.format(index)), 'w') as sidecar:
+                    sidecar.write('caption')
+            for attempt in range(10):
+                db = TinyDB(storage=storages.MemoryStorage)
+                content = utils.load_content(db, temporary_directory)
+                self.assertEqual(content[2], 'goldfinch1.jpg')
+        finally:
+            shutil.rmtree(temporary_directory)
+
+
 class UtilitiesTests(unittest.TestCase):
 
     def test_apply_abbreviations(self):
@@ -73,6 +112,16 @@ class UtilitiesTests(unittest.TestCase):
                         'are imprtnt!'
         self.assertEqual(expected_text, result_text)
 
+    def test_apply_vowel_elision_matches_reference(self):
+        generator = random.Random(117)
+        words = TEST_TEXT1.split() + ['a', 'I', 'queue', 'AEIOU', 'rhythm']
+        for trial in range(1000):
+            text = ' '.join(generator.choice(words) for word in range(generator.randint(0, 40)))
+            maximum_length = generator.randint(0, 200)
+            self.assertEqual(utils.apply_vowel_elision(text, maximum_length),
+                             reference_vowel_elision(text, maximum_length),
+                             msg=(text, maximum_length))
+
     def test_assemble_elided_status(self):
         complete_words = ['test', 'a', 'is', 'This']
         elided_words = ['systm', 'gldfnch', 'the', 'of']
@@ -116,7 +165,9 @@ class UtilitiesTests(unittest.TestCase):
             'image.txt',
             'image.c',
             'image.py',
-            'image'
+            'image',
+            '.png',
+            'image.png.txt'
         ]
         for image_file in image_files:
             self.assertFalse(utils.is_image_file(image_file))
@@ -138,6 +189,29 @@ class UtilitiesTests(unittest.TestCase):
         ]
         for image_file in image_files:
             self.assertEqual(utils.trim_file_extension(image_file), 'image')
+        self.assertEqual(utils.trim_file_extension('image.v2.png'), 'image.v2')
+        with pytest.raises(ValueError):
+            utils.trim_file_extension('image.txt')
+
+    def test_sibling_location(self):
+        self.assertEqual(utils.sibling_location('tests/goldfinchsong_db.json', '.queue.json'),
+                         'tests/goldfinchsong_db.queue.json')
+        self.assertEqual(utils.sibling_location('goldfinchsong.log', '.prof'), 'goldfinchsong.prof')
+        self.assertEqual(utils.sibling_location('goldfinchsong_db', '.cache.sqlite3'), 'goldfinchsong_db.cache.sqlite3')
+
+    def test_atomic_write(self):
+        temporary_directory = tempfile.mkdtemp()
+        try:
+            location = os.path.join(temporary_directory, 'report.csv')
+            utils.atomic_write(location, 'file_name,length\r\n')
+            with open(location, 'rb') as report_file:
+                self.assertEqual(report_file.read(), b'file_name,length\r\n')
+            utils.atomic_write(location, b'\x89PNG', sync=True)
+            with open(location, 'rb') as report_file:
+                self.assertEqual(report_file.read(), b'\x89PNG')
+            self.assertEqual(os.listdir(temporary_directory), ['report.csv'])
+        finally:
+            shutil.rmtree(temporary_directory)
 
     def test_to_compact_text(self):
         text_conversions = {
@@ -172,6 +246,28 @@ class UtilitiesTests(unittest.TestCase):
         expected_text2 = 'Sme gfnch imge-fle wth a vry lng st of chrctrs and abbrs tht cnvys'
         self.assertEqual(expected_text2, candidate_text2)
 
+    def test_status_source_text(self):
+        self.assertEqual(utils.status_source_text('selected_image.png'), 'selected image')
+        self.assertEqual(utils.status_source_text('birds/finches/American_goldfinch.JPG'), 'American goldfinch')
+        with pytest.raises(ValueError):
+            utils.status_source_text('birds/notes.txt')
+
+    def test_extract_status_texts(self):
+        text_conversions = OrderedDict((
+            ('abbreviations', 'abbrs'),
+            ('goldfinchsong', 'gfnch'),
+            ('important', 'importnt'),
+        ))
+        file_names = ['Some_goldfinchsong_image-file_with_a_very_long_set_of_'
+                      'characters_and_abbreviations_that_conveys_important_info_{0}.png'.format(index)
+                      for index in range(50)] + IMAGE_NAMES
+        expected_texts = [utils.extract_status_text(file_name, text_conversions, 70) for file_name in file_names]
+        status_texts = utils.extract_status_texts(iter(file_names), text_conversions, 70)
+        self.assertFalse(isinstance(status_texts, list))
+        self.assertEqual(list(status_texts), expected_texts)
+        pooled_texts = utils.extract_status_texts(file_names, text_conversions, 70, processes=2, chunksize=8)
+        self.assertEqual(list(pooled_texts), expected_texts)
+
     def test_get_unused_files(self):
         available_files = list()
         for index in range(1,101):
@@ -208,6 +304,14 @@ class UtilitiesTests(unittest.TestCase):
         self.assertEqual(unused_files[10], 'image11.png')
         self.assertEqual(unused_files[33], 'image34.png')
         self.assertEqual(unused_files[50], 'image51.png')
+        # a new generation starts and the history is kept
+        self.assertEqual(len(db.all()), 105)
+        self.assertEqual(utils.get_generation(db), 1)
+        self.assertEqual(len(utils.get_posted_files(db)), 0)
+        self.assertEqual(len(utils.get_posted_files(db, 0)), 105)
+        db.insert({'image': 'image1.png', 'generation': 1})
+        self.assertEqual(len(utils.get_unused_files(db, available_files)), 99)
+        self.assertEqual([cycle['generation'] for cycle in utils.get_generations(db)], [1])
 
 
 